@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analytics import stats
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the course and instructor statistics rollups from reviews, '
+            'lessons and enrollments')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course', type=int, action='append', dest='courses',
+            help='Only rebuild this course and its instructor (repeatable)')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of courses aggregated per transaction')
+
+    def handle(self, *args, **options):
+        count = stats.rebuild(options['courses'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {count} course(s)'))
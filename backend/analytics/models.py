@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import models
+
+from courses.models import Course
+
+RATINGS = range(1, 6)
+
+
+class StatsTotals(models.Model):
+    """Counters shared by the course and instructor rollups"""
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    lesson_count = models.IntegerField(default=0)
+    total_duration = models.IntegerField(
+        default=0, help_text="Sum of lesson durations in minutes")
+    enrollment_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}') for rating in RATINGS}
+
+    @property
+    def average_rating(self):
+        return Course.compute_average_rating(self.rating_sum, self.review_count)
+
+
+class CourseStats(StatsTotals):
+    """Pre-aggregated statistics of one course"""
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    class Meta:
+        verbose_name_plural = 'Course stats'
+
+    def __str__(self):
+        return f"Stats of course {self.course_id}"
+
+
+class InstructorStats(StatsTotals):
+    """Pre-aggregated statistics over all courses of one instructor"""
+    instructor = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+        related_name='instructor_stats')
+    course_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Instructor stats'
+
+    def __str__(self):
+        return f"Stats of instructor {self.instructor_id}"
+
+
+class DailyTotals(models.Model):
+    """Reviews and enrollments created on one day that still exist"""
+    date = models.DateField()
+    reviews = models.IntegerField(default=0)
+    enrollments = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class CourseDailyStats(DailyTotals):
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        unique_together = ['course', 'date']
+        verbose_name_plural = 'Course daily stats'
+
+
+class InstructorDailyStats(DailyTotals):
+    instructor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='instructor_daily_stats')
+
+    class Meta:
+        unique_together = ['instructor', 'date']
+        verbose_name_plural = 'Instructor daily stats'
@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from .models import CourseStats, InstructorStats
+
+STATS_FIELDS = [
+    'review_count', 'average_rating', 'rating_histogram', 'lesson_count',
+    'total_duration', 'enrollment_count', 'daily', 'updated_at',
+]
+
+
+class DailyStatsSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    reviews = serializers.IntegerField()
+    enrollments = serializers.IntegerField()
+
+
+class StatsSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    # Set by the view: the days of the requested window with activity
+    daily = DailyStatsSerializer(many=True, read_only=True)
+
+
+class CourseStatsSerializer(StatsSerializer):
+    class Meta:
+        model = CourseStats
+        fields = ['course', *STATS_FIELDS]
+
+
+class InstructorStatsSerializer(StatsSerializer):
+    class Meta:
+        model = InstructorStats
+        fields = ['instructor', 'course_count', *STATS_FIELDS]
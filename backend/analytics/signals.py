@@ -0,0 +1,108 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from courses.bulk import lessons_written
+from courses.models import Course, Enrollment, Lesson, Review
+from . import stats
+from .tasks import schedule_enrollment, schedule_lesson_refresh, schedule_review
+
+LESSON_STATS_FIELDS = {'course', 'course_id', 'duration'}
+
+
+@receiver(pre_save, sender=Review)
+def remember_review(sender, instance, **kwargs):
+    """Keep the stored course and rating of an updated review"""
+    if instance._state.adding or instance.pk is None or stats.is_suspended():
+        return
+    instance._stats_previous = Review.objects.filter(pk=instance.pk).values(
+        'course_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, using=None, **kwargs):
+    if stats.is_suspended():
+        return
+    if created:
+        schedule_review(instance.course_id, instance.rating, instance.created_at, using=using)
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous and (previous['course_id'], previous['rating']) != (
+            instance.course_id, instance.rating):
+        schedule_review(previous['course_id'], previous['rating'], instance.created_at, -1,
+                        using=using)
+        schedule_review(instance.course_id, instance.rating, instance.created_at, using=using)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, using=None, **kwargs):
+    if not stats.is_suspended():
+        schedule_review(instance.course_id, instance.rating, instance.created_at, -1,
+                        using=using)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, using=None, **kwargs):
+    if created and not stats.is_suspended():
+        schedule_enrollment(instance.course_id, instance.created_at, using=using)
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, using=None, **kwargs):
+    if not stats.is_suspended():
+        schedule_enrollment(instance.course_id, instance.created_at, -1, using=using)
+
+
+@receiver(post_save, sender=Lesson)
+def count_lesson(sender, instance, update_fields=None, using=None, **kwargs):
+    if stats.is_suspended():
+        return
+    if update_fields is not None and not LESSON_STATS_FIELDS & set(update_fields):
+        return
+    schedule_lesson_refresh(instance.course_id, using=using)
+
+
+@receiver(post_delete, sender=Lesson)
+def uncount_lesson(sender, instance, using=None, **kwargs):
+    if not stats.is_suspended():
+        schedule_lesson_refresh(instance.course_id, using=using)
+
+
+@receiver(lessons_written)
+def count_written_lessons(sender, course, **kwargs):
+    if not stats.is_suspended():
+        schedule_lesson_refresh(course.pk)
+
+
+@receiver(pre_save, sender=Course)
+def remember_instructor(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored instructor of a course that may be handed over"""
+    if instance._state.adding or stats.is_suspended():
+        return
+    if update_fields is not None and not {'instructor', 'instructor_id'} & set(update_fields):
+        return
+    instance._stats_instructor_id = Course.objects.filter(pk=instance.pk).values_list(
+        'instructor_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def count_course(sender, instance, created, **kwargs):
+    if stats.is_suspended():
+        return
+    if created:
+        stats.course_created(instance)
+        return
+    previous = getattr(instance, '_stats_instructor_id', None)
+    if previous is not None and previous != instance.instructor_id:
+        stats.rebuild_instructors([previous, instance.instructor_id])
+
+
+@receiver(pre_delete, sender=Course)
+def remember_deleted_course(sender, instance, **kwargs):
+    if not stats.is_suspended():
+        stats.course_deleting(instance)
+
+
+@receiver(post_delete, sender=Course)
+def uncount_course(sender, instance, **kwargs):
+    if not stats.is_suspended():
+        stats.course_deleted(instance)
@@ -0,0 +1,278 @@
+"""
+Maintenance of the statistics rollups in analytics.models.
+
+Writes to reviews, enrollments, lessons and courses adjust the rollups
+incrementally (see analytics.signals): a review adds one to its course's
+and its instructor's counters and to the daily row of the day it was
+created, with single `UPDATE ... SET n = n + 1` statements, so reading
+statistics never aggregates the underlying tables. Reviews, enrollments
+and lessons queue their changes as tasks (analytics.tasks) that run once
+the write commits, so requests never wait on the hot counter rows of a
+popular course or instructor; changes queued for a course that has since
+been deleted find no rows and are dropped.
+
+Counters of a course or instructor are only ever created by
+`course_created` or a rebuild; increments against a missing row are
+dropped, and `rebuild` (the `rebuild_stats` command) recomputes
+everything from the source tables. Code that writes many rows at once
+(imports, seeding, cascading deletes of whole datasets) can skip the
+per-row work inside `suspended()` and rebuild afterwards.
+"""
+import contextvars
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from courses.models import Course, Enrollment, Lesson, Review
+from .models import (
+    RATINGS, CourseDailyStats, CourseStats, InstructorDailyStats, InstructorStats,
+)
+
+TOTAL_FIELDS = [
+    'review_count', 'rating_sum', *(f'rating_{rating}' for rating in RATINGS),
+    'lesson_count', 'total_duration', 'enrollment_count',
+]
+DAILY_FIELDS = ['reviews', 'enrollments']
+
+_suspended = contextvars.ContextVar('analytics_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """Skip incremental updates inside the block; rebuild afterwards"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def increment(model, lookup, deltas, create=False):
+    """
+    Add `deltas` to the counters of the `model` row matching `lookup`.
+    With `create`, a missing row is created from the deltas if none of
+    them is negative.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if hasattr(model, 'updated_at'):
+        updates['updated_at'] = timezone.now()
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    if not create or min(deltas.values()) < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**lookup).update(**updates)
+
+
+def instructor_of(course_id):
+    return Course.objects.filter(pk=course_id).values_list('instructor_id', flat=True).first()
+
+
+def apply(course_id, totals=None, date=None, daily=None, instructor_id=None):
+    """Apply counter changes to a course, its instructor and their daily rows"""
+    if instructor_id is None:
+        instructor_id = instructor_of(course_id)
+        if instructor_id is None:
+            # Queued before the course was deleted, with its rollups
+            return
+    if totals:
+        increment(CourseStats, {'course_id': course_id}, totals)
+        if instructor_id is not None:
+            increment(InstructorStats, {'instructor_id': instructor_id}, totals)
+    if daily:
+        increment(CourseDailyStats, {'course_id': course_id, 'date': date}, daily, create=True)
+        if instructor_id is not None:
+            increment(InstructorDailyStats,
+                      {'instructor_id': instructor_id, 'date': date}, daily, create=True)
+
+
+def day_of(created_at):
+    return timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+
+
+def record_review(course_id, rating, date, sign=1):
+    """Count (sign=1) or uncount (sign=-1) a review created on `date`"""
+    apply(course_id, {
+        'review_count': sign,
+        'rating_sum': sign * rating,
+        f'rating_{rating}': sign,
+    }, date, {'reviews': sign})
+
+
+def record_enrollment(course_id, date, sign=1):
+    """Count (sign=1) or uncount (sign=-1) an enrollment created on `date`"""
+    apply(course_id, {'enrollment_count': sign}, date, {'enrollments': sign})
+
+
+def refresh_lessons(course_id):
+    """
+    Recount the lessons and total duration of a course. Lessons per course
+    are few, and recounting them also covers bulk writes and moves.
+    """
+    totals = Lesson.objects.filter(course_id=course_id).aggregate(
+        lesson_count=Count('id'), total_duration=Sum('duration'))
+    totals['total_duration'] = totals['total_duration'] or 0
+    with transaction.atomic():
+        current = CourseStats.objects.select_for_update().filter(
+            course_id=course_id).values('lesson_count', 'total_duration').first()
+        if current is None:
+            return
+        apply(course_id, {field: totals[field] - current[field] for field in totals})
+
+
+def course_deleting(course):
+    """
+    Remember what a course being deleted adds to its instructor's rollups.
+    Its reviews, lessons and enrollments go with it, and the changes they
+    queue are dropped once the course is gone.
+    """
+    course._stats_totals = CourseStats.objects.filter(course_id=course.pk).values(
+        *TOTAL_FIELDS).first()
+    course._stats_daily = list(CourseDailyStats.objects.filter(course_id=course.pk).values(
+        'date', *DAILY_FIELDS))
+
+
+def course_deleted(course):
+    totals = getattr(course, '_stats_totals', None) or {}
+    increment(InstructorStats, {'instructor_id': course.instructor_id}, {
+        'course_count': -1, **{field: -value for field, value in totals.items()}})
+    for row in getattr(course, '_stats_daily', []):
+        increment(InstructorDailyStats,
+                  {'instructor_id': course.instructor_id, 'date': row['date']},
+                  {field: -row[field] for field in DAILY_FIELDS})
+
+
+def course_created(course):
+    CourseStats.objects.get_or_create(course_id=course.pk)
+    if not InstructorStats.objects.filter(instructor_id=course.instructor_id).exists():
+        rebuild_instructors([course.instructor_id])
+    else:
+        increment(InstructorStats, {'instructor_id': course.instructor_id}, {'course_count': 1})
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def rebuild(course_ids=None, chunk_size=1000):
+    """
+    Recompute the rollups of the given courses (all by default) and of
+    their instructors from the source tables. Returns the number of
+    courses rebuilt.
+    """
+    courses = Course.objects.order_by('pk')
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    instructor_ids = set()
+    count = 0
+    for chunk in chunked(courses.values_list('pk', 'instructor_id').iterator(), chunk_size):
+        rebuild_courses([pk for pk, _ in chunk])
+        instructor_ids.update(instructor_id for _, instructor_id in chunk)
+        count += len(chunk)
+    if course_ids is None:
+        rebuild_instructors(chunk_size=chunk_size)
+    else:
+        rebuild_instructors(instructor_ids, chunk_size)
+    return count
+
+
+def daily_counts(queryset, owner):
+    return queryset.annotate(date=TruncDate('created_at')).values(owner, 'date').annotate(
+        count=Count('id')).values_list(owner, 'date', 'count')
+
+
+@transaction.atomic
+def rebuild_courses(course_ids):
+    stats = {pk: CourseStats(course_id=pk) for pk in course_ids}
+    reviews = Review.objects.filter(course_id__in=course_ids)
+    enrollments = Enrollment.objects.filter(course_id__in=course_ids)
+
+    for course_id, rating, count in reviews.values('course_id', 'rating').annotate(
+            count=Count('id')).values_list('course_id', 'rating', 'count'):
+        row = stats[course_id]
+        row.review_count += count
+        row.rating_sum += rating * count
+        setattr(row, f'rating_{rating}', count)
+    for course_id, count, duration in Lesson.objects.filter(
+            course_id__in=course_ids).values('course_id').annotate(
+            count=Count('id'), duration=Sum('duration')).values_list(
+            'course_id', 'count', 'duration'):
+        stats[course_id].lesson_count = count
+        stats[course_id].total_duration = duration or 0
+    for course_id, count in enrollments.values('course_id').annotate(
+            count=Count('id')).values_list('course_id', 'count'):
+        stats[course_id].enrollment_count = count
+
+    daily = {}
+    for course_id, date, count in daily_counts(reviews, 'course_id'):
+        daily.setdefault((course_id, date), CourseDailyStats(
+            course_id=course_id, date=date)).reviews = count
+    for course_id, date, count in daily_counts(enrollments, 'course_id'):
+        daily.setdefault((course_id, date), CourseDailyStats(
+            course_id=course_id, date=date)).enrollments = count
+
+    CourseStats.objects.filter(course_id__in=course_ids).delete()
+    CourseDailyStats.objects.filter(course_id__in=course_ids).delete()
+    CourseStats.objects.bulk_create(stats.values())
+    CourseDailyStats.objects.bulk_create(daily.values())
+
+
+def rebuild_instructors(instructor_ids=None, chunk_size=1000):
+    """
+    Recompute instructor rollups by summing their courses' rollups; all
+    instructors with courses by default
+    """
+    if instructor_ids is None:
+        InstructorStats.objects.exclude(
+            instructor_id__in=Course.objects.values('instructor_id')).delete()
+        InstructorDailyStats.objects.exclude(
+            instructor_id__in=Course.objects.values('instructor_id')).delete()
+        instructor_ids = Course.objects.order_by('instructor_id').values_list(
+            'instructor_id', flat=True).distinct().iterator()
+    for chunk in chunked(instructor_ids, chunk_size):
+        rebuild_instructor_chunk(chunk)
+
+
+@transaction.atomic
+def rebuild_instructor_chunk(instructor_ids):
+    courses = CourseStats.objects.filter(course__instructor_id__in=instructor_ids)
+    stats = {pk: InstructorStats(instructor_id=pk) for pk in instructor_ids}
+    # Aliased, annotations may not shadow model fields
+    for row in courses.values('course__instructor_id').annotate(
+            total_course_count=Count('course_id'),
+            **{f'total_{field}': Sum(field) for field in TOTAL_FIELDS}).order_by():
+        instructor = stats[row['course__instructor_id']]
+        for field in ['course_count', *TOTAL_FIELDS]:
+            setattr(instructor, field, row[f'total_{field}'] or 0)
+
+    daily = [
+        InstructorDailyStats(
+            instructor_id=row['course__instructor_id'], date=row['date'],
+            **{field: row[f'total_{field}'] for field in DAILY_FIELDS})
+        for row in CourseDailyStats.objects.filter(
+            course__instructor_id__in=instructor_ids).values(
+            'course__instructor_id', 'date').annotate(
+            **{f'total_{field}': Sum(field) for field in DAILY_FIELDS}).order_by()
+    ]
+
+    InstructorStats.objects.filter(instructor_id__in=instructor_ids).delete()
+    InstructorDailyStats.objects.filter(instructor_id__in=instructor_ids).delete()
+    InstructorStats.objects.bulk_create(stats.values())
+    InstructorDailyStats.objects.bulk_create(daily)
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.db import transaction
+
+from tasks.core import task
+
+from . import stats
+
+
+@task
+def record_review_stats(course_id, rating, day, sign=1):
+    """Count (sign=1) or uncount (sign=-1) a review in the rollups"""
+    # All or nothing, so a retried job never counts twice
+    with transaction.atomic():
+        stats.record_review(course_id, rating, date.fromisoformat(day), sign)
+
+
+@task
+def record_enrollment_stats(course_id, day, sign=1):
+    """Count (sign=1) or uncount (sign=-1) an enrollment in the rollups"""
+    with transaction.atomic():
+        stats.record_enrollment(course_id, date.fromisoformat(day), sign)
+
+
+@task
+def refresh_lesson_stats(course_id):
+    """Recount the lessons and total duration of a course"""
+    stats.refresh_lessons(course_id)
+
+
+def schedule_review(course_id, rating, created_at, sign=1, using=None):
+    """Count or uncount a review once the transaction commits"""
+    record_review_stats.enqueue(
+        args=(course_id, rating, stats.day_of(created_at).isoformat(), sign), using=using)
+
+
+def schedule_enrollment(course_id, created_at, sign=1, using=None):
+    """Count or uncount an enrollment once the transaction commits"""
+    record_enrollment_stats.enqueue(
+        args=(course_id, stats.day_of(created_at).isoformat(), sign), using=using)
+
+
+def schedule_lesson_refresh(course_id, using=None):
+    # A recount covers every write before it, so bursts collapse into one
+    refresh_lesson_stats.enqueue(
+        args=(course_id,), key=f'course-lessons:{course_id}', using=using)
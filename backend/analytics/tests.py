@@ -0,0 +1,174 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from courses.models import Category, Course, Enrollment, Lesson, Review
+from lms_backend.testing import create_user
+from . import stats
+from .models import CourseDailyStats, CourseStats, InstructorDailyStats, InstructorStats
+
+User = get_user_model()
+
+
+@override_settings(TASKS={'BACKEND': 'immediate'})
+class StatsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.other = create_user('other', User.INSTRUCTOR)
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(6)]
+        cls.category = Category.objects.create(name='Web', slug='web')
+
+    def create_course(self, slug, instructor=None):
+        return Course.objects.create(
+            title=slug, slug=slug, description='...', price=10,
+            instructor=instructor or self.instructor, category=self.category)
+
+    def populate(self, course, reviews):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.write(course, reviews)
+
+    def write(self, course, reviews):
+        for order, duration in enumerate([10, 20, None], start=1):
+            Lesson.objects.create(
+                course=course, title=f'Lesson {order}', order=order,
+                content='...', duration=duration)
+        for student, rating in zip(self.students, reviews):
+            Enrollment.objects.create(student=student, course=course)
+            Review.objects.create(course=course, user=student, rating=rating)
+
+    def snapshot(self):
+        def rows(model, *order):
+            return [
+                {key: value for key, value in row.items() if key not in ('id', 'updated_at')}
+                for row in model.objects.order_by(*order).values()
+            ]
+        return (rows(CourseStats, 'course_id'), rows(InstructorStats, 'instructor_id'),
+                rows(CourseDailyStats, 'course_id', 'date'),
+                rows(InstructorDailyStats, 'instructor_id', 'date'))
+
+    def test_incremental_updates_match_rebuild(self):
+        first, second = self.create_course('first'), self.create_course('second')
+        self.populate(first, [5, 4, 4, 1])
+        self.populate(second, [3, 5])
+
+        third = self.create_course('third')
+        self.populate(third, [2, 5])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.get(course=first, user=self.students[0])
+            review.rating = 2
+            review.save()
+            Review.objects.get(course=second, user=self.students[1]).delete()
+            Enrollment.objects.get(course=first, student=self.students[3]).delete()
+            lesson = first.lessons.get(order=2)
+            lesson.duration = 45
+            lesson.save()
+            second.lessons.get(order=3).delete()
+            second.instructor = self.other
+            second.save()
+            third.delete()
+
+        incremental = self.snapshot()
+        stats.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+        course_stats = CourseStats.objects.get(course=first)
+        self.assertEqual(course_stats.rating_histogram,
+                         {'1': 1, '2': 1, '3': 0, '4': 2, '5': 0})
+        self.assertEqual((course_stats.lesson_count, course_stats.total_duration), (3, 55))
+        self.assertEqual(course_stats.enrollment_count, 3)
+        self.assertEqual(InstructorStats.objects.get(instructor=self.other).course_count, 1)
+
+    def test_rollups_change_once_writes_commit(self):
+        course = self.create_course('queued')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.write(course, [5, 4])
+            # The hot rows are left alone inside the writing transaction
+            self.assertEqual(CourseStats.objects.get(course=course).review_count, 0)
+            self.assertEqual(InstructorStats.objects.get(
+                instructor=self.instructor).enrollment_count, 0)
+        course_stats = CourseStats.objects.get(course=course)
+        self.assertEqual((course_stats.review_count, course_stats.lesson_count), (2, 3))
+        self.assertEqual(InstructorStats.objects.get(
+            instructor=self.instructor).enrollment_count, 2)
+
+        # Rolled back writes are never counted
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Review.objects.filter(course=course).delete()
+                raise RuntimeError
+        self.assertEqual(CourseStats.objects.get(course=course).review_count, 2)
+
+    def test_changes_queued_for_deleted_courses_are_dropped(self):
+        course = self.create_course('gone')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Review.objects.create(course=course, user=self.students[0], rating=4)
+        course.delete()
+        for callback in callbacks:
+            callback()
+        self.assertFalse(CourseDailyStats.objects.exists())
+        self.assertEqual(InstructorStats.objects.get(instructor=self.instructor).review_count, 0)
+
+    def test_failed_course_delete_keeps_counting(self):
+        course = self.create_course('kept')
+        self.populate(course, [5, 3])
+        with mock.patch.object(stats, 'course_deleted', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                course.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.get(course=course, user=self.students[0]).delete()
+        course_stats = CourseStats.objects.get(course=course)
+        self.assertEqual((course_stats.review_count, course_stats.rating_sum), (1, 3))
+
+    def test_endpoints_read_constant_rows(self):
+        course = self.create_course('stats')
+        self.client.force_authenticate(self.instructor)
+        urls = [f'/api/courses/{course.pk}/stats/',
+                f'/api/instructors/{self.instructor.pk}/stats/']
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries), response.data
+
+        small = [count_queries(url)[0] for url in urls]
+        self.populate(course, [5, 4, 3, 2, 1, 5])
+        large = [count_queries(url) for url in urls]
+        self.assertEqual(small, [queries for queries, _ in large])
+        self.assertEqual(large[0][1]['review_count'], 6)
+        self.assertEqual(large[1][1]['daily'][0]['enrollments'], 6)
+
+    def test_endpoints_are_private(self):
+        course = self.create_course('private')
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f'/api/courses/{course.pk}/stats/').status_code, 403)
+        self.assertEqual(
+            self.client.get(f'/api/instructors/{self.instructor.pk}/stats/').status_code, 403)
+        self.assertEqual(self.client.get('/api/courses/0/stats/').status_code, 404)
+
+    def test_missing_rollups_are_rebuilt_for_authorized_users_only(self):
+        course = self.create_course('missing')
+        self.populate(course, [5, 3])
+        CourseStats.objects.all().delete()
+        InstructorStats.objects.all().delete()
+        course_url = f'/api/courses/{course.pk}/stats/'
+        instructor_url = f'/api/instructors/{self.instructor.pk}/stats/'
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(course_url).status_code, 403)
+        self.assertEqual(self.client.get(instructor_url).status_code, 403)
+        self.assertFalse(CourseStats.objects.exists())
+        self.assertFalse(InstructorStats.objects.exists())
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(course_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['review_count'], 2)
+        self.assertEqual(self.client.get(instructor_url).status_code, 200)
+        self.assertTrue(InstructorStats.objects.filter(instructor=self.instructor).exists())
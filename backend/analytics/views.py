@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import permissions, serializers, viewsets
+from rest_framework.response import Response
+
+from courses.models import Course
+from lms_backend.profiling import ProfiledViewMixin
+from users.permissions import IsOwnerOrAdmin
+from . import stats
+from .models import CourseDailyStats, CourseStats, InstructorDailyStats, InstructorStats
+from .serializers import CourseStatsSerializer, InstructorStatsSerializer
+
+User = get_user_model()
+
+
+class StatsViewSet(ProfiledViewMixin, viewsets.GenericViewSet):
+    """
+    Pre-aggregated statistics with the daily activity of the last `days`
+    days (30 by default). Reads a fixed number of rows whatever the number
+    of reviews and enrollments behind them.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    default_days = 30
+    max_days = 365
+
+    def get_days(self):
+        field = serializers.IntegerField(min_value=1, max_value=self.max_days)
+        try:
+            return field.run_validation(
+                self.request.query_params.get('days', self.default_days))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'days': exc.detail})
+
+    def get_daily(self, queryset):
+        since = timezone.localdate() - timedelta(days=self.get_days() - 1)
+        return list(queryset.filter(date__gte=since).order_by('date').values(
+            'date', 'reviews', 'enrollments'))
+
+    def respond(self, obj, daily):
+        obj.daily = self.get_daily(daily)
+        return Response(self.get_serializer(obj).data)
+
+
+class CourseStatsViewSet(StatsViewSet):
+    """
+    Statistics of one course, at /api/courses/{id}/stats/, for its
+    instructor and admins
+    """
+    serializer_class = CourseStatsSerializer
+
+    def get_object(self):
+        pk = self.kwargs['pk']
+        queryset = CourseStats.objects.select_related('course').only(
+            *stats.TOTAL_FIELDS, 'updated_at', 'course__instructor_id')
+        course_stats = queryset.filter(course_id=pk).first()
+        if course_stats is not None:
+            self.check_object_permissions(self.request, course_stats.course)
+            return course_stats
+        # Courses created before the rollups existed, rebuilt only for
+        # users allowed to read them
+        course = Course.objects.only('instructor_id').filter(pk=pk).first()
+        if course is None:
+            raise Http404
+        self.check_object_permissions(self.request, course)
+        stats.rebuild([pk])
+        return queryset.get(course_id=pk)
+
+    def retrieve(self, request, pk=None):
+        return self.respond(self.get_object(), CourseDailyStats.objects.filter(course_id=pk))
+
+
+class InstructorStatsViewSet(StatsViewSet):
+    """
+    Statistics over all courses of an instructor, at
+    /api/instructors/{id}/stats/, for the instructor and admins
+    """
+    serializer_class = InstructorStatsSerializer
+
+    def get_object(self):
+        pk = self.kwargs['pk']
+        instructor_stats = InstructorStats.objects.filter(instructor_id=pk).first()
+        if instructor_stats is not None:
+            self.check_object_permissions(self.request, instructor_stats)
+            return instructor_stats
+        if not (User.objects.filter(pk=pk, role=User.INSTRUCTOR).exists()
+                or Course.objects.filter(instructor_id=pk).exists()):
+            raise Http404
+        # Checked against an unsaved row, before anything is written
+        self.check_object_permissions(self.request, InstructorStats(instructor_id=pk))
+        stats.rebuild_instructors([pk])
+        return InstructorStats.objects.get(instructor_id=pk)
+
+    def retrieve(self, request, pk=None):
+        return self.respond(
+            self.get_object(), InstructorDailyStats.objects.filter(instructor_id=pk))
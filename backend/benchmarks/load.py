@@ -0,0 +1,85 @@
+"""
+A closed-loop HTTP load generator for servers started by `bench_asgi`.
+
+`concurrency` clients each keep one HTTP/1.1 keep-alive connection and
+send the next request as soon as the previous response is read, for
+`duration` seconds. Plain asyncio streams are enough for the JSON
+responses the API sends (always with Content-Length), and keep the
+generator itself from becoming the bottleneck.
+"""
+import asyncio
+import time
+
+from .runner import PERCENTILES, percentile
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if 'content-length' not in headers:
+        raise ValueError('Response without Content-Length')
+    body = await reader.readexactly(int(headers['content-length']))
+    return status, body
+
+
+async def client(host, port, request, deadline, timings, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _ = await read_response(reader)
+            if status != 200:
+                errors.append(status)
+            else:
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+
+async def wait_for_server(host, port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+        else:
+            writer.close()
+            return
+
+
+def run_load(host, port, path, headers=None, concurrency=32, duration=10.0):
+    """Throughput and latency percentiles of GET `path` under load"""
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: keep-alive']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def main():
+        await wait_for_server(host, port)
+        timings, errors = [], []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            client(host, port, request, deadline, timings, errors)
+            for _ in range(concurrency)))
+        return timings, errors, time.perf_counter() - started
+
+    timings, errors, elapsed = asyncio.run(main())
+    result = {
+        'requests': len(timings),
+        'errors': len(errors),
+        'requests_per_second': len(timings) / elapsed,
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = percentile(timings, p) if timings else None
+    return result
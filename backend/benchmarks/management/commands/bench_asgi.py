@@ -0,0 +1,111 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from benchmarks.load import run_load
+from benchmarks.runner import PERCENTILES
+from benchmarks.scenarios import Fixtures
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# (name, uvicorn application, interface, route)
+TARGETS = [
+    ('wsgi', 'lms_backend.wsgi:application', 'wsgi', 'course-{endpoint}'),
+    ('asgi-sync', 'lms_backend.asgi:application', 'asgi3', 'course-{endpoint}'),
+    ('asgi-async', 'lms_backend.asgi:application', 'asgi3', 'async-course-{endpoint}'),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput per worker of the WSGI app, the sync views under '
+            'ASGI and the async read path, each served by one uvicorn worker')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=['list', 'detail'], action='append',
+                            dest='endpoints', help='Endpoints to load (repeatable)')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Concurrent keep-alive clients')
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds of load per target and endpoint')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Leave the catalog response cache enabled')
+        parser.add_argument('--with-rate-limits', action='store_true',
+                            help='Leave rate limiting and load shedding enabled')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('bench_asgi needs uvicorn (pip install uvicorn)')
+        try:
+            fixtures = Fixtures()
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        token = RefreshToken.for_user(fixtures.student).access_token
+        headers = {'Authorization': f'Bearer {token}'}
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'lms_backend.settings'),
+            'CATALOG_CACHE_ENABLED': '1' if options['with_cache'] else '0',
+            'PROFILING_SAMPLE_RATE': '0',
+            'RATE_LIMITS_ENABLED': '1' if options['with_rate_limits'] else '0',
+            'SHEDDING_ENABLED': '1' if options['with_rate_limits'] else '0',
+        }
+
+        results = {}
+        self.stdout.write(f"{'endpoint':<10}{'target':<12}{'req/s':>10}"
+                          + ''.join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+                          + f"{'errors':>8}")
+        for endpoint in options['endpoints'] or ['list', 'detail']:
+            for name, app, interface, route in TARGETS:
+                kwargs = {'pk': fixtures.popular_course.pk} if endpoint == 'detail' else {}
+                path = reverse(route.format(endpoint=endpoint), kwargs=kwargs)
+                result = self.load(app, interface, env, path, headers, options)
+                results.setdefault(endpoint, {})[name] = result
+                self.stdout.write(
+                    f"{endpoint:<10}{name:<12}{result['requests_per_second']:>10.1f}"
+                    + ''.join(f"{result[f'p{p}_ms'] or 0:>10.2f}" for p in PERCENTILES)
+                    + f"{result['errors']:>8}")
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'database': settings.DATABASES['default']['ENGINE'],
+                    'concurrency': options['concurrency'],
+                    'duration': options['duration'],
+                    'catalog_cache': options['with_cache'],
+                    'workers': 1,
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def load(self, app, interface, env, path, headers, options):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', app, '--interface', interface,
+             '--host', '127.0.0.1', '--port', str(port), '--workers', '1',
+             '--no-access-log', '--log-level', 'warning'],
+            env=env, cwd=settings.BASE_DIR)
+        try:
+            return run_load('127.0.0.1', port, path, headers,
+                            options['concurrency'], options['duration'])
+        finally:
+            server.terminate()
+            server.wait()
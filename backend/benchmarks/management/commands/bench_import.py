@@ -0,0 +1,83 @@
+import csv
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import SEED_PASSWORD, SEED_PREFIX
+from users.importer import import_users
+from users.serializers import AdminUserSerializer
+
+User = get_user_model()
+
+IMPORT_PREFIX = f'{SEED_PREFIX}import-'
+FIELDS = ['email', 'username', 'phone', 'first_name', 'last_name', 'role', 'password']
+
+
+def make_rows(start, count, passwords):
+    for i in range(start, start + count):
+        yield {
+            'email': f'{IMPORT_PREFIX}{i}@example.com',
+            'username': f'{IMPORT_PREFIX}{i}',
+            'phone': f'+1555{i:07d}',
+            'first_name': 'Imported',
+            'last_name': f'Student {i}',
+            'role': User.STUDENT,
+            'password': SEED_PASSWORD if passwords else '',
+        }
+
+
+class Command(BaseCommand):
+    help = ('Measure user import throughput in rows per second, against creating '
+            'the same users one at a time as POST /api/users/ does')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000,
+                            help='Rows imported in bulk')
+        parser.add_argument('--baseline-rows', type=int, default=500,
+                            help='Rows created one at a time for comparison, 0 to skip')
+        parser.add_argument('--passwords', action='store_true',
+                            help='Give every row a password to hash')
+        parser.add_argument('--workers', type=int,
+                            help='Password hashing processes (default: one per CPU)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        User.objects.filter(username__startswith=IMPORT_PREFIX).delete()
+        try:
+            if options['baseline_rows']:
+                self.baseline(options)
+            self.bulk(options)
+        finally:
+            User.objects.filter(username__startswith=IMPORT_PREFIX).delete()
+
+    def report(self, name, rows, seconds):
+        self.stdout.write(f'{name:<12}{rows:>8} rows {seconds:>8.2f}s '
+                          f'{rows / seconds:>10.0f} rows/s')
+
+    def baseline(self, options):
+        rows = list(make_rows(0, options['baseline_rows'], options['passwords']))
+        started = time.perf_counter()
+        for row in rows:
+            serializer = AdminUserSerializer(data=row)
+            serializer.is_valid(raise_exception=True)
+            user = serializer.save()
+            if row['password']:
+                user.set_password(row['password'])
+                user.save()
+        self.report('per-row', len(rows), time.perf_counter() - started)
+
+    def bulk(self, options):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, FIELDS)
+        writer.writeheader()
+        writer.writerows(make_rows(options['baseline_rows'], options['rows'],
+                                   options['passwords']))
+        buffer.seek(0)
+
+        report = import_users(buffer, 'csv', chunk_size=options['chunk_size'],
+                              workers=options['workers'])
+        if report.errors:
+            self.stderr.write(f'{len(report.errors)} row(s) failed, first: {report.errors[0]}')
+        self.report('bulk', report.rows, report.seconds)
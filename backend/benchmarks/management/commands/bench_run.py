@@ -0,0 +1,96 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from benchmarks import runner
+from benchmarks.scenarios import SCENARIOS, Fixtures, select
+from courses import cache
+
+
+class Command(BaseCommand):
+    help = ('Replay the API endpoints against the seeded catalog and report '
+            'latency percentiles, queries and bytes per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Untimed requests per scenario before measuring')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run the named scenario (repeatable)')
+        parser.add_argument('--tag', action='append', dest='tags',
+                            help='Only run scenarios with this tag (repeatable)')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Leave the catalog response cache enabled')
+        parser.add_argument('--with-profiling', action='store_true',
+                            help='Profile every request with the profiling middleware')
+        parser.add_argument('--with-rate-limits', action='store_true',
+                            help='Leave rate limiting and load shedding enabled')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON report of an earlier run to compare against')
+        parser.add_argument('--list', action='store_true',
+                            help='List the available scenarios and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for scenario in SCENARIOS:
+                self.stdout.write(
+                    f"{scenario.name:<28}{scenario.method.upper():<6}{scenario.route:<22}"
+                    f"{','.join(scenario.tags)}")
+            return
+
+        try:
+            scenarios = select(options['scenarios'], options['tags'])
+            fixtures = Fixtures()
+        except KeyError as exc:
+            raise CommandError(f'Unknown scenario: {exc.args[0]}')
+        except LookupError as exc:
+            raise CommandError(str(exc))
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        catalog_cache = {**cache.DEFAULTS, **getattr(settings, 'CATALOG_CACHE', {})}
+        catalog_cache['ENABLED'] = catalog_cache['ENABLED'] and options['with_cache']
+
+        self.stdout.write(runner.HEADER)
+        profiling = {**getattr(settings, 'PROFILING', {}), 'ENABLED': options['with_profiling']}
+        if options['with_profiling']:
+            profiling['SAMPLE_RATE'] = 1.0
+        # Every scenario is replayed from one client, which the rate limits
+        # would soon turn away
+        rate_limits = {**getattr(settings, 'RATE_LIMITS', {})}
+        shedding = {**getattr(settings, 'SHEDDING', {})}
+        if not options['with_rate_limits']:
+            rate_limits['ENABLED'] = shedding['ENABLED'] = False
+        with override_settings(CATALOG_CACHE=catalog_cache, PROFILING=profiling,
+                               RATE_LIMITS=rate_limits, SHEDDING=shedding):
+            try:
+                report = runner.run(scenarios, fixtures, options['iterations'],
+                                    options['warmup'], stdout=self.stdout)
+            except AssertionError as exc:
+                raise CommandError(str(exc))
+        report['meta']['catalog_cache'] = catalog_cache['ENABLED']
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            self.write_comparison(runner.compare(baseline, report))
+
+    def write_comparison(self, deltas):
+        self.stdout.write('')
+        self.stdout.write(f"{'scenario':<28}{'p50':>9}{'p95':>9}{'p99':>9}"
+                          f"{'queries':>9}{'bytes':>10}")
+        for name, delta in deltas.items():
+            latencies = ''.join(
+                f"{'n/a' if delta[key] is None else f'{delta[key]:+.1%}':>9}"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+            self.stdout.write(
+                f"{name:<28}{latencies}{delta['queries']:>+9}{delta['bytes']:>+10}")
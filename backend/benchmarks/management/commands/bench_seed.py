@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import PROFILES, flush, seed
+
+
+class Command(BaseCommand):
+    help = 'Seed a benchmark catalog with bulk inserts, or remove it again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(PROFILES), default='small',
+                            help='Data volume to seed')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, for reproducible datasets')
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete previously seeded data first')
+        parser.add_argument('--flush-only', action='store_true',
+                            help='Delete previously seeded data and stop')
+
+    def handle(self, *args, **options):
+        if options['flush'] or options['flush_only']:
+            flush()
+            self.stdout.write('Removed seeded benchmark data')
+            if options['flush_only']:
+                return
+
+        counts = seed(options['profile'], seed=options['seed'], stdout=self.stdout)
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary}'))
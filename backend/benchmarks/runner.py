@@ -0,0 +1,130 @@
+"""
+Replay scenarios through the test client and collect latency, query and
+payload statistics.
+
+Requests go through the full middleware, authentication, permission and
+rendering stack, so the numbers track what a deployed worker spends per
+request minus the network. Results are plain dicts, written out as JSON by
+`bench_run` so two runs can be diffed.
+"""
+import math
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .seed import dataset_size
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def make_client(user=None):
+    client = APIClient(SERVER_NAME='localhost')
+    if user is not None:
+        token = RefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def run_scenario(scenario, fixtures, iterations=50, warmup=5):
+    user = {'student': fixtures.student, 'admin': fixtures.admin}.get(scenario.user)
+    client = make_client(user)
+    url, params = scenario.build(fixtures)
+    request = getattr(client, scenario.method)
+    if scenario.method == 'get':
+        send = lambda: request(url, params)  # noqa: E731
+    else:
+        # Built per request, so scenarios can create a new object each time
+        send = lambda: request(  # noqa: E731
+            url, scenario.data(fixtures) if scenario.data else {}, format='json')
+
+    for _ in range(warmup):
+        send()
+
+    timings, queries, sizes = [], [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - start
+        if response.status_code != scenario.expected_status:
+            raise AssertionError(
+                f'{scenario.name}: expected {scenario.expected_status}, '
+                f'got {response.status_code} from {url}')
+        timings.append(elapsed * 1000)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+
+    result = {
+        'route': scenario.route,
+        'method': scenario.method.upper(),
+        'url': url,
+        'params': params,
+        'iterations': iterations,
+        'mean_ms': sum(timings) / len(timings),
+        'queries': max(queries),
+        'bytes': max(sizes),
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = percentile(timings, p)
+    return result
+
+
+def run(scenarios, fixtures, iterations=50, warmup=5, stdout=None):
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = run_scenario(scenario, fixtures, iterations, warmup)
+        if stdout is not None:
+            stdout.write(format_row(scenario.name, results[scenario.name]))
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'warmup': warmup,
+            'dataset': dataset_size(),
+        },
+        'results': results,
+    }
+
+
+HEADER = (f"{'scenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'queries':>9}{'bytes':>10}")
+
+
+def format_row(name, result):
+    return (f"{name:<28}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+            f"{result['p99_ms']:>9.2f}{result['queries']:>9}{result['bytes']:>10}")
+
+
+def compare(baseline, current):
+    """
+    Per-scenario changes between two reports: relative latency deltas and
+    absolute query/byte deltas, for scenarios present in both
+    """
+    deltas = {}
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        deltas[name] = {
+            **{f'p{p}_ms': relative(before[f'p{p}_ms'], result[f'p{p}_ms'])
+               for p in PERCENTILES},
+            'queries': result['queries'] - before['queries'],
+            'bytes': result['bytes'] - before['bytes'],
+        }
+    return deltas
+
+
+def relative(before, after):
+    return (after - before) / before if before else None
@@ -0,0 +1,114 @@
+"""
+The endpoints replayed by `bench_run`.
+
+Each scenario names a route from lms_backend/urls.py, the user it is
+requested as and how its URL arguments are picked from the seeded data.
+URLs are built with `reverse`, so a renamed or removed route fails loudly
+instead of benchmarking a 404.
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from courses.models import Course, Enrollment
+
+from .seed import SEED_PREFIX, SEED_PASSWORD
+
+User = get_user_model()
+
+
+@dataclass
+class Scenario:
+    name: str
+    route: str
+    method: str = 'get'
+    # 'anonymous', 'student' or 'admin'
+    user: str = 'anonymous'
+    # Builds (kwargs for reverse, query params) from the fixtures
+    arguments: Optional[Callable] = None
+    data: Optional[Callable] = None
+    expected_status: int = 200
+    tags: list = field(default_factory=list)
+
+    def build(self, fixtures):
+        kwargs, params = self.arguments(fixtures) if self.arguments else ({}, {})
+        return reverse(self.route, kwargs=kwargs), params
+
+
+def new_signup(fixtures):
+    """Registration data for a user not seen before, removed by bench_seed --flush"""
+    name = f'{SEED_PREFIX}signup-{uuid.uuid4().hex[:12]}'
+    return {
+        'username': name, 'email': f'{name}@example.com',
+        'password1': SEED_PASSWORD, 'password2': SEED_PASSWORD,
+        'first_name': 'Bench', 'last_name': 'Signup',
+    }
+
+
+class Fixtures:
+    """The seeded objects scenarios are pointed at, looked up once per run"""
+
+    def __init__(self):
+        enrollment = (
+            Enrollment.objects
+            .filter(student__username__startswith=SEED_PREFIX, course__is_published=True)
+            .select_related('student', 'course')
+            .order_by('pk')
+            .first()
+        )
+        if enrollment is None:
+            raise LookupError('No seeded data found, run bench_seed first')
+        self.student = enrollment.student
+        self.course = enrollment.course
+        self.admin = User.objects.filter(
+            username__startswith=SEED_PREFIX, role=User.ADMIN).first()
+        self.search_term = self.course.title.split()[0].lower()
+        self.popular_course = (
+            Course.objects.filter(slug__startswith=SEED_PREFIX, is_published=True)
+            .order_by('-rating_count', 'pk').first()
+        )
+
+
+SCENARIOS = [
+    Scenario('course-list', 'course-list', tags=['catalog']),
+    Scenario('course-list-search', 'course-list', tags=['catalog', 'search'],
+             arguments=lambda f: ({}, {'search': f.search_term})),
+    Scenario('course-list-by-rating', 'course-list', tags=['catalog'],
+             arguments=lambda f: ({}, {'ordering': '-average_rating'})),
+    Scenario('course-list-page-size-100', 'course-list', tags=['catalog'],
+             arguments=lambda f: ({}, {'page_size': 100})),
+    Scenario('course-detail', 'course-detail', tags=['catalog'],
+             arguments=lambda f: ({'pk': f.popular_course.pk}, {})),
+    Scenario('course-lessons', 'course-lessons-list', user='student', tags=['student'],
+             arguments=lambda f: ({'course_pk': f.course.pk}, {})),
+    Scenario('course-reviews', 'course-reviews-list', user='student', tags=['catalog'],
+             arguments=lambda f: ({'course_pk': f.popular_course.pk}, {})),
+    Scenario('category-list', 'category-list', user='student', tags=['catalog']),
+    Scenario('review-list', 'review-list', user='student', tags=['catalog']),
+    Scenario('search', 'search-list', tags=['search'],
+             arguments=lambda f: ({}, {'q': f.search_term})),
+    Scenario('student-lessons', 'lesson-list', user='student', tags=['student'],
+             arguments=lambda f: ({}, {'course_id': f.course.pk})),
+    Scenario('student-enrolled-courses', 'course-enrolled', user='student',
+             tags=['student']),
+    Scenario('admin-students', 'user-students', user='admin', tags=['admin']),
+    Scenario('token-obtain', 'token_obtain_pair', method='post', tags=['auth'],
+             data=lambda f: {'email': f.student.email, 'password': SEED_PASSWORD}),
+    Scenario('registration', 'rest_register', method='post', tags=['auth', 'write'],
+             data=new_signup, expected_status=201),
+]
+
+
+def select(names=None, tags=None):
+    scenarios = SCENARIOS
+    if names:
+        unknown = set(names) - {scenario.name for scenario in SCENARIOS}
+        if unknown:
+            raise KeyError(', '.join(sorted(unknown)))
+        scenarios = [scenario for scenario in scenarios if scenario.name in names]
+    if tags:
+        scenarios = [s for s in scenarios if set(tags) & set(s.tags)]
+    return scenarios
@@ -0,0 +1,185 @@
+"""
+Bulk seeding of a realistic catalog for the benchmark suite.
+
+Everything seeded is tagged with SEED_PREFIX (usernames, emails, slugs) so
+it can be removed again with `flush()` without touching real data.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from analytics import stats
+from courses.models import Category, Course, Enrollment, Lesson, Review
+from courses.search import course_vector, lesson_vector, search_supported
+
+User = get_user_model()
+
+SEED_PREFIX = 'bench-'
+SEED_PASSWORD = 'bench-password'
+
+PROFILES = {
+    'small': {
+        'categories': 10, 'instructors': 20, 'students': 500,
+        'courses': 1_000, 'lessons_per_course': 5, 'reviews_per_course': 10,
+    },
+    'medium': {
+        'categories': 20, 'instructors': 200, 'students': 5_000,
+        'courses': 10_000, 'lessons_per_course': 10, 'reviews_per_course': 20,
+    },
+    'large': {
+        'categories': 50, 'instructors': 2_000, 'students': 50_000,
+        'courses': 100_000, 'lessons_per_course': 12, 'reviews_per_course': 25,
+    },
+}
+
+WORDS = [
+    'python', 'django', 'react', 'typescript', 'docker', 'kubernetes', 'design',
+    'marketing', 'finance', 'statistics', 'machine', 'learning', 'photography',
+    'guitar', 'cooking', 'writing', 'spanish', 'excel', 'leadership', 'security',
+    'network', 'database', 'postgres', 'cloud', 'testing', 'agile', 'product',
+    'drawing', 'animation', 'music', 'physics', 'calculus', 'algebra', 'biology',
+    'chemistry', 'history', 'economics', 'negotiation', 'yoga', 'nutrition',
+]
+
+BATCH_SIZE = 5_000
+
+# Courses are generated in chunks so lessons and reviews never all sit in
+# memory at once
+COURSE_CHUNK = 1_000
+
+
+def words(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+def seed_users(role, count, password):
+    users = (
+        User(
+            username=f'{SEED_PREFIX}{role}-{i}',
+            email=f'{SEED_PREFIX}{role}-{i}@example.com',
+            first_name=role.title(), last_name=str(i),
+            role=role, password=password,
+        )
+        for i in range(count)
+    )
+    created = []
+    batch = []
+    for user in users:
+        batch.append(user)
+        if len(batch) == BATCH_SIZE:
+            created += User.objects.bulk_create(batch)
+            batch = []
+    created += User.objects.bulk_create(batch)
+    return [user.pk for user in created]
+
+
+def seed(profile='small', seed=0, stdout=None):
+    """Seed the given profile and return the number of rows per model"""
+    sizes = PROFILES[profile]
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        categories = Category.objects.bulk_create(
+            Category(name=f'Category {i}', slug=f'{SEED_PREFIX}category-{i}')
+            for i in range(sizes['categories']))
+        instructor_ids = seed_users(User.INSTRUCTOR, sizes['instructors'], password)
+        student_ids = seed_users(User.STUDENT, sizes['students'], password)
+        seed_users(User.ADMIN, 1, password)
+    log(f"Seeded {len(instructor_ids)} instructors and {len(student_ids)} students")
+
+    counts = {'courses': 0, 'lessons': 0, 'reviews': 0, 'enrollments': 0}
+    reviewers_per_course = min(sizes['reviews_per_course'], len(student_ids))
+    for start in range(0, sizes['courses'], COURSE_CHUNK):
+        stop = min(start + COURSE_CHUNK, sizes['courses'])
+        with transaction.atomic():
+            seed_course_chunk(
+                rng, range(start, stop), categories, instructor_ids, student_ids,
+                sizes['lessons_per_course'], reviewers_per_course, counts)
+        log(f"Seeded {counts['courses']}/{sizes['courses']} courses")
+
+    if search_supported(Course):
+        seeded = Course.objects.filter(slug__startswith=SEED_PREFIX)
+        seeded.update(search_vector=course_vector())
+        Lesson.objects.filter(course__in=seeded).update(search_vector=lesson_vector())
+        log('Indexed seeded courses and lessons for full-text search')
+
+    stats.rebuild(Course.objects.filter(slug__startswith=SEED_PREFIX).values('pk'))
+    log('Built statistics rollups of seeded courses')
+
+    return {
+        'categories': len(categories),
+        'instructors': len(instructor_ids),
+        'students': len(student_ids),
+        **counts,
+    }
+
+
+def seed_course_chunk(rng, numbers, categories, instructor_ids, student_ids,
+                      lessons_per_course, reviewers_per_course, counts):
+    courses = []
+    ratings = []
+    for number in numbers:
+        course_ratings = [rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 6])[0]
+                          for _ in range(reviewers_per_course)]
+        rating_sum = sum(course_ratings)
+        courses.append(Course(
+            title=words(rng, 4).title(),
+            slug=f'{SEED_PREFIX}course-{number}',
+            description=words(rng, 80),
+            instructor_id=rng.choice(instructor_ids),
+            category=rng.choice(categories),
+            price=Decimal(rng.randint(0, 200)),
+            is_published=rng.random() < 0.9,
+            rating_sum=rating_sum,
+            rating_count=len(course_ratings),
+            average_rating=Course.compute_average_rating(rating_sum, len(course_ratings)),
+        ))
+        ratings.append(course_ratings)
+    courses = Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+
+    lessons, reviews, enrollments = [], [], []
+    for course, course_ratings in zip(courses, ratings):
+        for order in range(1, lessons_per_course + 1):
+            lessons.append(Lesson(
+                course=course, title=words(rng, 3).title(), order=order,
+                content=words(rng, 300), duration=rng.randint(3, 60)))
+        reviewers = rng.sample(student_ids, len(course_ratings))
+        for student_id, rating in zip(reviewers, course_ratings):
+            reviews.append(Review(
+                course=course, user_id=student_id, rating=rating, comment=words(rng, 25)))
+            enrollments.append(Enrollment(course=course, student_id=student_id))
+
+    Lesson.objects.bulk_create(lessons, batch_size=BATCH_SIZE)
+    Review.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+    Enrollment.objects.bulk_create(enrollments, batch_size=BATCH_SIZE)
+    counts['courses'] += len(courses)
+    counts['lessons'] += len(lessons)
+    counts['reviews'] += len(reviews)
+    counts['enrollments'] += len(enrollments)
+
+
+def flush():
+    """Delete everything seeded; courses and their rows cascade from users"""
+    # Seeded instructors only teach seeded courses, whose rollups cascade
+    with transaction.atomic(), stats.suspended():
+        User.objects.filter(username__startswith=SEED_PREFIX).delete()
+        Category.objects.filter(slug__startswith=SEED_PREFIX).delete()
+
+
+def dataset_size():
+    return {
+        'categories': Category.objects.count(),
+        'users': User.objects.count(),
+        'courses': Course.objects.count(),
+        'lessons': Lesson.objects.count(),
+        'reviews': Review.objects.count(),
+        'enrollments': Enrollment.objects.count(),
+    }
@@ -0,0 +1,16 @@
+"""
+Settings for running the benchmark suite against a local SQLite file:
+
+    DJANGO_SETTINGS_MODULE=benchmarks.sqlite_settings python manage.py migrate
+    DJANGO_SETTINGS_MODULE=benchmarks.sqlite_settings python manage.py bench_seed
+    DJANGO_SETTINGS_MODULE=benchmarks.sqlite_settings python manage.py bench_run
+"""
+from lms_backend.settings import *  # noqa: F401,F403
+from lms_backend.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'benchmark.sqlite3',
+    }
+}
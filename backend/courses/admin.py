@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Course, Lesson, Category, Review
+from lms_backend.admin import AutocompleteFilter, LargeTableAdminMixin, PaginatedInlineMixin
+from .models import Course, Lesson, Category, Review, Enrollment
+from .search import search_courses, search_lessons
 
 
 @admin.register(Category)
@@ -9,30 +11,84 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
-class LessonInline(admin.TabularInline):
+class CourseMemberSearchMixin:
+    """
+    Search rows of a course by the course (full-text, as in the catalog) or,
+    for a term that looks like an email, by the user's exact email; both
+    go through indexes where searching every joined column would not
+    """
+    user_field = 'user'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if '@' in search_term:
+            return queryset.filter(**{f'{self.user_field}__email': search_term}), False
+        courses = search_courses(Course.objects.all(), search_term)
+        return queryset.filter(course__in=courses.values('pk')), False
+
+
+class LessonInline(PaginatedInlineMixin, admin.TabularInline):
     model = Lesson
     extra = 1
+    show_change_link = True
+
+    def get_queryset(self, request):
+        # Each row is labelled with str(lesson), which names the course
+        return super().get_queryset(request).select_related('course')
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'instructor', 'category',
                     'price', 'is_published', 'created_at')
+    list_select_related = ('instructor', 'category')
     list_filter = ('is_published', 'category', 'created_at')
-    search_fields = ('title', 'description', 'instructor__email')
+    # Searched through the indexed search vector and title trigrams
+    search_fields = ('title', 'description')
+    autocomplete_fields = ('instructor', 'category')
     inlines = [LessonInline]
     prepopulated_fields = {'slug': ('title',)}
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_courses(queryset, search_term), False
+
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'course', 'order', 'duration')
-    list_filter = ('course',)
-    search_fields = ('title', 'content', 'course__title')
+    list_select_related = ('course',)
+    list_filter = (('course', AutocompleteFilter),)
+    # Searched through the indexed search vector
+    search_fields = ('title', 'content')
+    autocomplete_fields = ('course',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_lessons(queryset, search_term), False
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdminMixin, CourseMemberSearchMixin, admin.ModelAdmin):
     list_display = ('course', 'user', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at')
-    search_fields = ('comment', 'course__title', 'user__email')
+    list_select_related = ('course', 'user')
+    list_filter = ('rating', ('course', AutocompleteFilter),
+                   ('user', AutocompleteFilter), 'created_at')
+    search_fields = ('course__title', 'user__email')
+    search_help_text = 'Course title, or a user email'
+    autocomplete_fields = ('course', 'user')
+
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(LargeTableAdminMixin, CourseMemberSearchMixin, admin.ModelAdmin):
+    list_display = ('student', 'course', 'created_at')
+    list_select_related = ('student', 'course')
+    list_filter = (('course', AutocompleteFilter),)
+    search_fields = ('course__title', 'student__email')
+    search_help_text = 'Course title, or a student email'
+    raw_id_fields = ('student', 'course')
+    user_field = 'student'
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        from lms_backend import media
+        from . import signals  # noqa: F401
+
+        media.register(self.get_model('Course'), 'image', 'image_renditions', {
+            'thumbnail': (320, 180),
+            'card': (640, 360),
+            'hero': (1600, 900),
+        })
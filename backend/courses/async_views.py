@@ -0,0 +1,148 @@
+"""
+Async read path for the hottest catalog endpoints, under /api/async/.
+
+Responses are identical to the DRF viewsets they mirror, which still do
+the authentication, permissions, filtering, pagination and serialization.
+What changes is where the work runs: every step that touches the
+database is handed to `lms_backend.aio.offload`, so one ASGI worker
+serves many requests concurrently from its event loop, and the course
+detail fetches the course, its lesson preview and its review preview in
+parallel instead of one after another.
+"""
+from django.http import Http404
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.response import Response
+
+from lms_backend.aio import evaluate, gather, offload
+from . import cache
+from .models import Course, Lesson, Review
+from .serializers import CourseDetailSerializer
+from .views import CategoryViewSet, CourseReviewViewSet, CourseViewSet
+
+
+def initialize(viewset_class, action, request, **kwargs):
+    """
+    Set up a viewset the way DRF's dispatch() does up to the handler:
+    authenticate, check permissions and throttles. Returns the view and,
+    if the request was rejected, the error response.
+    """
+    view = viewset_class(action_map={'get': action})
+    view.args, view.kwargs = (), kwargs
+    view.request = view.initialize_request(request, **kwargs)
+    view.headers = view.default_response_headers
+    try:
+        view.initial(view.request)
+    except Exception as exc:
+        return view, finalize(view, view.handle_exception(exc))
+    return view, None
+
+
+def finalize(view, response):
+    return view.finalize_response(view.request, response).render()
+
+
+def dispatch(viewset_class, action, request, **kwargs):
+    view = viewset_class.as_view({'get': action})
+    return view(request, **kwargs).render()
+
+
+@require_GET
+async def course_list(request):
+    return await offload(dispatch, CourseViewSet, 'list', request)
+
+
+@require_GET
+async def category_list(request):
+    return await offload(dispatch, CategoryViewSet, 'list', request)
+
+
+@require_GET
+async def course_reviews(request, course_pk):
+    return await offload(dispatch, CourseReviewViewSet, 'list', request, course_pk=course_pk)
+
+
+class CourseDetail:
+    """
+    The steps of CourseViewSet.retrieve, split so the three queries behind
+    a cache miss run concurrently
+    """
+
+    def __init__(self, request, pk):
+        self.request = request
+        self.pk = pk
+        self.view = None
+        self.validators = None
+        self.cache_key = None
+
+    def prepare(self):
+        """
+        Authenticate, then answer from the ETag or the response cache when
+        possible. Returns the response in that case, None otherwise.
+        """
+        self.view, error = initialize(CourseViewSet, 'retrieve', self.request, pk=self.pk)
+        if error is not None:
+            return error
+        view = self.view
+
+        self.validators = view.get_validators()
+        if self.validators is not None and view.not_modified(*self.validators):
+            return self.respond(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+        if view.is_cacheable_request():
+            self.cache_key = view.get_cache_key()
+            data = cache.get_cache().get(self.cache_key)
+            if data is not None:
+                cache.record(view.cache_endpoints['retrieve'], 'hit')
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return self.respond(response)
+        return None
+
+    def queries(self):
+        preview = CourseDetailSerializer.preview_size + 1
+        course, lessons, reviews = self.view.get_detail_querysets(
+            self.view.get_base_queryset().filter(pk=self.pk))
+        # Previews the response leaves out are not fetched
+        return (
+            evaluate(course),
+            evaluate(lessons.filter(course_id=self.pk)[:preview] if lessons is not None
+                     else Lesson.objects.none()),
+            evaluate(reviews.filter(course_id=self.pk)[:preview] if reviews is not None
+                     else Review.objects.none()),
+        )
+
+    def render(self, courses, lessons, reviews):
+        view = self.view
+        try:
+            if not courses:
+                # Worded like get_object_or_404 in DRF's get_object
+                raise Http404(f'No {Course._meta.object_name} matches the given query.')
+            course = courses[0]
+            view.check_object_permissions(view.request, course)
+        except Exception as exc:
+            return finalize(view, view.handle_exception(exc))
+
+        course.preview_lessons = lessons
+        course.preview_reviews = reviews
+        response = Response(view.get_serializer(course).data)
+        if self.cache_key is not None:
+            cache.get_cache().set(self.cache_key, response.data, cache.get_setting('TIMEOUT'))
+            cache.record(view.cache_endpoints['retrieve'], 'miss')
+            response['X-Cache'] = 'MISS'
+        return self.respond(response)
+
+    def respond(self, response):
+        if self.validators is not None:
+            self.view.set_validator_headers(response, *self.validators)
+        return finalize(self.view, response)
+
+
+@require_GET
+async def course_detail(request, pk):
+    detail = CourseDetail(request, pk)
+    response = await offload(detail.prepare)
+    if response is not None:
+        return response
+    courses, lessons, reviews = await gather(*detail.queries())
+    return await offload(detail.render, courses, lessons, reviews)
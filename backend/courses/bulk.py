@@ -0,0 +1,193 @@
+"""
+Batch creation, update and reordering of the lessons of one course.
+
+`(course, order)` is unique and the constraint cannot be deferred on
+every backend, so orders are rewritten in two passes inside one
+transaction: rows whose order changes are first parked above the highest
+order in use, then moved to their final positions. Row-by-row shuffling
+is never needed.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import cache
+from .models import Lesson
+from .serializers import LessonSerializer
+from .tasks import schedule_search_refresh
+
+LESSON_FIELDS = ['title', 'order', 'content', 'video_url', 'duration', 'updated_at']
+
+# Sent with `course` and `lessons` after a batch write, which saves
+# without sending post_save
+lessons_written = Signal()
+
+
+class LessonBatch:
+    """
+    A validated batch of lesson writes for `course`.
+
+    Items with an `id` update that lesson (partially), items without one
+    create a lesson. Per-item problems are collected in `errors` as
+    `{'index': i, 'errors': {...}}`; `save()` writes only the valid items.
+    """
+
+    def __init__(self, course, items, context=None):
+        self.course = course
+        self.items = items
+        self.context = context or {}
+        self.errors = []
+        self.creates = []   # (index, Lesson)
+        self.updates = []   # (index, Lesson)
+        self.existing = {}
+        self.original_orders = {}
+
+    def add_error(self, index, errors):
+        self.errors.append({'index': index, 'errors': errors})
+
+    def is_valid(self):
+        self.existing = {
+            lesson.pk: lesson
+            for lesson in Lesson.objects.select_for_update().filter(course=self.course)
+        }
+        self.original_orders = {pk: lesson.order for pk, lesson in self.existing.items()}
+        for index, item in enumerate(self.items):
+            if not isinstance(item, dict):
+                self.add_error(index, {'non_field_errors': ['Expected an object.']})
+                continue
+            self.validate_item(index, item)
+        self.check_orders()
+        return not self.errors
+
+    def validate_item(self, index, item):
+        pk = item.get('id')
+        if pk is None:
+            serializer = LessonSerializer(data=item, context=self.context)
+            if serializer.is_valid():
+                self.creates.append(
+                    (index, Lesson(course=self.course, **serializer.validated_data)))
+            else:
+                self.add_error(index, serializer.errors)
+            return
+
+        # JSON true/false are ints to Python, not ids
+        valid_id = isinstance(pk, int) and not isinstance(pk, bool)
+        lesson = self.existing.get(pk) if valid_id else None
+        if lesson is None:
+            self.add_error(index, {'id': ['Lesson not found in this course.']})
+            return
+        if any(updated is lesson for _, updated in self.updates):
+            self.add_error(index, {'id': ['Lesson appears more than once in the batch.']})
+            return
+        serializer = LessonSerializer(
+            lesson, data=item, partial=True, context=self.context)
+        if not serializer.is_valid():
+            self.add_error(index, serializer.errors)
+            return
+        for field, value in serializer.validated_data.items():
+            setattr(lesson, field, value)
+        self.updates.append((index, lesson))
+
+    def check_orders(self):
+        """
+        Reject items whose final order collides with another lesson's,
+        letting the earliest item claim each position. Lessons updated
+        without a new order keep theirs. A rejected update leaves its
+        lesson at its current order, which can displace later items in
+        turn, so this repeats until no new collision appears.
+        """
+        entries = sorted(self.updates + self.creates, key=lambda entry: entry[0])
+        while True:
+            moving = {
+                lesson.pk for _, lesson in entries
+                if lesson.pk is not None and lesson.order != self.original_orders[lesson.pk]
+            }
+            taken = {
+                order for pk, order in self.original_orders.items() if pk not in moving
+            }
+            accepted, rejected = [], []
+            for index, lesson in entries:
+                if lesson.pk is not None and lesson.pk not in moving:
+                    accepted.append((index, lesson))
+                elif lesson.order in taken:
+                    rejected.append(index)
+                else:
+                    taken.add(lesson.order)
+                    accepted.append((index, lesson))
+            for index in rejected:
+                self.add_error(index, {'order': [
+                    'This order is already used by another lesson of this course.']})
+            entries = accepted
+            if not rejected:
+                break
+
+        self.updates = [entry for entry in entries if entry[1].pk is not None]
+        self.creates = [entry for entry in entries if entry[1].pk is None]
+        self.errors.sort(key=lambda error: error['index'])
+
+    @transaction.atomic
+    def save(self):
+        updates = [lesson for _, lesson in self.updates]
+        creates = [lesson for _, lesson in self.creates]
+        write_lessons(self.course, self.original_orders, updates, creates)
+        return updates, creates
+
+
+def write_lessons(course, original_orders, updates, creates):
+    """
+    Persist `updates` (lessons of `course`, already modified in memory) and
+    `creates` with the two-pass order rewrite. `original_orders` maps each
+    lesson of the course to its stored order.
+    """
+    moving = [lesson for lesson in updates if original_orders[lesson.pk] != lesson.order]
+    if moving:
+        ceiling = max([*original_orders.values(), *(lesson.order for lesson in updates),
+                       *(lesson.order for lesson in creates)])
+        final_orders = {lesson.pk: lesson.order for lesson in moving}
+        for offset, lesson in enumerate(moving, start=1):
+            lesson.order = ceiling + offset
+        Lesson.objects.bulk_update(moving, ['order'])
+        for lesson in moving:
+            lesson.order = final_orders[lesson.pk]
+
+    if updates:
+        now = timezone.now()
+        for lesson in updates:
+            lesson.updated_at = now
+        Lesson.objects.bulk_update(updates, LESSON_FIELDS)
+    if creates:
+        Lesson.objects.bulk_create(creates)
+
+    # Bulk writes bypass the post_save handlers that maintain search
+    # vectors and invalidate cached course responses
+    pks = [lesson.pk for lesson in updates + creates]
+    if pks:
+        schedule_search_refresh(Lesson, pks)
+        cache.bump_on_commit(cache.COURSES, cache.course_namespace(course.pk))
+        lessons_written.send(sender=Lesson, course=course, lessons=updates + creates)
+
+
+def reorder_lessons(course, ordered_ids):
+    """
+    Renumber the lessons of `course` from 1 following `ordered_ids`;
+    lessons left out keep their relative order after the listed ones.
+    Returns the list of unknown ids, writing nothing if there are any.
+    """
+    existing = {
+        lesson.pk: lesson
+        for lesson in Lesson.objects.select_for_update().filter(course=course).order_by('order')
+    }
+    original_orders = {pk: lesson.order for pk, lesson in existing.items()}
+    unknown = [pk for pk in ordered_ids if pk not in existing]
+    if unknown:
+        return unknown
+
+    listed = list(dict.fromkeys(ordered_ids))
+    sequence = listed + [pk for pk in existing if pk not in set(listed)]
+    updates = []
+    for order, pk in enumerate(sequence, start=1):
+        lesson = existing[pk]
+        lesson.order = order
+        updates.append(lesson)
+    write_lessons(course, original_orders, updates, [])
+    return []
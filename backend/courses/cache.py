@@ -0,0 +1,162 @@
+"""
+Response cache for the public catalog endpoints.
+
+Cached entries are keyed on the full request URL and on version counters
+for the data they were rendered from. Saving or deleting a course, lesson,
+category or review, or editing a user shown as instructor or reviewer,
+bumps the matching counters once the transaction commits (see
+courses.signals). That orphans exactly the entries that embed that data;
+they then age out of the cache backend on their own. Bumping before the
+commit would let a concurrent request store the old rows under the new
+version.
+
+    catalog:version:courses         any course list
+    catalog:version:course:<id>     one course's detail
+    catalog:version:categories      category lists and everything embedding
+                                    a category
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+COURSES = 'courses'
+CATEGORIES = 'categories'
+
+STATS_KEY = 'catalog:stats:{endpoint}:{outcome}'
+
+
+def get_setting(name):
+    return getattr(settings, 'CATALOG_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('ALIAS')]
+
+
+def course_namespace(course_id):
+    return f'course:{course_id}'
+
+
+def version_key(namespace):
+    return f'catalog:version:{namespace}'
+
+
+def get_versions(namespaces):
+    """
+    Current version of each namespace. Missing counters are seeded from the
+    clock rather than zero, so an evicted counter can never come back at a
+    value older entries were stored under.
+    """
+    cache = get_cache()
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Invalidate every entry rendered from the given namespaces"""
+    cache = get_cache()
+    for namespace in namespaces:
+        key = version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_on_commit(*namespaces, using=None):
+    """`bump` once the current transaction commits, or now outside one"""
+    transaction.on_commit(lambda: bump(*namespaces), using=using)
+
+
+def record(endpoint, outcome):
+    cache = get_cache()
+    key = STATS_KEY.format(endpoint=endpoint, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats(endpoints):
+    """Hit and miss counters per endpoint, with the resulting hit ratio"""
+    cache = get_cache()
+    stats = {}
+    for endpoint in endpoints:
+        hits = cache.get(STATS_KEY.format(endpoint=endpoint, outcome='hit'), 0)
+        misses = cache.get(STATS_KEY.format(endpoint=endpoint, outcome='miss'), 0)
+        total = hits + misses
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else None,
+        }
+    return stats
+
+
+class CatalogCacheMixin:
+    """
+    Serve `list`/`retrieve` responses from the catalog cache for requests
+    that see the public catalog (see `is_cacheable_request`).
+
+    Views declare `cache_namespaces()` returning the namespaces the current
+    response depends on, and a `cache_endpoints` mapping from each cached
+    action to the name its hit/miss counters are kept under.
+    """
+    cache_endpoints = {}
+
+    def is_cacheable_request(self):
+        return get_setting('ENABLED') and self.action in self.cache_endpoints
+
+    def cache_namespaces(self):
+        raise NotImplementedError
+
+    def get_cache_key(self):
+        namespaces = self.cache_namespaces()
+        versions = get_versions(namespaces)
+        url = self.request.build_absolute_uri()
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        fingerprint = '.'.join(str(version) for version in versions)
+        return f'catalog:response:{self.action}:{fingerprint}:{digest}'
+
+    def cached_response(self, render, *args, **kwargs):
+        if not self.is_cacheable_request():
+            return render(*args, **kwargs)
+
+        endpoint = self.cache_endpoints[self.action]
+        cache = get_cache()
+        key = self.get_cache_key()
+        data = cache.get(key)
+        if data is not None:
+            record(endpoint, 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = render(*args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, get_setting('TIMEOUT'))
+        record(endpoint, 'miss')
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
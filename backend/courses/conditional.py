@@ -0,0 +1,114 @@
+"""
+HTTP conditional requests for course and lesson detail endpoints.
+
+Validators are derived from `updated_at` columns with a single aggregate
+query, so a 304 never needs the object serialized. A strong ETag has the
+form `"<state>-<variant>"`: `state` changes whenever the underlying rows
+do, and `variant` distinguishes representations of the same state, such
+as ?expand=content. `If-Match` on writes only compares the state part, so
+an ETag obtained from any representation can guard an update.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+VARIANT_PARAMS = ('expand', 'fields', 'omit')
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been modified since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+def _digest(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+
+def related_state(queryset, link):
+    """
+    Subqueries yielding the latest `updated_at` and the number of rows in
+    `queryset` that point at the outer object through `link`
+    """
+    related = queryset.filter(**{link: OuterRef('pk')}).order_by().values(link)
+    return (
+        Subquery(related.annotate(latest=Max('updated_at')).values('latest')),
+        Subquery(related.annotate(total=Count('pk')).values('total')),
+    )
+
+
+class ConditionalRequestMixin:
+    """
+    ETag/Last-Modified handling for `retrieve`, plus `If-Match` checks on
+    updates and deletes.
+
+    Views implement `get_validator_state(pk)`, returning a tuple of values
+    that identifies the object's current state together with its
+    last-modified datetime, or None when the object is not visible.
+    """
+    precondition_actions = ('update', 'partial_update', 'destroy')
+
+    def get_validator_state(self, pk):
+        raise NotImplementedError
+
+    def get_validators(self):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        result = self.get_validator_state(lookup)
+        if result is None:
+            return None
+        state, last_modified = result
+        params = self.request.query_params
+        variant = _digest(*(params.getlist(name) for name in VARIANT_PARAMS))
+        return f'{_digest(*state)}-{variant}', last_modified
+
+    def not_modified(self, etag, last_modified):
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or quote_etag(etag) in etags
+        if_modified_since = parse_http_date_safe(
+            self.request.headers.get('If-Modified-Since'))
+        if if_modified_since is not None and last_modified is not None:
+            return int(last_modified.timestamp()) <= if_modified_since
+        return False
+
+    def set_validator_headers(self, response, etag, last_modified):
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        if self.not_modified(etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+        return self.set_validator_headers(response, etag, last_modified)
+
+    def check_preconditions(self):
+        """Reject the write if `If-Match` names another state of the object"""
+        if_match = self.request.headers.get('If-Match')
+        if if_match is None:
+            return
+        etags = parse_etags(if_match)
+        if '*' in etags:
+            return
+        validators = self.get_validators()
+        current = validators[0].split('-')[0] if validators else None
+        if not any(tag.strip('"').split('-')[0] == current for tag in etags):
+            raise PreconditionFailed()
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.action in self.precondition_actions:
+            self.check_preconditions()
+        return obj
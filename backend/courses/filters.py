@@ -0,0 +1,17 @@
+from rest_framework import filters
+
+from .search import search_courses, search_supported
+
+
+class CourseSearchFilter(filters.SearchFilter):
+    """
+    ?search= backed by the course full-text index on PostgreSQL, and by
+    DRF's containment search elsewhere. Full-text matches carry a `rank`,
+    which CourseViewSet pages them by.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip() or not search_supported(queryset.model, queryset.db):
+            return super().filter_queryset(request, queryset, view)
+        return search_courses(queryset, text)
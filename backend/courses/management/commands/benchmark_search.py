@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from courses.models import Course
+from courses.search import course_vector, search_courses, search_supported
+
+User = get_user_model()
+
+SLUG_PREFIX = 'bench-search-'
+
+WORDS = [
+    'python', 'django', 'react', 'typescript', 'docker', 'kubernetes', 'design',
+    'marketing', 'finance', 'statistics', 'machine', 'learning', 'photography',
+    'guitar', 'cooking', 'writing', 'spanish', 'excel', 'leadership', 'security',
+    'network', 'database', 'postgres', 'cloud', 'testing', 'agile', 'product',
+    'drawing', 'animation', 'music', 'physics', 'calculus', 'algebra', 'biology',
+    'chemistry', 'history', 'economics', 'negotiation', 'yoga', 'nutrition',
+]
+
+QUERIES = ['django', 'pyth', 'machine learning', 'postgres database', 'guitar',
+           'kubernets', 'financ', 'react typescript']
+
+
+class Command(BaseCommand):
+    help = ('Compare the full-text course search against the ILIKE scans of '
+            "DRF's SearchFilter on a seeded catalog")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100_000,
+                            help='Size of the seeded catalog')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed runs per query and engine')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded courses after the run')
+
+    def handle(self, *args, **options):
+        if not search_supported(Course):
+            raise CommandError('The search benchmark requires PostgreSQL')
+
+        self.seed(options['courses'])
+        try:
+            self.stdout.write(f"{'query':<22}{'engine':<14}{'p50 ms':>10}{'p95 ms':>10}")
+            for text in QUERIES:
+                for engine, run in (('searchfilter', self.ilike), ('fulltext', self.fulltext)):
+                    timings = self.measure(run, text, max(options['repeat'], 2))
+                    self.stdout.write(
+                        f'{text:<22}{engine:<14}'
+                        f'{statistics.median(timings):>10.2f}'
+                        f'{statistics.quantiles(timings, n=20)[-1]:>10.2f}')
+        finally:
+            if not options['keep']:
+                Course.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+
+    def seed(self, count):
+        existing = Course.objects.filter(slug__startswith=SLUG_PREFIX).count()
+        if existing >= count:
+            return
+        instructor, _ = User.objects.get_or_create(
+            email=f'{SLUG_PREFIX}instructor@example.com',
+            defaults={'username': f'{SLUG_PREFIX}instructor', 'role': User.INSTRUCTOR})
+
+        rng = random.Random(0)
+        batch = []
+        for i in range(existing, count):
+            batch.append(Course(
+                title=' '.join(rng.choices(WORDS, k=4)).title(),
+                slug=f'{SLUG_PREFIX}{i}',
+                description=' '.join(rng.choices(WORDS, k=60)),
+                instructor=instructor,
+                price=Decimal(rng.randint(0, 200)),
+                is_published=True,
+            ))
+            if len(batch) == 5000:
+                Course.objects.bulk_create(batch)
+                batch = []
+        Course.objects.bulk_create(batch)
+
+        Course.objects.filter(slug__startswith=SLUG_PREFIX).update(
+            search_vector=course_vector())
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Course._meta.db_table}')
+
+    def measure(self, run, text, repeat):
+        run(text)  # warm up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(text)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def ilike(self, text):
+        # What SearchFilter over ['title', 'description'] produces, ordered
+        # the way the course list paginates
+        condition = Q()
+        for term in text.split():
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        return list(Course.objects.filter(condition).order_by('-created_at')[:20])
+
+    def fulltext(self, text):
+        return list(search_courses(Course.objects.all(), text)[:20])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from lms_backend import media
+
+
+class Command(BaseCommand):
+    help = ('Generate image renditions for every registered image field, e.g. '
+            'for uploads made before the media pipeline existed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate renditions that are already up to date')
+
+    def handle(self, *args, **options):
+        for model, field_name in media.registered_fields():
+            spec = media.get_spec(model, field_name)
+            objects = (
+                model._default_manager.exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .only('pk', field_name, spec.renditions_field)
+            )
+            done = 0
+            for instance in objects.iterator():
+                image = getattr(instance, field_name)
+                current = getattr(instance, spec.renditions_field) or {}
+                if current.get('source') == image.name and not options['force']:
+                    continue
+                try:
+                    media.generate_renditions(model._meta.label, instance.pk, field_name)
+                except Exception as exc:
+                    self.stderr.write(f'{model._meta.label} {instance.pk}: {exc}')
+                    continue
+                done += 1
+            self.stdout.write(
+                f'Generated renditions for {done} {model._meta.verbose_name_plural} '
+                f'({field_name})')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from courses.models import Course, Review
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized rating aggregates of every course from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of courses updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        totals = {
+            row['course_id']: (row['total'], row['count'])
+            for row in Review.objects.values('course_id').annotate(
+                total=Sum('rating'), count=Count('id'))
+        }
+
+        updated = 0
+        batch = []
+        courses = Course.objects.only(
+            'rating_sum', 'rating_count', 'average_rating').order_by('pk')
+        for course in courses.iterator(chunk_size=batch_size):
+            rating_sum, rating_count = totals.get(course.pk, (0, 0))
+            average = Course.compute_average_rating(rating_sum, rating_count)
+            if (course.rating_sum, course.rating_count, course.average_rating) == (
+                    rating_sum, rating_count, average):
+                continue
+            course.rating_sum = rating_sum
+            course.rating_count = rating_count
+            course.average_rating = average
+            batch.append(course)
+            if len(batch) >= batch_size:
+                updated += self._flush(batch)
+        updated += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rating aggregates for {updated} course(s)'))
+
+    def _flush(self, batch):
+        count = len(batch)
+        if count:
+            with transaction.atomic():
+                Course.objects.bulk_update(
+                    batch, ['rating_sum', 'rating_count', 'average_rating'])
+            batch.clear()
+        return count
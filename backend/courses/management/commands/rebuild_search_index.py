@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course, Lesson
+from courses.search import course_vector, lesson_vector, search_supported
+
+
+class Command(BaseCommand):
+    help = 'Recompute the full-text search vectors of all courses and lessons'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows updated per query')
+
+    def handle(self, *args, **options):
+        if not search_supported(Course):
+            raise CommandError('Full-text search requires PostgreSQL')
+
+        for model, vector in ((Course, course_vector), (Lesson, lesson_vector)):
+            updated = self.rebuild(model, vector, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Indexed {updated} {model._meta.verbose_name_plural}'))
+
+    def rebuild(self, model, vector, batch_size):
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return updated
+            updated += model.objects.filter(pk__in=pks).update(
+                search_vector=vector())
+            last_pk = pks[-1]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Review = apps.get_model('courses', 'Review')
+    rows = Review.objects.values('course_id').annotate(
+        total=Sum('rating'), count=Count('id'))
+    for row in rows.iterator():
+        Course.objects.filter(pk=row['course_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            average_rating=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='average_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates,
+                             migrations.RunPython.noop),
+    ]
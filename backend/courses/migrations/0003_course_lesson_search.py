@@ -0,0 +1,78 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    ('course', django.contrib.postgres.indexes.GinIndex(
+        fields=['search_vector'], name='course_search_vector_idx')),
+    ('course', django.contrib.postgres.indexes.GinIndex(
+        fields=['title'], name='course_title_trgm_idx', opclasses=['gin_trgm_ops'])),
+    ('lesson', django.contrib.postgres.indexes.GinIndex(
+        fields=['search_vector'], name='lesson_search_vector_idx')),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; other backends keep them in
+    # migration state only
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('courses', model_name), index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('courses', model_name), index)
+
+
+def populate_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Course.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('description', weight='B', config='english')))
+    Lesson.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('content', weight='B', config='english')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in SEARCH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_indexes, drop_search_indexes),
+            ],
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
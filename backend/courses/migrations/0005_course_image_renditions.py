@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_enrollment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 # Create your models here.
@@ -36,19 +38,84 @@ class Course(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True)
     image = models.ImageField(
         upload_to='course_images/', null=True, blank=True)
+    # Written by the media pipeline (lms_backend.media)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
 
+    # Denormalized review aggregates, maintained by the
+    # `refresh_course_rating` task that ReviewViewSet schedules after each
+    # write and rebuilt by the `rebuild_course_ratings` management command
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
+
+    # Weighted title/description vector, kept current by courses.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # B-tree indexes follow CourseViewSet: the public catalog filters on
+        # is_published and pages by (created_at, id), or by (price, id),
+        # (title, id) and (average_rating, id) under ?ordering=; instructors
+        # list their own courses and admins list everything by date
+        indexes = [
+            GinIndex(fields=['search_vector'], name='course_search_vector_idx'),
+            GinIndex(fields=['title'], name='course_title_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_published=True),
+                         name='course_published_created_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_published=True),
+                         name='course_published_price_idx'),
+            models.Index(fields=['title', 'id'], condition=models.Q(is_published=True),
+                         name='course_published_title_idx'),
+            models.Index(fields=['average_rating', 'id'], condition=models.Q(is_published=True),
+                         name='course_published_rating_idx'),
+            models.Index(fields=['category', 'created_at', 'id'],
+                         condition=models.Q(is_published=True),
+                         name='course_published_category_idx'),
+            models.Index(fields=['instructor', 'created_at', 'id'],
+                         name='course_instructor_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
     def get_average_rating(self):
-        reviews = self.reviews.all()  # type: ignore
-        if reviews:
-            return sum(review.rating for review in reviews) / reviews.count()
+        return self.average_rating
+
+    @staticmethod
+    def compute_average_rating(rating_sum, rating_count):
+        if rating_count:
+            return rating_sum / rating_count
         return 0
 
+    @classmethod
+    def refresh_rating(cls, course_id):
+        """
+        Recount a course's rating aggregates from its reviews. The course row
+        is locked first, so concurrent refreshes each count every review
+        committed before they got the lock and the last one wins.
+        """
+        with transaction.atomic():
+            course = cls.objects.select_for_update().only(
+                'rating_sum', 'rating_count', 'average_rating').filter(pk=course_id).first()
+            if course is None:
+                return
+            totals = course.reviews.aggregate(total=models.Sum('rating'), count=models.Count('id'))
+            rating_sum, rating_count = totals['total'] or 0, totals['count']
+            average = cls.compute_average_rating(rating_sum, rating_count)
+            if (course.rating_sum, course.rating_count, course.average_rating) == (
+                    rating_sum, rating_count, average):
+                return
+            course.rating_sum = rating_sum
+            course.rating_count = rating_count
+            course.average_rating = average
+            # updated_at too, so Last-Modified moves with the rating
+            course.save(update_fields=[
+                'rating_sum', 'rating_count', 'average_rating', 'updated_at'])
+
 
 class Lesson(models.Model):
     """Lesson model with video, title, course, content"""
@@ -63,9 +130,15 @@ class Lesson(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Weighted title/content vector, kept current by courses.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['order']
         unique_together = ['course', 'order']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='lesson_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -84,7 +157,38 @@ class Review(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # (course, created_at, id) serves the per-course review pages,
+        # newest first
         unique_together = ['user', 'course']
+        indexes = [
+            models.Index(fields=['course', 'created_at', 'id'],
+                         name='review_course_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.course.title} - {self.rating}"
+
+
+class Enrollment(models.Model):
+    """Enrollment of a student in a course"""
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='enrollments',
+        limit_choices_to={'role': 'student'}
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='enrollments')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # The unique index on (student, course) serves the access check;
+        # (course, created_at) serves per-course listings by date
+        unique_together = ['student', 'course']
+        indexes = [
+            models.Index(fields=['course', 'created_at'],
+                         name='enrollment_course_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.course.title}"
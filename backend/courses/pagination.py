@@ -0,0 +1,34 @@
+from lms_backend.pagination import KeysetPagination
+
+
+class CourseContentCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for the lessons and reviews nested under a course
+    """
+
+    def get_preview_next_link(self, request, url, items, preview_size):
+        """
+        Cursor link to the items following the first `preview_size` ones,
+        which the course detail response embeds. `items` carries one extra
+        element when there is more to fetch.
+        """
+        if len(items) <= preview_size:
+            return None
+
+        self.base_url = request.build_absolute_uri(url)
+        self.ordering = self.get_ordering(request, None, None)
+        self.page_size = preview_size
+        self.page = list(items[:preview_size])
+        self.cursor = None
+        self.has_next, self.has_previous = True, False
+        self.next_position = self._get_position_from_instance(
+            items[preview_size], self.ordering)
+        return self.get_next_link()
+
+
+class LessonCursorPagination(CourseContentCursorPagination):
+    ordering = 'order'
+
+
+class ReviewCursorPagination(CourseContentCursorPagination):
+    ordering = '-created_at'
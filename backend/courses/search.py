@@ -0,0 +1,115 @@
+"""
+Full-text search over courses and lessons.
+
+On PostgreSQL, courses and lessons carry a weighted `search_vector`
+(title A, description/content B) behind GIN indexes. Queries are
+prefix-matched against it and ranked with `ts_rank`. Typos in course
+titles are tolerated through the `pg_trgm` index on `Course.title`
+(`%` operator, pg_trgm.similarity_threshold defaults to 0.3).
+Other databases fall back to case-insensitive containment.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from django.db import connections, router
+from django.db.models import Exists, F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'english'
+
+# How much title similarity adds to the full-text rank of a course
+TRIGRAM_WEIGHT = 0.5
+
+MAX_QUERY_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def course_vector():
+    return (SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('description', weight='B', config=SEARCH_CONFIG))
+
+
+def lesson_vector():
+    return (SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('content', weight='B', config=SEARCH_CONFIG))
+
+
+def search_supported(model, using=None):
+    """Whether full-text search is available on the model's database"""
+    alias = using or router.db_for_read(model)
+    return connections[alias].vendor == 'postgresql'
+
+
+def refresh_search_vectors(model, pks, using=None):
+    """Recompute the stored search vector of the given rows"""
+    if not search_supported(model, using):
+        return 0
+    vector = course_vector() if model._meta.model_name == 'course' else lesson_vector()
+    manager = model.objects.using(using) if using else model.objects
+    return manager.filter(pk__in=pks).update(search_vector=vector)
+
+
+def parse_terms(text):
+    """Split user input into at most MAX_QUERY_TERMS word tokens"""
+    return _TERM_RE.findall(text or '')[:MAX_QUERY_TERMS]
+
+
+def build_query(text):
+    """
+    A prefix query matching every term, e.g. `djan rest` becomes
+    `djan:* & rest:*`. Terms are reduced to word characters before being
+    placed in the raw tsquery.
+    """
+    terms = parse_terms(text)
+    if not terms:
+        return None
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_lessons(queryset, text):
+    """Lessons matching `text`, best match first"""
+    query = build_query(text)
+    if query is None:
+        return queryset.none()
+    if not search_supported(queryset.model, queryset.db):
+        terms = parse_terms(text)
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        return queryset.filter(condition).annotate(rank=Value(0.0))
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', 'course_id', 'order')
+
+
+def search_courses(queryset, text, lessons=None):
+    """
+    Courses matching `text` on their own vector, fuzzily on their title, or
+    through one of their `lessons` (a Lesson queryset), best match first
+    """
+    query = build_query(text)
+    if query is None:
+        return queryset.none()
+
+    if not search_supported(queryset.model, queryset.db):
+        condition = Q()
+        for term in parse_terms(text):
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        if lessons is not None:
+            matching = search_lessons(lessons, text).filter(course=OuterRef('pk'))
+            condition |= Exists(matching)
+        return queryset.filter(condition).annotate(rank=Value(0.0))
+
+    condition = Q(search_vector=query) | Q(title__trigram_similar=text)
+    if lessons is not None:
+        matching = lessons.filter(course=OuterRef('pk'), search_vector=query)
+        condition |= Exists(matching)
+    return queryset.filter(condition).annotate(
+        rank=Coalesce(SearchRank(F('search_vector'), query),
+                      Value(0.0), output_field=FloatField()) +
+        TrigramSimilarity('title', text) * TRIGRAM_WEIGHT
+    ).order_by('-rank', '-id')
@@ -1,9 +1,14 @@
+from django.urls import reverse
 from rest_framework import serializers
+from lms_backend.fieldsets import SparseFieldsMixin
+from lms_backend.media import RenditionURLField, RenditionsField
 from .models import Course, Lesson, Category, Review
+from .pagination import LessonCursorPagination, ReviewCursorPagination
+from users.access import get_access
 from users.serializers import UserSerializer
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Category model"""
 
     class Meta:
@@ -11,7 +16,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Lesson model"""
 
     class Meta:
@@ -20,7 +25,38 @@ class LessonSerializer(serializers.ModelSerializer):
                   'video_url', 'duration', 'created_at']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class LessonSummarySerializer(LessonSerializer):
+    """
+    Serializer for lessons in listings, without content unless requested.
+    Listings and previews are public, so content is only expanded for
+    users who may read the lesson's course.
+    """
+
+    class Meta(LessonSerializer.Meta):
+        expandable_fields = ['content']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'content' in data and not get_access(
+                self.context['request']).can_read_content(instance.course_id):
+            del data['content']
+        return data
+
+
+class LessonBulkSerializer(serializers.Serializer):
+    """Payload of the bulk lesson endpoint; items are validated one by one"""
+    lessons = serializers.ListField(
+        child=serializers.JSONField(), allow_empty=False, max_length=500)
+    atomic = serializers.BooleanField(default=False)
+
+
+class LessonReorderSerializer(serializers.Serializer):
+    """Payload of the lesson reorder endpoint"""
+    order = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False)
+
+
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Review model"""
     user = UserSerializer(read_only=True)
 
@@ -34,41 +70,107 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CourseListSerializer(serializers.ModelSerializer):
+class CourseListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for listing courses"""
     instructor = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
-    average_rating = serializers.SerializerMethodField()
     lessons_count = serializers.SerializerMethodField()
+    # Lists ship the thumbnail, not the original upload
+    image = RenditionURLField('image', 'thumbnail')
+    image_renditions = RenditionsField('image')
 
     class Meta:
         model = Course
         fields = ['id', 'title', 'slug', 'description', 'instructor', 'category',
-                  'price', 'discount_price', 'image', 'created_at', 'average_rating', 'lessons_count']
-
-    def get_average_rating(self, obj):
-        return obj.get_average_rating()
+                  'price', 'discount_price', 'image', 'image_renditions', 'created_at',
+                  'average_rating', 'lessons_count']
+        field_sources = {'lessons_count': []}
 
     def get_lessons_count(self, obj):
+        # Annotated by CourseViewSet; fall back to a query for bare instances
+        if hasattr(obj, 'lessons_count'):
+            return obj.lessons_count
         return obj.lessons.count()
 
 
-class CourseDetailSerializer(serializers.ModelSerializer):
-    """Serializer for course details"""
+class CourseSearchResultSerializer(CourseListSerializer):
+    """Serializer for /api/search/ hits: a course and its matching lessons"""
+    rank = serializers.FloatField(read_only=True)
+    matching_lessons = LessonSummarySerializer(many=True, read_only=True)
+
+    class Meta(CourseListSerializer.Meta):
+        fields = CourseListSerializer.Meta.fields + ['rank', 'matching_lessons']
+        field_sources = {'lessons_count': [], 'rank': [], 'matching_lessons': []}
+
+
+class CourseDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Serializer for course details. Only the first `preview_size` lessons and
+    reviews are embedded; the `*_next` links continue from there on the
+    nested /api/courses/{id}/lessons/ and /api/courses/{id}/reviews/ endpoints.
+    """
+    preview_size = 10
+
     instructor = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
-    lessons = LessonSerializer(many=True, read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
+    lessons = serializers.SerializerMethodField()
+    lessons_count = serializers.SerializerMethodField()
+    lessons_next = serializers.SerializerMethodField()
+    reviews = serializers.SerializerMethodField()
+    reviews_count = serializers.IntegerField(source='rating_count', read_only=True)
+    reviews_next = serializers.SerializerMethodField()
+    image_renditions = RenditionsField('image')
 
     class Meta:
         model = Course
         fields = ['id', 'title', 'slug', 'description', 'instructor', 'category', 'price',
-                  'discount_price', 'image', 'created_at', 'updated_at', 'is_published',
-                  'lessons', 'reviews', 'average_rating']
+                  'discount_price', 'image', 'image_renditions', 'created_at', 'updated_at', 'is_published',
+                  'lessons', 'lessons_count', 'lessons_next',
+                  'reviews', 'reviews_count', 'reviews_next', 'average_rating']
+        # Previews are prefetched, see CourseViewSet.optimize_queryset
+        field_sources = {
+            'lessons': [], 'lessons_count': [], 'lessons_next': [],
+            'reviews': [], 'reviews_next': [],
+        }
+
+    def get_preview_lessons(self, obj):
+        # Prefetched by CourseViewSet with one extra row to detect a next page
+        if hasattr(obj, 'preview_lessons'):
+            return obj.preview_lessons
+        return list(obj.lessons.order_by('order')[:self.preview_size + 1])
+
+    def get_preview_reviews(self, obj):
+        if hasattr(obj, 'preview_reviews'):
+            return obj.preview_reviews
+        return list(obj.reviews.select_related('user').order_by(
+            '-created_at', '-id')[:self.preview_size + 1])
+
+    def get_lessons(self, obj):
+        lessons = self.get_preview_lessons(obj)[:self.preview_size]
+        return LessonSummarySerializer(
+            lessons, many=True, context={**self.context, 'fieldset_path': ('lessons',)}).data
+
+    def get_lessons_count(self, obj):
+        if hasattr(obj, 'lessons_count'):
+            return obj.lessons_count
+        return obj.lessons.count()
 
-    def get_average_rating(self, obj):
-        return obj.get_average_rating()
+    def get_lessons_next(self, obj):
+        return LessonCursorPagination().get_preview_next_link(
+            self.context['request'],
+            reverse('course-lessons-list', kwargs={'course_pk': obj.pk}),
+            self.get_preview_lessons(obj), self.preview_size)
+
+    def get_reviews(self, obj):
+        reviews = self.get_preview_reviews(obj)[:self.preview_size]
+        return ReviewSerializer(
+            reviews, many=True, context={**self.context, 'fieldset_path': ('reviews',)}).data
+
+    def get_reviews_next(self, obj):
+        return ReviewCursorPagination().get_preview_next_link(
+            self.context['request'],
+            reverse('course-reviews-list', kwargs={'course_pk': obj.pk}),
+            self.get_preview_reviews(obj), self.preview_size)
 
 
 class CourseCreateUpdateSerializer(serializers.ModelSerializer):
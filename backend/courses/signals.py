@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lms_backend.media import renditions_ready
+from . import cache
+from .models import Category, Course, Lesson, Review
+from users.serializers import UserSerializer
+from .tasks import schedule_search_refresh
+
+User = get_user_model()
+
+COURSE_SEARCH_FIELDS = {'title', 'description'}
+LESSON_SEARCH_FIELDS = {'title', 'content'}
+# What course responses show of a user
+USER_FIELDS = set(UserSerializer.Meta.fields)
+
+
+@receiver(post_save, sender=Course)
+def refresh_course_search_vector(sender, instance, update_fields=None, using=None, **kwargs):
+    """
+    Keep the course's search vector in step with its title and description,
+    in the background
+    """
+    if update_fields is not None and not COURSE_SEARCH_FIELDS & set(update_fields):
+        return
+    schedule_search_refresh(Course, [instance.pk], using=using)
+
+
+@receiver(post_save, sender=Lesson)
+def refresh_lesson_search_vector(sender, instance, update_fields=None, using=None, **kwargs):
+    """
+    Keep the lesson's search vector in step with its title and content, in
+    the background
+    """
+    if update_fields is not None and not LESSON_SEARCH_FIELDS & set(update_fields):
+        return
+    schedule_search_refresh(Lesson, [instance.pk], using=using)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, using=None, **kwargs):
+    cache.bump_on_commit(cache.COURSES, cache.course_namespace(instance.pk), using=using)
+
+
+@receiver(renditions_ready, sender=Course)
+def invalidate_course_image_cache(sender, instance_pk, **kwargs):
+    cache.bump_on_commit(cache.COURSES, cache.course_namespace(instance_pk))
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_course_content_cache(sender, instance, using=None, **kwargs):
+    # Lists embed lesson counts and ratings, details embed the rows
+    cache.bump_on_commit(
+        cache.COURSES, cache.course_namespace(instance.course_id), using=using)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, using=None, **kwargs):
+    cache.bump_on_commit(cache.CATEGORIES, using=using)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_cache(sender, instance, created=False, update_fields=None,
+                          using=None, **kwargs):
+    """
+    Course lists and details embed their instructor, details their latest
+    reviewers too. Deleting a user deletes their courses and reviews, which
+    bump on their own.
+    """
+    if created or (update_fields is not None and not USER_FIELDS & set(update_fields)):
+        return
+    invalidate_user_courses(instance.pk, using=using)
+
+
+@receiver(renditions_ready, sender=User)
+def invalidate_user_picture_cache(sender, instance_pk, **kwargs):
+    invalidate_user_courses(instance_pk)
+
+
+def invalidate_user_courses(user_id, using=None):
+    taught = set(Course.objects.filter(instructor_id=user_id).values_list('pk', flat=True))
+    reviewed = set(Review.objects.filter(user_id=user_id).values_list('course_id', flat=True))
+    namespaces = [cache.course_namespace(pk) for pk in sorted(taught | reviewed)]
+    if taught:
+        namespaces.append(cache.COURSES)
+    if namespaces:
+        cache.bump_on_commit(*namespaces, using=using)
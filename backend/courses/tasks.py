@@ -0,0 +1,33 @@
+from django.apps import apps
+
+from tasks.core import task
+
+from .models import Course
+from .search import refresh_search_vectors, search_supported
+
+
+@task
+def refresh_course_rating(course_id):
+    """Recount a course's rating aggregates from its reviews"""
+    Course.refresh_rating(course_id)
+
+
+@task
+def refresh_search_index(label, pks, using=None):
+    """Recompute the stored search vectors of the given courses or lessons"""
+    refresh_search_vectors(apps.get_model(label), pks, using=using)
+
+
+def schedule_rating_refresh(course_id):
+    refresh_course_rating.enqueue(args=(course_id,), key=f'course-rating:{course_id}')
+
+
+def schedule_search_refresh(model, pks, using=None):
+    """Refresh the rows' search vectors once the transaction commits"""
+    if not search_supported(model, using):
+        return
+    pks = sorted(pks)
+    # Saves of one row collapse into one refresh; bulk writes are unique
+    key = f'search:{model._meta.label}:{pks[0]}' if len(pks) == 1 else None
+    refresh_search_index.enqueue(
+        args=(model._meta.label, pks), kwargs={'using': using}, key=key, using=using)
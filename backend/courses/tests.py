@@ -1,3 +1,1393 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lms_backend import admission, media, profiling, replicas, throttling
+from lms_backend.testing import create_user
+from . import cache
+from .models import Category, Course, Enrollment, Lesson, Review
+from .search import refresh_search_vectors, search_courses
+from .tasks import schedule_rating_refresh
+from .views import ReviewViewSet
+
+User = get_user_model()
+
+
+class CourseQueryBudgetTests(APITestCase):
+    """
+    Every read endpoint must cost a fixed number of queries regardless of
+    how many rows it serializes. Raising a budget needs a good reason.
+    """
+    QUERY_BUDGETS = {
+        'course-list': 1,      # page (keyset pagination, no count)
+        'course-detail': 4,    # ETag validators + course + lessons + reviews
+        'review-list': 1,      # page
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.category = Category.objects.create(name='Web', slug='web')
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(5)]
+
+    def create_courses(self, count):
+        courses = []
+        start = Course.objects.count()
+        for i in range(start, start + count):
+            course = Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='...',
+                instructor=self.instructor, category=self.category,
+                price=10, is_published=True)
+            for order in range(1, 4):
+                Lesson.objects.create(
+                    course=course, title=f'Lesson {order}', order=order, content='...')
+            for student in self.students:
+                Review.objects.create(
+                    course=course, user=student, rating=4, comment='...')
+            courses.append(course)
+        return courses
+
+    def count_queries(self, url):
+        # Uncached: the budget is for building the response
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertWithinBudget(self, route, small, large):
+        self.assertEqual(
+            small, large, f'{route} query count grows with the number of rows')
+        self.assertLessEqual(large, self.QUERY_BUDGETS[route],
+                             f'{route} exceeded its query budget')
+
+    def test_course_list_budget(self):
+        self.create_courses(2)
+        small = self.count_queries('/api/courses/')
+        self.create_courses(8)
+        large = self.count_queries('/api/courses/')
+        self.assertWithinBudget('course-list', small, large)
+
+    def test_course_detail_budget(self):
+        small, large = self.create_courses(1)[0], self.create_courses(1)[0]
+        Lesson.objects.bulk_create(
+            Lesson(course=large, title='Extra', order=order, content='...')
+            for order in range(4, 30))
+        self.assertWithinBudget(
+            'course-detail',
+            self.count_queries(f'/api/courses/{small.pk}/'),
+            self.count_queries(f'/api/courses/{large.pk}/'))
+
+    def test_review_list_budget(self):
+        self.client.force_authenticate(self.students[0])
+        small = self.create_courses(2)[0]
+        self.assertWithinBudget(
+            'review-list',
+            self.count_queries(f'/api/reviews/?course_id={small.pk}'),
+            self.count_queries('/api/reviews/'))
+
+
+class SparseFieldsTests(APITestCase):
+    """?fields=, ?omit= and ?expand= shape the response and the SQL behind it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        category = Category.objects.create(name='Web', slug='web')
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=instructor,
+            category=category, price=10, is_published=True)
+        Lesson.objects.create(course=cls.course, title='Lesson', order=1, content='Text')
+
+    def get(self, url):
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in context.captured_queries]
+
+    def test_list_loads_only_selected_fields(self):
+        data, queries = self.get('/api/courses/?fields=id,title,price,image')
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'price', 'image'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0])
+        self.assertNotIn('description', queries[0])
+
+    def test_nested_fields_and_omit(self):
+        data, _ = self.get('/api/courses/?fields=id,instructor.first_name&omit=id')
+        self.assertEqual(data['results'][0], {'instructor': {'first_name': ''}})
+
+    def test_detail_skips_previews_left_out(self):
+        url = f'/api/courses/{self.course.pk}/'
+        data, queries = self.get(f'{url}?fields=id,title')
+        self.assertEqual(data, {'id': self.course.pk, 'title': 'Course'})
+        self.assertFalse(any('courses_lesson' in sql.split('FROM')[-1] for sql in queries[1:]))
+
+        data, _ = self.get(url)
+        self.assertNotIn('content', data['lessons'][0])
+        self.client.force_authenticate(self.course.instructor)
+        data, _ = self.get(f'{url}?expand=content')
+        self.assertEqual(data['lessons'][0]['content'], 'Text')
+
+
+class CoursePreviewTests(APITestCase):
+    """The detail page's preview links can be followed by whoever reads it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.student = create_user('student', User.STUDENT)
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=instructor,
+            price=10, is_published=True)
+        cls.draft = Course.objects.create(
+            title='Draft', slug='draft', description='...', instructor=instructor, price=10)
+        for course in (cls.course, cls.draft):
+            Lesson.objects.bulk_create(
+                Lesson(course=course, title=f'Lesson {order}', order=order, content='...')
+                for order in range(1, 16))
+        reviewers = User.objects.bulk_create(
+            User(username=f'reviewer{i}', email=f'reviewer{i}@example.com') for i in range(15))
+        Review.objects.bulk_create(
+            Review(course=cls.course, user=user, rating=4, comment='...') for user in reviewers)
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def follow(self, link):
+        ids = []
+        while link:
+            response = self.client.get(link)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            link = response.json()['next']
+        return ids
+
+    def assertPreviewsContinue(self):
+        data = self.client.get(f'/api/courses/{self.course.pk}/').json()
+        lessons = [lesson['id'] for lesson in data['lessons']]
+        lessons += self.follow(data['lessons_next'])
+        self.assertEqual(lessons, list(self.course.lessons.order_by('order')
+                                       .values_list('id', flat=True)))
+        reviews = [review['id'] for review in data['reviews']]
+        reviews += self.follow(data['reviews_next'])
+        self.assertEqual(sorted(reviews), sorted(self.course.reviews.values_list('id', flat=True)))
+
+    def test_anonymous(self):
+        self.assertPreviewsContinue()
+
+    def test_student_not_enrolled(self):
+        self.client.force_authenticate(self.student)
+        self.assertPreviewsContinue()
+
+    def expanded_content(self):
+        """Whether each public lesson listing shows content under ?expand=content"""
+        detail = self.client.get(f'/api/courses/{self.course.pk}/?expand=content')
+        lessons = self.client.get(f'/api/courses/{self.course.pk}/lessons/?expand=content')
+        return ['content' in detail.json()['lessons'][0],
+                'content' in lessons.json()['results'][0]]
+
+    def test_content_only_for_course_readers(self):
+        self.assertEqual(self.expanded_content(), [False, False])
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.expanded_content(), [False, False])
+        url = f'/api/courses/{self.course.pk}/?expand=content'
+        etag = self.client.get(url)['ETag']
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertEqual(self.expanded_content(), [True, True])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.expanded_content(), [True, True])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.expanded_content(), [False, False])
+
+    def test_unpublished_course(self):
+        response = self.client.get(f'/api/courses/{self.draft.pk}/lessons/')
+        self.assertEqual(response.json()['results'], [])
+
+
+class SearchTests(APITestCase):
+    """Course and lesson search, full-text on PostgreSQL and by containment elsewhere"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        courses = {
+            'django': ('Django basics', 'Build web apps'),
+            'rest': ('APIs with Django REST framework', 'Serializers and views'),
+            'flask': ('Flask', 'A small framework, unlike django'),
+            'draft': ('Django drafts', 'Not published'),
+        }
+        cls.courses = {
+            name: Course.objects.create(
+                title=title, slug=name, description=description, instructor=instructor,
+                price=10, is_published=name != 'draft')
+            for name, (title, description) in courses.items()
+        }
+        cls.lesson = Lesson.objects.create(
+            course=cls.courses['flask'], title='Templates', order=1,
+            content='Rendering with jinja')
+        refresh_search_vectors(Course, [course.pk for course in cls.courses.values()])
+        refresh_search_vectors(Lesson, [cls.lesson.pk])
+
+    def search(self, text):
+        response = self.client.get('/api/search/', {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def titles(self, results):
+        return [result['title'] for result in results]
+
+    @mock.patch('courses.search.search_supported', return_value=False)
+    def test_containment_fallback(self, supported):
+        published = Course.objects.filter(is_published=True)
+        lessons = Lesson.objects.all()
+        courses = search_courses(published, 'DJANGO framework', lessons=lessons)
+        self.assertEqual({course.slug for course in courses}, {'rest', 'flask'})
+        self.assertEqual({course.rank for course in courses}, {0.0})
+        # Through a lesson
+        self.assertEqual([course.slug for course in search_courses(
+            published, 'jinja', lessons=lessons)], ['flask'])
+        self.assertFalse(search_courses(published, '!!', lessons=lessons).exists())
+
+    @mock.patch('courses.search.search_supported', return_value=False)
+    def test_search_endpoint_fallback(self, supported):
+        results = self.search('jinja')
+        self.assertEqual(self.titles(results), ['Flask'])
+        self.assertEqual([lesson['id'] for lesson in results[0]['matching_lessons']],
+                         [self.lesson.pk])
+        self.assertEqual(self.search('   '), [])
+
+    @mock.patch('courses.search.search_supported', return_value=False)
+    def test_lesson_content_only_for_course_readers(self, supported):
+        def matching_lesson():
+            response = self.client.get('/api/search/', {'q': 'jinja', 'expand': 'content'})
+            return response.json()['results'][0]['matching_lessons'][0]
+
+        self.assertNotIn('content', matching_lesson())
+        self.client.force_authenticate(self.courses['flask'].instructor)
+        self.assertEqual(matching_lesson()['content'], 'Rendering with jinja')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    def test_catalog_search_pages_by_rank(self):
+        def slugs(url):
+            found = []
+            while url:
+                page = self.client.get(url).json()
+                found += [course['slug'] for course in page['results']]
+                url = page['next']
+            return found
+
+        ranked = [course.slug for course in search_courses(
+            Course.objects.filter(is_published=True), 'djan')]
+        # Newest first would put flask, the weakest match, first
+        self.assertEqual(ranked[-1], 'flask')
+        self.assertEqual(slugs('/api/courses/?search=djan&page_size=1'), ranked)
+        self.assertEqual(slugs('/api/courses/?search=djan&ordering=title'),
+                         ['rest', 'django', 'flask'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    def test_prefix_matching_and_ranking(self):
+        # Titles outrank descriptions; drafts are never found
+        titles = self.titles(self.search('djan'))
+        self.assertEqual(set(titles[:2]), {'Django basics', 'APIs with Django REST framework'})
+        self.assertEqual(titles[2:], ['Flask'])
+        self.assertEqual(self.titles(self.search('djan fram')),
+                         ['APIs with Django REST framework', 'Flask'])
+        results = self.search('jinj')
+        self.assertEqual(self.titles(results), ['Flask'])
+        self.assertEqual(results[0]['matching_lessons'][0]['id'], self.lesson.pk)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    @override_settings(TASKS={'BACKEND': 'immediate'})
+    def test_vectors_follow_writes(self):
+        course = self.courses['flask']
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = 'Flask and Quart'
+            course.save()
+            Lesson.objects.create(course=course, title='Async', order=2, content='asyncio')
+        self.assertEqual(self.titles(self.search('quart')), ['Flask and Quart'])
+        self.assertEqual(self.titles(self.search('asyncio')), ['Flask and Quart'])
+
+        # Saves that leave the text alone queue no refresh
+        with mock.patch('courses.signals.schedule_search_refresh') as schedule:
+            course.save(update_fields=['price'])
+        schedule.assert_not_called()
+
+
+@override_settings(TASKS={'BACKEND': 'immediate'})
+class CatalogCacheTests(APITestCase):
+    """Catalog responses are cached until a write bumps a version they depend on"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.category = Category.objects.create(name='Web', slug='web')
+        cls.courses = [
+            Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='...',
+                instructor=cls.instructor, category=cls.category, price=10,
+                is_published=True)
+            for i in range(2)
+        ]
+        cls.lesson = Lesson.objects.create(
+            course=cls.courses[0], title='Lesson', order=1, content='...')
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def namespaces(self):
+        return [cache.COURSES, cache.CATEGORIES,
+                *(cache.course_namespace(course.pk) for course in self.courses)]
+
+    def versions(self):
+        return dict(zip(self.namespaces(), cache.get_versions(self.namespaces())))
+
+    def assertBumps(self, write, expected):
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+            # Not before the commit, or a concurrent request could cache
+            # the old rows under the new version
+            self.assertEqual(self.versions(), before)
+        after = self.versions()
+        self.assertEqual({name for name in before if before[name] != after[name]}, expected)
+
+    def test_hit_and_miss(self):
+        for url in ('/api/courses/', f'/api/courses/{self.courses[0].pk}/',
+                    '/api/categories/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                # Other query strings are other entries
+                self.assertEqual(self.client.get(f'{url}?fields=id')['X-Cache'], 'MISS')
+
+    def test_instructors_are_not_served_from_cache(self):
+        self.client.force_authenticate(self.instructor)
+        self.assertNotIn('X-Cache', self.client.get('/api/courses/'))
+
+    def test_writes_bump_their_namespaces(self):
+        course = self.courses[0]
+        detail = {cache.COURSES, cache.course_namespace(course.pk)}
+        student = create_user('student', User.STUDENT)
+        self.assertBumps(lambda: Course.objects.get(pk=course.pk).save(), detail)
+        self.assertBumps(lambda: Lesson.objects.create(
+            course=course, title='Another', order=2, content='...'), detail)
+        self.assertBumps(lambda: Lesson.objects.filter(order=2).get().delete(), detail)
+        self.assertBumps(lambda: Review.objects.create(
+            course=course, user=student, rating=5, comment='...'), detail)
+        self.assertBumps(lambda: Review.objects.get().delete(), detail)
+        self.assertBumps(lambda: self.category.save(), {cache.CATEGORIES})
+        self.assertBumps(lambda: Category.objects.create(name='Data', slug='data').delete(),
+                         {cache.CATEGORIES})
+        # Courses embed their instructor and, on details, their reviewers
+        self.assertBumps(lambda: self.instructor.save(), {
+            cache.COURSES, *(cache.course_namespace(course.pk) for course in self.courses)})
+        review = Review.objects.create(course=course, user=student, rating=5, comment='...')
+        self.assertBumps(lambda: student.save(), {cache.course_namespace(course.pk)})
+        self.assertBumps(lambda: student.save(update_fields=['last_login']), set())
+        review.delete()
+        other = self.courses[1]
+        self.assertBumps(lambda: Course.objects.get(pk=other.pk).delete(),
+                         {cache.COURSES, cache.course_namespace(other.pk)})
+
+    def test_writes_are_never_served_stale(self):
+        url = f'/api/courses/{self.courses[0].pk}/'
+        self.client.get(url)
+        self.client.get('/api/courses/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.title = 'Renamed'
+            self.lesson.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['lessons'][0]['title'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Web development'
+            self.category.save()
+        response = self.client.get('/api/courses/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['category']['name'], 'Web development')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.instructor.first_name = 'Ada'
+            self.instructor.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['instructor']['first_name'], 'Ada')
+
+
+class ConditionalRequestTests(APITestCase):
+    """ETags on course and lesson details, and If-Match on their writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.student = create_user('student', User.STUDENT)
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=cls.instructor,
+            price=10, is_published=True)
+        cls.lesson = Lesson.objects.create(
+            course=cls.course, title='Lesson', order=1, content='...')
+        cls.url = f'/api/courses/{cls.course.pk}/'
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def etag(self, url=None):
+        response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_if_none_match(self):
+        etag = self.etag()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # Another representation of the same state is another ETag
+        response = self.client.get(f'{self.url}?fields=id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_lesson_if_none_match(self):
+        url = f'/api/lessons/{self.lesson.pk}/'
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_if_match(self):
+        etag = self.etag()
+        Course.objects.get(pk=self.course.pk).save()
+        response = self.client.patch(self.url, {'price': 20}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).price, 10)
+
+        # The ETag of any representation of the current state will do
+        etag = self.etag(f'{self.url}?fields=id')
+        response = self.client.patch(self.url, {'price': 20}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_nested_writes_change_the_course_etag(self):
+        etag = self.etag()
+        response = self.client.post(f'{self.url}lessons/', {
+            'title': 'Another', 'order': 2, 'content': '...', 'course': self.course.pk})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.etag()
+        self.client.force_authenticate(self.student)
+        response = self.client.post(f'{self.url}reviews/', {'rating': 5, 'comment': '...'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.etag()
+        Lesson.objects.filter(pk=self.lesson.pk).delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class EnrollmentTests(APITestCase):
+    """Students enroll in published courses, which opens their lessons"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.student = create_user('student', User.STUDENT)
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=cls.instructor,
+            price=10, is_published=True)
+        cls.draft = Course.objects.create(
+            title='Draft', slug='draft', description='...', instructor=cls.instructor,
+            price=10)
+        cls.lesson = Lesson.objects.create(
+            course=cls.course, title='Lesson', order=1, content='...')
+
+    def setUp(self):
+        self.client.force_authenticate(self.student)
+
+    def post(self, course, name):
+        return self.client.post(f'/api/courses/{course.pk}/{name}/')
+
+    def test_enroll_and_unenroll(self):
+        self.assertEqual(self.post(self.course, 'enroll').status_code, 201)
+        self.assertEqual(self.post(self.course, 'enroll').status_code, 200)
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
+        enrolled = self.client.get('/api/courses/enrolled/').json()['results']
+        self.assertEqual([course['id'] for course in enrolled], [self.course.pk])
+
+        self.assertEqual(self.post(self.course, 'unenroll').status_code, 204)
+        self.assertEqual(self.post(self.course, 'unenroll').status_code, 404)
+        self.assertEqual(self.client.get('/api/courses/enrolled/').json()['results'], [])
+
+    def test_only_students_enroll_in_published_courses(self):
+        self.assertEqual(self.post(self.draft, 'enroll').status_code, 404)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.post(self.course, 'enroll').status_code, 403)
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_one_enrollment_per_student_and_course(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_lessons_open_to_enrolled_students(self):
+        url = f'/api/lessons/{self.lesson.pk}/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get('/api/lessons/').json()['results'], [])
+
+        self.post(self.course, 'enroll')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual([lesson['id'] for lesson in
+                          self.client.get('/api/lessons/').json()['results']],
+                         [self.lesson.pk])
+
+        self.post(self.course, 'unenroll')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class LessonBatchTests(APITestCase):
+    """Bulk lesson writes and reordering on /api/courses/{id}/lessons/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=cls.instructor,
+            price=10, is_published=True)
+        cls.lessons = Lesson.objects.bulk_create(
+            Lesson(course=cls.course, title=f'Lesson {order}', order=order, content='...')
+            for order in range(1, 4))
+        cls.url = f'/api/courses/{cls.course.pk}/lessons/'
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def bulk(self, lessons, atomic=False):
+        return self.client.post(f'{self.url}bulk/', {'lessons': lessons, 'atomic': atomic},
+                                format='json')
+
+    def orders(self):
+        return dict(self.course.lessons.values_list('title', 'order'))
+
+    def test_swap_orders(self):
+        first, second = self.lessons[:2]
+        response = self.bulk([{'id': first.pk, 'order': 2}, {'id': second.pk, 'order': 1}])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['errors'], [])
+        self.assertEqual(self.orders(), {'Lesson 1': 2, 'Lesson 2': 1, 'Lesson 3': 3})
+
+    def test_item_errors_leave_the_rest_saved(self):
+        response = self.bulk([
+            {'title': 'New', 'order': 4, 'content': '...'},
+            {'id': 999999, 'title': 'Unknown'},
+            {'id': True, 'title': 'Boolean id'},
+            {'id': self.lessons[0].pk, 'order': 3},
+            {'title': 'Missing content', 'order': 5},
+            'not an object',
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(set(errors), {1, 2, 3, 4, 5})
+        self.assertIn('id', errors[2])
+        self.assertIn('order', errors[3])
+        self.assertIn('content', errors[4])
+        self.assertEqual(self.orders(), {'Lesson 1': 1, 'Lesson 2': 2, 'Lesson 3': 3, 'New': 4})
+
+    def test_updates_keep_their_order(self):
+        # A create claiming the order of a lesson updated in place loses
+        first = self.lessons[0]
+        response = self.bulk([
+            {'title': 'New', 'order': 1, 'content': '...'},
+            {'id': first.pk, 'title': 'Renamed'},
+        ])
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0])
+        self.assertEqual(self.orders(), {'Renamed': 1, 'Lesson 2': 2, 'Lesson 3': 3})
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite has no row locks')
+    def test_batches_lock_the_course(self):
+        first = self.lessons[0]
+        requests = [
+            ('bulk/', {'lessons': [{'title': 'New', 'order': 4, 'content': '...'}]}),
+            ('reorder/', {'order': [first.pk]}),
+        ]
+        for path, data in requests:
+            with self.subTest(path=path), CaptureQueriesContext(connection) as context:
+                response = self.client.post(f'{self.url}{path}', data, format='json')
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertTrue(any(
+                    'FROM "courses_course"' in query['sql'] and 'FOR UPDATE' in query['sql']
+                    for query in context.captured_queries))
+
+    def test_atomic_batch_rolls_back(self):
+        response = self.bulk([
+            {'title': 'New', 'order': 4, 'content': '...'},
+            {'id': self.lessons[0].pk, 'order': 3},
+        ], atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+        self.assertEqual(self.orders(), {'Lesson 1': 1, 'Lesson 2': 2, 'Lesson 3': 3})
+
+    def test_reorder(self):
+        first, second, third = self.lessons
+        response = self.client.post(f'{self.url}reorder/', {'order': [third.pk, first.pk]},
+                                    format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.orders(), {'Lesson 3': 1, 'Lesson 1': 2, 'Lesson 2': 3})
+
+        response = self.client.post(f'{self.url}reorder/', {'order': [first.pk, 999999]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.orders(), {'Lesson 3': 1, 'Lesson 1': 2, 'Lesson 2': 3})
+
+    def test_other_instructors_cannot_write(self):
+        self.client.force_authenticate(create_user('other', User.INSTRUCTOR))
+        self.assertEqual(self.bulk([{'id': self.lessons[0].pk, 'title': 'Mine'}]).status_code,
+                         403)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Cursors page through rows that share their sort value"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        # More ties than DRF's cursor offsets could skip over
+        cls.courses = Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', description='...',
+                   instructor=instructor, price=10, is_published=True)
+            for i in range(1050))
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([course['id'] for course in response.json()['results']])
+            url = response.json()[link]
+            self.assertLessEqual(len(pages), 20, 'pagination does not end')
+        return pages
+
+    def test_tied_rows_are_each_listed_once(self):
+        for ordering in ('price', '-price', 'created_at', '-average_rating'):
+            with self.subTest(ordering=ordering):
+                pages = self.walk(f'/api/courses/?ordering={ordering}&page_size=100', 'next')
+                self.assertEqual(len(pages), 11)
+                ids = [pk for page in pages for pk in page]
+                self.assertEqual(sorted(ids), sorted(course.pk for course in self.courses))
+                self.assertEqual(ids, sorted(ids, reverse=ordering.startswith('-')))
+
+    def test_previous_links_walk_back(self):
+        url = '/api/courses/?ordering=price&page_size=100'
+        forward = self.walk(url, 'next')
+        last = self.client.get(url)
+        for _ in range(len(forward) - 1):
+            last = self.client.get(last.json()['next'])
+        backward = self.walk(last.json()['previous'], 'previous')
+        self.assertEqual(backward[::-1], forward[:-1])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/courses/?cursor=cD0x').status_code, 404)
+
+    def test_other_lists_page_by_cursor(self):
+        Category.objects.bulk_create(
+            Category(name=name, slug=f'{name}-{i}')
+            for i, name in enumerate(('web', 'data', 'art', 'data')))
+        pages = self.walk('/api/categories/?page_size=3', 'next')
+        self.assertEqual(len(pages), 2)
+        names = Category.objects.in_bulk([pk for page in pages for pk in page])
+        self.assertEqual([names[pk].name for page in pages for pk in page],
+                         ['art', 'data', 'data', 'web'])
+
+        first, second = self.courses[:2]
+        lessons = Lesson.objects.bulk_create(
+            Lesson(course=course, title='Lesson', order=order, content='...')
+            for course in (first, second) for order in (2, 1))
+        self.client.force_authenticate(User.objects.create_user(
+            username='admin', email='admin@example.com', password='password',
+            role=User.ADMIN))
+        ids = [pk for page in self.walk('/api/lessons/?page_size=3', 'next') for pk in page]
+        self.assertEqual(ids, [lessons[i].pk for i in (1, 0, 3, 2)])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific')
+class CatalogIndexTests(APITestCase):
+    """
+    The queries behind each filter and ordering the course and review
+    endpoints allow read their table through an index, on enough rows for
+    the planner to prefer one
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructors = User.objects.bulk_create(
+            User(username=f'instructor{i}', email=f'instructor{i}@example.com',
+                 role=User.INSTRUCTOR)
+            for i in range(100))
+        cls.student = create_user('student', User.STUDENT)
+        cls.categories = Category.objects.bulk_create(
+            Category(name=f'Category {i}', slug=f'category-{i}') for i in range(100))
+        cls.courses = Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', description='...',
+                   instructor=cls.instructors[i % 100], category=cls.categories[i % 100],
+                   price=i % 100, average_rating=i % 41 / 10, is_published=i % 4 != 0)
+            for i in range(4000))
+        Review.objects.bulk_create(
+            Review(course=course, user=cls.student, rating=4, comment='...')
+            for course in cls.courses[:2000])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE courses_course, courses_review, users_user')
+
+    def plan(self, url, table):
+        """The plan of the query `url` runs against `table`"""
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        [sql] = [query['sql'] for query in context.captured_queries
+                 if f'FROM "{table}"' in query['sql']]
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, url, table, index=None):
+        plan = self.plan(url, table)
+        self.assertNotIn(f'Seq Scan on {table}', plan, f'{url} scans {table}:\n{plan}')
+        if index is not None:
+            self.assertIn(index, plan, f'{url} does not use {index}:\n{plan}')
+
+    def test_public_catalog(self):
+        category, instructor = self.categories[3].pk, self.instructors[3].pk
+        cases = {
+            '': 'course_published_created_idx',
+            '?ordering=created_at': 'course_published_created_idx',
+            '?ordering=-price': 'course_published_price_idx',
+            '?ordering=title': 'course_published_title_idx',
+            '?ordering=-average_rating': 'course_published_rating_idx',
+            '?price=42': 'course_published_price_idx',
+            f'?category={category}': 'course_published_category_idx',
+            f'?category={category}&ordering=-created_at': 'course_published_category_idx',
+            f'?instructor={instructor}': 'course_instructor_created_idx',
+        }
+        for query, index in cases.items():
+            with self.subTest(query=query):
+                self.assertUsesIndex(f'/api/courses/{query}', 'courses_course', index)
+
+        # Any other combination still avoids a full scan
+        filters = ['', f'category={category}', f'instructor={instructor}', 'price=42']
+        orderings = ['created_at', '-created_at', 'price', '-price', 'title', '-title',
+                     'average_rating', '-average_rating']
+        for condition in filters:
+            for ordering in orderings:
+                query = f'?{condition}&ordering={ordering}'
+                with self.subTest(query=query):
+                    self.assertUsesIndex(f'/api/courses/{query}', 'courses_course')
+
+    def test_instructor_and_admin_listings(self):
+        self.client.force_authenticate(self.instructors[3])
+        self.assertUsesIndex(
+            '/api/courses/', 'courses_course', 'course_instructor_created_idx')
+        admin = create_user('admin', User.ADMIN)
+        self.client.force_authenticate(admin)
+        self.assertUsesIndex('/api/courses/', 'courses_course', 'course_created_idx')
+
+    def test_course_reviews(self):
+        self.client.force_authenticate(self.student)
+        course = self.courses[5].pk
+        for url in (f'/api/courses/{course}/reviews/', f'/api/reviews/?course_id={course}'):
+            with self.subTest(url=url):
+                self.assertUsesIndex(url, 'courses_review', 'review_course_created_idx')
+
+
+class AdminTests(TestCase):
+    """Admin pages cost the same number of queries whatever the table sizes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+            role=User.ADMIN)
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        category = Category.objects.create(name='Web', slug='web')
+        cls.course = Course.objects.create(
+            title='Django basics', slug='django-basics', description='...',
+            instructor=instructor, category=category, price=10, is_published=True)
+        Lesson.objects.bulk_create(
+            Lesson(course=cls.course, title=f'Lesson {order}', order=order, content='...')
+            for order in range(1, 31))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_reviews(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create(
+            User(username=f'reviewer{i}', email=f'reviewer{i}@example.com')
+            for i in range(start, start + count))
+        courses = Course.objects.bulk_create(
+            Course(title=f'Course {user.pk}', slug=f'course-{user.pk}', description='...',
+                   instructor=self.course.instructor, price=10)
+            for user in users)
+        Review.objects.bulk_create(
+            Review(course=course, user=user, rating=5, comment='...')
+            for course, user in zip(courses, users))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for url in ('/admin/courses/review/', '/admin/courses/lesson/',
+                    '/admin/courses/course/'):
+            with self.subTest(url=url):
+                self.add_reviews(2)
+                small = self.count_queries(url)
+                self.add_reviews(20)
+                self.assertEqual(small, self.count_queries(url))
+
+    def test_course_filter_is_an_autocomplete(self):
+        response = self.client.get(
+            f'/admin/courses/lesson/?course__id__exact={self.course.pk}')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, '30 lessons')
+        self.assertContains(response, f'<option value="{self.course.pk}" selected>')
+
+    def test_lesson_inline_is_paginated(self):
+        url = f'/admin/courses/course/{self.course.pk}/change/'
+        formset = self.client.get(url).context['inline_admin_formsets'][0].formset
+        self.assertEqual([form.instance.order for form in formset.initial_forms],
+                         list(range(1, 21)))
+        formset = self.client.get(f'{url}?lesson_page=2').context[
+            'inline_admin_formsets'][0].formset
+        self.assertEqual([form.instance.order for form in formset.initial_forms],
+                         list(range(21, 31)))
+        self.assertEqual(self.count_queries(url), self.count_queries(f'{url}?lesson_page=2'))
+
+    def test_search_uses_catalog_search(self):
+        response = self.client.get('/admin/courses/course/?q=djan')
+        self.assertEqual(list(response.context['cl'].result_list), [self.course])
+
+
+@override_settings(TASKS={'BACKEND': 'immediate'})
+class ReviewRatingTests(APITestCase):
+    """Review writes recount the course's rating in a task after commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(2)]
+        cls.course = Course.objects.create(
+            title='Django', slug='django', description='...', instructor=instructor,
+            category=Category.objects.create(name='Web', slug='web'),
+            price=10, is_published=True)
+
+    def write(self, user, method, url, data=None):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        self.course.refresh_from_db()
+        return response
+
+    def test_rating_follows_reviews(self):
+        self.write(self.students[0], 'post', '/api/reviews/',
+                   {'course': self.course.pk, 'rating': 4, 'comment': '...'})
+        review = self.write(self.students[1], 'post', '/api/reviews/',
+                            {'course': self.course.pk, 'rating': 2, 'comment': '...'}).data
+        self.assertEqual((self.course.rating_count, self.course.average_rating), (2, 3))
+
+        self.write(self.students[1], 'patch', f"/api/reviews/{review['id']}/", {'rating': 5})
+        self.assertEqual(self.course.average_rating, 4.5)
+
+        self.write(self.students[1], 'delete', f"/api/reviews/{review['id']}/")
+        self.assertEqual((self.course.rating_sum, self.course.rating_count), (4, 1))
+
+    def test_recount_changes_the_etag(self):
+        # A read between the review's commit and its recount must not keep
+        # validating once the rating has moved
+        self.client.force_authenticate(self.students[0])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post('/api/reviews/', {'course': self.course.pk, 'rating': 4,
+                                               'comment': '...'}, format='json')
+        url = f'/api/courses/{self.course.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['reviews_count'], 1)
+
+    def test_rating_is_recounted_from_scratch(self):
+        Review.objects.create(course=self.course, user=self.students[0], rating=5)
+        Course.objects.filter(pk=self.course.pk).update(rating_sum=99, rating_count=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_rating_refresh(self.course.pk)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_sum, self.course.rating_count), (5, 1))
+
+
+    def test_rebuild_command_restores_drifted_aggregates(self):
+        Review.objects.create(course=self.course, user=self.students[0], rating=5)
+        Review.objects.create(course=self.course, user=self.students[1], rating=2)
+        unreviewed = Course.objects.create(
+            title='Flask', slug='flask', description='...', instructor=self.course.instructor,
+            price=10, is_published=True)
+        Course.objects.update(rating_sum=99, rating_count=7, average_rating=1)
+        out = io.StringIO()
+        call_command('rebuild_course_ratings', batch_size=1, stdout=out)
+        self.assertIn('Rebuilt rating aggregates for 2 course(s)', out.getvalue())
+        self.course.refresh_from_db()
+        unreviewed.refresh_from_db()
+        self.assertEqual(
+            (self.course.rating_sum, self.course.rating_count, self.course.average_rating),
+            (7, 2, 3.5))
+        self.assertEqual(
+            (unreviewed.rating_sum, unreviewed.rating_count, unreviewed.average_rating),
+            (0, 0, 0))
+
+
+@override_settings(TASKS={'BACKEND': 'immediate'})
+class ImageRenditionTests(APITestCase):
+    """Course images get content-hashed renditions once their upload commits"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        cache.get_cache().clear()
+
+    def upload(self, name):
+        """An 800x600 PNG whose left half is transparent"""
+        image = Image.new('RGBA', (800, 600), (200, 30, 30, 255))
+        image.paste((0, 0, 0, 0), (0, 0, 400, 600))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_course(self):
+        return Course.objects.create(
+            title='Python', slug='python', description='...', instructor=self.instructor,
+            price=10, is_published=True, image=self.upload('python.png'))
+
+    def test_renditions_are_generated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create_course()
+        course.refresh_from_db()
+        rendition_map = course.image_renditions
+        self.assertEqual(rendition_map['source'], course.image.name)
+        renditions = rendition_map['renditions']
+        # Cropped to each aspect ratio, never upscaled
+        self.assertEqual(
+            {name: (entry['width'], entry['height']) for name, entry in renditions.items()},
+            {'thumbnail': (320, 180), 'card': (640, 360), 'hero': (800, 450)})
+
+        directory, filename = course.image.name.rsplit('/', 1)
+        stem = filename.rsplit('.', 1)[0]
+        for name, entry in renditions.items():
+            for fmt in media.available_formats():
+                with self.subTest(rendition=name, format=fmt):
+                    self.assertRegex(entry[fmt], rf'^{directory}/renditions/{stem}-{name}-'
+                                                 rf'[0-9a-f]{{12}}\.{media.FORMATS[fmt][1]}$')
+                    self.assertTrue(default_storage.exists(entry[fmt]))
+
+        # JPEG has no alpha channel: transparency is flattened onto white
+        with default_storage.open(renditions['thumbnail']['jpeg']) as file, \
+                Image.open(file) as thumbnail:
+            self.assertEqual(thumbnail.mode, 'RGB')
+            self.assertTrue(all(channel > 245 for channel in thumbnail.getpixel((10, 90))))
+
+    def test_serialized_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create_course()
+        course.refresh_from_db()
+        thumbnail = course.image_renditions['renditions']['thumbnail']
+        url = f"http://testserver{default_storage.url(thumbnail['jpeg'])}"
+
+        detail = self.client.get(f'/api/courses/{course.pk}/').json()
+        self.assertEqual(detail['image_renditions']['thumbnail']['jpeg'], url)
+        self.assertEqual(detail['image_renditions']['thumbnail']['width'], 320)
+        self.assertIn(f'{url} 320w', detail['image_renditions']['srcset']['jpeg'])
+        listed = self.client.get('/api/courses/').json()['results'][0]
+        self.assertEqual(listed['image'], url)
+
+    def test_original_is_served_until_renditions_exist(self):
+        # Without the commit, no job runs
+        course = self.create_course()
+        original = f'http://testserver{course.image.url}'
+        self.assertEqual(self.client.get('/api/courses/').json()['results'][0]['image'],
+                         original)
+        self.assertEqual(
+            self.client.get(f'/api/courses/{course.pk}/').json()['image_renditions'], {})
+
+        # Nor is a map made from another upload
+        Course.objects.filter(pk=course.pk).update(image_renditions={
+            'source': 'course_images/other.png',
+            'renditions': {'thumbnail': {'width': 320, 'height': 180,
+                                         'jpeg': 'course_images/renditions/other.jpg'}},
+        })
+        cache.get_cache().clear()
+        self.assertEqual(self.client.get('/api/courses/').json()['results'][0]['image'],
+                         original)
+
+    def test_replaced_image_drops_stale_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create_course()
+        course.refresh_from_db()
+        stale = media.rendition_files(course.image_renditions)
+        with self.captureOnCommitCallbacks(execute=True):
+            course.image = self.upload('django.png')
+            course.save()
+        course.refresh_from_db()
+        self.assertEqual(course.image_renditions['source'], course.image.name)
+        self.assertFalse(any(default_storage.exists(path) for path in stale))
+        self.assertTrue(all(default_storage.exists(path)
+                            for path in media.rendition_files(course.image_renditions)))
+
+class ReviewExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', User.ADMIN)
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(4)]
+        cls.courses = [
+            Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='...',
+                instructor=instructor, price=10, is_published=True)
+            for i in range(2)
+        ]
+        cls.reviews = [
+            Review.objects.create(course=course, user=student, rating=4, comment='...')
+            for course in cls.courses for student in cls.students
+        ]
+
+    def export(self, query):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/reviews/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_filtered_csv_export_resumes_after_id(self):
+        course = self.courses[1]
+        rows = self.export(f'format=csv&course_id={course.pk}')
+        self.assertEqual(rows[0], ReviewViewSet.export_fields)
+        expected = [review for review in self.reviews if review.course == course]
+        self.assertEqual([int(row[0]) for row in rows[1:]], [review.pk for review in expected])
+        self.assertEqual({row[2] for row in rows[1:]}, {course.title})
+
+        rows = self.export(f'format=csv&course_id={course.pk}&after_id={expected[1].pk}')
+        self.assertEqual([int(row[0]) for row in rows[1:]],
+                         [review.pk for review in expected[2:]])
+
+    def test_export_is_for_admins(self):
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get('/api/reviews/export/').status_code, 403)
+
+
+@override_settings(PROFILING={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True})
+class ProfilingTests(APITestCase):
+    """Sampled requests log their SQL and DRF phase timings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=instructor,
+            price=10, is_published=True)
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def profile(self, url):
+        with self.assertLogs('lms_backend.profiling', 'INFO') as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(logs.records[0].getMessage())
+
+    def test_requests_are_logged(self):
+        response, summary = self.profile(f'/api/courses/{self.course.pk}/')
+        self.assertEqual((summary['route'], summary['status']), ('course-detail', 200))
+        self.assertGreater(summary['queries'], 0)
+        self.assertGreater(summary['serialize_ms'], 0)
+        self.assertLessEqual(
+            summary['db_ms'] + summary['auth_ms'] + summary['perm_ms'] + summary['serialize_ms'],
+            summary['total_ms'])
+        self.assertIn(f'desc="{summary["queries"]} queries"', response['Server-Timing'])
+
+    @override_settings(PROFILING={'SAMPLE_RATE': 0.0})
+    def test_not_sampled(self):
+        with self.assertNoLogs('lms_backend.profiling'):
+            response = self.client.get('/api/courses/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_phases_exclude_sql(self):
+        profile = profiling.RequestProfile()
+
+        def slow_execute(sql, params, many, context):
+            time.sleep(0.02)
+
+        with profile.phase('serialize'), profile.phase('perm'):
+            for pk in range(3):
+                profile.record_query(slow_execute, f'SELECT * FROM t WHERE id = {pk}',
+                                     None, False, None)
+        self.assertGreaterEqual(profile.sql_time, 0.06)
+        self.assertLess(profile.phases['serialize'], 0.02)
+        # Nested phases are charged to the outermost one
+        self.assertEqual(profile.phases['perm'], 0.0)
+        self.assertEqual(list(profile.duplicates().values()), [3])
+
+    @override_settings(PROFILING={'SAMPLE_RATE': 1.0, 'N_PLUS_ONE_THRESHOLD': 1})
+    def test_repeated_queries_are_flagged(self):
+        with self.assertLogs('lms_backend.profiling', 'WARNING') as logs:
+            self.client.get('/api/courses/')
+        event = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((event['event'], event['route']), ('n_plus_one', 'course-list'))
+
+
+class AsyncViewTests(APITransactionTestCase):
+    """
+    The /api/async/ views answer exactly like the viewsets they mirror.
+    Their queries run on other threads' connections, hence a transaction
+    test case.
+    """
+
+    def setUp(self):
+        cache.get_cache().clear()
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        self.student = create_user('student', User.STUDENT)
+        category = Category.objects.create(name='Web', slug='web')
+        self.courses = [
+            Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='...',
+                instructor=instructor, category=category, price=10, is_published=i < 2)
+            for i in range(3)
+        ]
+        course = self.courses[0]
+        Lesson.objects.bulk_create(
+            Lesson(course=course, title=f'Lesson {order}', order=order, content='...')
+            for order in range(1, 13))
+        reviewers = User.objects.bulk_create(
+            User(username=f'reviewer{i}', email=f'reviewer{i}@example.com') for i in range(12))
+        Review.objects.bulk_create(
+            Review(course=course, user=user, rating=4, comment='...') for user in reviewers)
+
+    def get_both(self, path, **headers):
+        """The sync and async responses to GET /api/<path> and /api/async/<path>"""
+        sync = self.client.get(f'/api/{path}', headers=headers)
+        asynchronous = async_to_sync(self.async_client.get)(
+            f'/api/async/{path}', headers=headers)
+        return sync, asynchronous
+
+    def assertSameResponse(self, path, status_code=200, **headers):
+        sync, asynchronous = self.get_both(path, **headers)
+        self.assertEqual(sync.status_code, status_code)
+        self.assertEqual(asynchronous.status_code, status_code, asynchronous.content)
+        self.assertEqual(sync.get('ETag'), asynchronous.get('ETag'))
+        if sync.content:
+            # Links point back at the endpoint that was called
+            self.assertEqual(
+                sync.json(),
+                json.loads(asynchronous.content.decode().replace('/api/async/', '/api/')))
+        return sync
+
+    def test_course_list(self):
+        page = self.assertSameResponse('courses/?page_size=1').json()
+        self.assertIsNotNone(page['next'])
+        self.assertSameResponse(page['next'].split('/api/', 1)[1])
+        self.assertSameResponse('courses/?ordering=price&fields=id,title')
+
+    def test_course_detail(self):
+        path = f'courses/{self.courses[0].pk}/'
+        etag = self.assertSameResponse(path)['ETag']
+        self.assertSameResponse(path, 304, if_none_match=etag)
+        self.assertSameResponse(f'{path}?expand=content')
+        self.assertSameResponse(f'courses/{self.courses[2].pk}/', 404)
+        token = AccessToken.for_user(self.student)
+        self.assertSameResponse(path, authorization=f'Bearer {token}')
+
+    def test_reviews_and_categories(self):
+        page = self.assertSameResponse(f'courses/{self.courses[0].pk}/reviews/').json()
+        self.assertSameResponse(page['next'].split('/api/', 1)[1])
+        self.assertSameResponse('categories/')
+
+    def test_rejected_credentials(self):
+        for path in ('courses/', f'courses/{self.courses[0].pk}/', 'categories/',
+                     f'courses/{self.courses[0].pk}/reviews/'):
+            with self.subTest(path=path):
+                self.assertSameResponse(path, 401, authorization='Bearer invalid')
+
+
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    Safe requests read from a replica, except for users who just wrote.
+    The replica is a second connection to the test database, which only
+    sees committed rows, hence a transaction test case.
+    """
+    replica = 'replica_under_test'
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in `databases`, which the system checks
+        # run against before any test class is set up
+        connections.settings[cls.replica] = {**connections['default'].settings_dict}
+        cls.databases = {'default', cls.replica}
+        super().setUpClass()
+        # It names the primary's database, which replica_aliases() leaves out
+        cls.enterClassContext(mock.patch.object(
+            replicas, 'replica_aliases', return_value=[cls.replica]))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.settings[cls.replica]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        replicas.cache.clear()
+        self.instructor = create_user('instructor', User.INSTRUCTOR)
+        self.course = Course.objects.create(
+            title='Course', slug='course', description='...', instructor=self.instructor,
+            price=10, is_published=True)
+
+    def request(self, method, url, data=None):
+        """The response, and how many queries the primary and the replica ran"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[self.replica]) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response, len(primary), len(replica)
+
+    def test_safe_reads_go_to_the_replica(self):
+        response, primary, replica = self.request('get', '/api/courses/')
+        self.assertEqual(response.json()['results'][0]['id'], self.course.pk)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        self.client.force_authenticate(self.instructor)
+        url = f'/api/courses/{self.course.pk}/'
+        _, primary, replica = self.request('get', url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        _, _, replica = self.request('patch', url, {'price': 20})
+        self.assertEqual(replica, 0)
+        response, primary, replica = self.request('get', url)
+        self.assertEqual(response.json()['price'], '20.00')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # Other users are not pinned
+        self.client.force_authenticate(None)
+        _, primary, replica = self.request('get', url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+
+RATE_LIMITS = {
+    'RATES': {'user': '100/min', 'anon': '20/min'},
+    'COSTS': {'search-list': 5, 'course-list?search': 5},
+    'ROUTES': {},
+}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS)
+class RateLimitTests(APITestCase):
+    """Token buckets per user, per IP and per route, with weighted routes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(2)]
+
+    def setUp(self):
+        throttling.get_store().clear()
+
+    def statuses(self, url, count):
+        return [self.client.get(url).status_code for _ in range(count)]
+
+    def test_expensive_routes_cost_more(self):
+        self.assertEqual(self.statuses('/api/courses/?search=django', 4), [200] * 4)
+        response = self.client.get('/api/search/?q=django')
+        self.assertEqual(response.status_code, 429)
+        # 5 tokens at 20 per minute
+        self.assertEqual(response['Retry-After'], '15')
+        # Cheap requests still fit in what is left
+        self.client.get('/api/courses/')
+        self.assertEqual(self.client.get('/api/courses/').status_code, 429)
+
+    def test_users_have_their_own_buckets(self):
+        self.assertEqual(self.statuses('/api/courses/', 21)[-1], 429)
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.statuses('/api/courses/', 21), [200] * 21)
+
+    @override_settings(RATE_LIMITS={**RATE_LIMITS, 'ROUTES': {'search-list': '10/min'}})
+    def test_route_bucket_is_shared(self):
+        for student in self.students:
+            self.client.force_authenticate(student)
+            self.assertEqual(self.client.get('/api/search/?q=django').status_code, 200)
+        self.assertEqual(self.client.get('/api/search/?q=django').status_code, 429)
+        self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+
+    @override_settings(RATE_LIMITS={**RATE_LIMITS, 'ENABLED': False})
+    def test_disabled(self):
+        self.assertEqual(self.statuses('/api/search/?q=django', 10), [200] * 10)
+
+
+@override_settings(RATE_LIMITS={**RATE_LIMITS, 'ENABLED': False},
+                   SHEDDING={'LATENCY_MS': 100, 'CRITICAL_LATENCY_MS': 1000, 'RETRY_AFTER': 7})
+class LoadSheddingTests(APITestCase):
+    """Requests are turned away while SQL statements are slow"""
+
+    def tearDown(self):
+        admission.monitor.reset()
+
+    def slow_down(self, milliseconds):
+        admission.monitor.reset()
+        admission.monitor.record(milliseconds)
+
+    def test_fast_database(self):
+        self.slow_down(50)
+        self.assertEqual(self.client.get('/api/search/?q=django').status_code, 200)
+
+    def test_slow_database_sheds_expensive_routes(self):
+        self.slow_down(300)
+        response = self.client.get('/api/search/?q=django')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(self.client.get('/api/courses/?search=django').status_code, 503)
+        self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+
+    def test_overloaded_database_sheds_anonymous_requests(self):
+        self.slow_down(3000)
+        self.assertEqual(self.client.get('/api/courses/').status_code, 503)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer x')
+        self.assertNotEqual(self.client.get('/api/courses/').status_code, 503)
+
+    def test_statements_are_timed(self):
+        admission.monitor.reset()
+        self.client.get('/api/search/?q=django')
+        self.assertGreater(admission.monitor.latency(), 0)
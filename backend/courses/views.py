@@ -1,25 +1,52 @@
+from collections import defaultdict
+
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Course, Lesson, Category, Review
+from . import cache
+from .bulk import LessonBatch, reorder_lessons
+from .conditional import ConditionalRequestMixin, related_state
+from .filters import CourseSearchFilter
+from .models import Course, Lesson, Category, Review, Enrollment
+from .search import parse_terms, search_courses, search_lessons
 from .serializers import (
     CourseListSerializer, CourseDetailSerializer, CourseCreateUpdateSerializer,
-    LessonSerializer, CategorySerializer, ReviewSerializer
+    LessonSerializer, LessonSummarySerializer, CategorySerializer, ReviewSerializer,
+    CourseSearchResultSerializer, LessonBulkSerializer, LessonReorderSerializer,
 )
+from .pagination import LessonCursorPagination, ReviewCursorPagination
+from .tasks import schedule_rating_refresh, schedule_search_refresh
+from lms_backend import profiling
+from lms_backend.export import ExportMixin
+from lms_backend.fieldsets import FieldSelection, restrict_queryset
+from lms_backend.pagination import KeysetPagination
+from lms_backend.profiling import ProfiledViewMixin
+from lms_backend.replicas import ReplicaReadMixin
 from users.permissions import (
-    IsInstructorOrReadOnly, IsOwnerOrReadOnly,
-    IsCourseInstructorOrReadOnly, IsAdminUser, IsEnrolledOrInstructor
+    IsInstructorOrReadOnly, IsInstructorOrAdminUser, IsOwnerOrReadOnly,
+    IsCourseInstructorOrReadOnly, IsAdminUser, IsEnrolledOrInstructor, IsStudentUser
 )
+from users.access import get_access
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ProfiledViewMixin, ReplicaReadMixin, cache.CatalogCacheMixin,
+                      viewsets.ModelViewSet):
     """
     ViewSet for course categories
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.order_by('name', 'id')
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_endpoints = {'list': 'category-list'}
+    cursor_ordering = ('name', 'id')
+
+    def cache_namespaces(self):
+        return [cache.CATEGORIES]
 
     def get_permissions(self):
         """
@@ -33,35 +60,177 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+def visible_courses(user):
+    """Courses whose detail page `user` can read"""
+    # Check if user is authenticated before accessing role
+    if user.is_authenticated:
+        # Instructors see only their own courses
+        if user.role == 'instructor':  # type: ignore
+            return Course.objects.filter(instructor=user)
+
+        # Admins see all courses
+        if user.role == 'admin':  # type: ignore
+            return Course.objects.all()
+
+    # Students and unauthenticated users see only published courses
+    return Course.objects.filter(is_published=True)
+
+
+def lessons_count():
+    """
+    The number of lessons of each course, as a correlated subquery. Unlike
+    Count('lessons') it needs no GROUP BY, so a page of courses can be read
+    off an index in order and stop at the page size.
+    """
+    lessons = Lesson.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    return Coalesce(Subquery(lessons.annotate(total=Count('pk')).values('total')), 0)
+
+
+class CourseViewSet(ProfiledViewMixin, ReplicaReadMixin, ConditionalRequestMixin,
+                    cache.CatalogCacheMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for courses with different serializers for list/detail
     """
     queryset = Course.objects.all()
+    pagination_class = KeysetPagination
+    cache_endpoints = {'list': 'course-list', 'retrieve': 'course-detail'}
+    precondition_actions = ('update', 'partial_update', 'destroy', 'publish', 'unpublish')
     filter_backends = [DjangoFilterBackend,
-                       filters.SearchFilter, filters.OrderingFilter]
+                       CourseSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'instructor', 'price', 'is_published']
     search_fields = ['title', 'description']
-    ordering_fields = ['created_at', 'price', 'title']
+    ordering_fields = ['created_at', 'price', 'title', 'average_rating']
+    export_fields = ['id', 'title', 'slug', 'instructor_id', 'instructor__email',
+                     'category_id', 'price', 'discount_price', 'is_published',
+                     'rating_count', 'average_rating', 'created_at', 'updated_at']
+    export_permission_classes = [IsInstructorOrAdminUser]
+    # Pages of full-text matches (see CourseSearchFilter), unless the
+    # client picks an ?ordering=
+    ranked_ordering = ('-rank', '-id')
 
     def get_queryset(self):
         """
         Filter courses based on user role and published status
         """
+        return self.optimize_queryset(self.get_base_queryset())
+
+    def paginate_queryset(self, queryset):
+        if 'rank' in queryset.query.annotations:
+            self.cursor_ordering = self.ranked_ordering
+        return super().paginate_queryset(queryset)
+
+    def get_base_queryset(self):
+        """
+        Courses visible to the requesting user
+        """
+        return visible_courses(self.request.user)
+
+    # Loaded whatever ?fields= selects: permission checks read the
+    # instructor, and pagination and ordering read the others
+    always_loaded = ('instructor', 'is_published', 'created_at', 'price', 'title')
+
+    def optimize_queryset(self, queryset):
+        """
+        Load everything the action's serializer reads in a fixed number of
+        queries, independent of the page size, and nothing it leaves out
+        """
+        if self.action in ('list', 'enrolled'):
+            serializer = CourseListSerializer(context=self.get_serializer_context())
+            queryset = restrict_queryset(queryset, serializer, always=self.always_loaded)
+            if 'lessons_count' in serializer.fields:
+                queryset = queryset.annotate(lessons_count=lessons_count())
+            return queryset
+        if self.action == 'retrieve':
+            # One extra row per preview tells the serializer whether to link
+            # to the next page
+            preview = CourseDetailSerializer.preview_size + 1
+            queryset, lessons, reviews = self.get_detail_querysets(queryset)
+            if lessons is not None:
+                queryset = queryset.prefetch_related(Prefetch(
+                    'lessons', queryset=lessons[:preview], to_attr='preview_lessons'))
+            if reviews is not None:
+                queryset = queryset.prefetch_related(Prefetch(
+                    'reviews', queryset=reviews[:preview], to_attr='preview_reviews'))
+            return queryset
+        return queryset
+
+    def get_detail_querysets(self, queryset):
+        """
+        The courses of `queryset` as the detail serializer reads them, and
+        the lesson and review previews in display order, or None for
+        previews the response leaves out
+        """
+        context = self.get_serializer_context()
+        serializer = CourseDetailSerializer(context=context)
+        fields = serializer.fields
+        queryset = restrict_queryset(queryset, serializer, always=self.always_loaded)
+        if 'lessons_count' in fields:
+            queryset = queryset.annotate(lessons_count=lessons_count())
+
+        lessons = reviews = None
+        if 'lessons' in fields or 'lessons_next' in fields:
+            lessons = restrict_queryset(
+                Lesson.objects.order_by('order'),
+                LessonSummarySerializer(context={**context, 'fieldset_path': ('lessons',)}),
+                always=('course', 'order'))
+        if 'reviews' in fields or 'reviews_next' in fields:
+            reviews = restrict_queryset(
+                Review.objects.order_by('-created_at', '-id'),
+                ReviewSerializer(context={**context, 'fieldset_path': ('reviews',)}),
+                always=('course', 'created_at'))
+        return queryset, lessons, reviews
+
+    def is_cacheable_request(self):
+        """
+        Only requests that see the public catalog share cached responses;
+        instructors and admins get their own querysets
+        """
         user = self.request.user
+        if user.is_authenticated and user.role != 'student':  # type: ignore
+            return False
+        # Expanded lesson content depends on who reads it
+        if self.expands_lesson_content():
+            return False
+        return super().is_cacheable_request()
+
+    def expands_lesson_content(self):
+        return self.action == 'retrieve' and FieldSelection.from_request(
+            self.request).is_expanded(('lessons',), 'content')
 
-        # Check if user is authenticated before accessing role
-        if user.is_authenticated:
-            # Instructors see only their own courses
-            if user.role == 'instructor':  # type: ignore
-                return Course.objects.filter(instructor=user)
+    def cache_namespaces(self):
+        if self.action == 'retrieve':
+            return [cache.course_namespace(self.kwargs['pk']), cache.CATEGORIES]
+        return [cache.COURSES, cache.CATEGORIES]
 
-            # Admins see all courses
-            if user.role == 'admin':  # type: ignore
-                return Course.objects.all()
+    def get_validator_state(self, pk):
+        """
+        The course row, its lessons and reviews, its rating aggregates and
+        the category version together determine the detail representation.
+        The aggregates are recounted by a task after the review write that
+        changed them, so they are compared directly. With lesson content
+        expanded, so does whether the user may read it.
+        """
+        lessons_updated, lessons_total = related_state(Lesson.objects.all(), 'course')
+        reviews_updated, reviews_total = related_state(Review.objects.all(), 'course')
+        try:
+            row = self.get_base_queryset().filter(pk=pk).annotate(
+                lessons_updated=lessons_updated, lessons_total=lessons_total,
+                reviews_updated=reviews_updated, reviews_total=reviews_total,
+            ).values_list(
+                'updated_at', 'lessons_updated', 'lessons_total',
+                'reviews_updated', 'reviews_total', 'category_id',
+                'rating_count', 'average_rating',
+            ).first()
+        except (TypeError, ValueError):
+            return None
+        if row is None:
+            return None
 
-        # Students and unauthenticated users see only published courses
-        return Course.objects.filter(is_published=True)
+        state = row + tuple(cache.get_versions([cache.CATEGORIES]))
+        if self.expands_lesson_content():
+            state += (get_access(self.request).can_read_content(int(pk)),)
+        last_modified = max(value for value in (row[0], row[1], row[3]) if value)
+        return state, last_modified
 
     def get_serializer_class(self):
         """
@@ -78,6 +247,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         - List/retrieve: authenticated
         - Create: instructor or admin
         - Update/partial_update/destroy: owner or admin
+        - Extra actions: the permission_classes given to @action
         """
         if self.action in ['list', 'retrieve']:
             return [permissions.AllowAny()]
@@ -85,14 +255,17 @@ class CourseViewSet(viewsets.ModelViewSet):
             return [IsOwnerOrReadOnly()]
         elif self.action == 'create':
             return [IsInstructorOrReadOnly()]
-        return [permissions.IsAuthenticated()]
+        return super().get_permissions()
 
     @action(detail=True, methods=['post'], permission_classes=[IsOwnerOrReadOnly])
     def publish(self, request, pk=None):
         """Publish a course"""
         course = self.get_object()
         course.is_published = True
-        course.save()
+        course.save(update_fields=['is_published', 'updated_at'])
+        # Catch up on any title or description written without save()
+        # before the course becomes searchable
+        schedule_search_refresh(Course, [course.pk])
         return Response({'status': 'Course published'}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[IsOwnerOrReadOnly])
@@ -100,28 +273,68 @@ class CourseViewSet(viewsets.ModelViewSet):
         """Unpublish a course"""
         course = self.get_object()
         course.is_published = False
-        course.save()
+        course.save(update_fields=['is_published', 'updated_at'])
         return Response({'status': 'Course unpublished'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'], permission_classes=[IsStudentUser])
+    def enroll(self, request, pk=None):
+        """Enroll the requesting student in a published course"""
+        course = self.get_object()
+        _, created = Enrollment.objects.get_or_create(
+            student=request.user, course=course)
+        if created:
+            return Response({'status': 'Enrolled'}, status=status.HTTP_201_CREATED)
+        return Response({'status': 'Already enrolled'}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsStudentUser])
+    def unenroll(self, request, pk=None):
+        """Remove the requesting student from a course"""
+        course = self.get_object()
+        deleted, _ = Enrollment.objects.filter(
+            student=request.user, course=course).delete()
+        if not deleted:
+            return Response({'detail': 'Not enrolled in this course'},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsStudentUser])
+    def enrolled(self, request):
+        """List the courses the requesting student is enrolled in"""
+        enrolled = Enrollment.objects.filter(
+            student=request.user, course_id=OuterRef('pk'))
+        courses = self.get_queryset().filter(Exists(enrolled))
+        page = self.paginate_queryset(courses)
+        serializer = CourseListSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ProfiledViewMixin, ReplicaReadMixin, ConditionalRequestMixin,
+                    viewsets.ModelViewSet):
     """
     ViewSet for lessons
     """
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated,
                           IsCourseInstructorOrReadOnly]
+    # Keys the restricted list queryset always loads
+    cursor_ordering = ('course_id', 'order', 'id')
 
     def get_queryset(self):
         """
         Filter lessons based on course if provided in URL
         """
         queryset = Lesson.objects.all()
-        course_id = self.request.query_params.get(  # type: ignore
+        if self.action in ('list', 'retrieve'):
+            queryset = restrict_queryset(
+                queryset, self.get_serializer(), always=('course', 'order'))
+        course_id = self.kwargs.get('course_pk') or self.request.query_params.get(  # type: ignore
             'course_id', None)  # type: ignore
         if course_id is not None:
             queryset = queryset.filter(course_id=course_id)
+        return self.filter_by_access(queryset)
 
+    def filter_by_access(self, queryset):
+        """The lessons the requesting user may read"""
         user = self.request.user
         if user.role == 'instructor':  # type: ignore
             return queryset.filter(course__instructor=user)
@@ -129,43 +342,257 @@ class LessonViewSet(viewsets.ModelViewSet):
             return queryset
         else:
             # Students can only see lessons for published courses they're enrolled in
-            enrolled_courses = user.enrollments.values_list(  # type: ignore
-                'course_id', flat=True)  # type: ignore
-            return queryset.filter(course__is_published=True, course__id__in=enrolled_courses)
+            enrolled = Enrollment.objects.filter(
+                student=user, course_id=OuterRef('course_id'))
+            return queryset.filter(Exists(enrolled), course__is_published=True)
 
-    def perform_create(self, serializer):
-        """Set course and validate instructor"""
-        course_id = self.request.data.get('course')  # type: ignore
-        course = Course.objects.get(pk=course_id)
+    def get_validator_state(self, pk):
+        try:
+            updated_at = self.get_queryset().filter(pk=pk).values_list(
+                'updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            return None
+        if updated_at is None:
+            return None
+        return (updated_at,), updated_at
+
+    def get_serializer_class(self):
+        """
+        Lesson listings leave out content unless the client asks for it
+        """
+        if self.action == 'list':
+            return LessonSummarySerializer
+        return LessonSerializer
+
+    def get_writable_course(self, course_id, lock=False):
+        """
+        The course lessons are being written to, if the user may edit it.
+        `lock` holds its row until the transaction ends, so batch writes to
+        one course run one at a time: lessons they create have no row to
+        lock, and two batches could both claim the same free order.
+        """
+        queryset = Course.objects.select_for_update() if lock else Course.objects.all()
+        course = get_object_or_404(queryset, pk=course_id)
 
         # Check if user is the instructor of the course
-        if course.instructor != self.request.user and not self.request.user.is_admin:  # type: ignore
+        if course.instructor_id != self.request.user.pk and not self.request.user.is_admin:  # type: ignore
             self.permission_denied(
                 self.request, message="You do not have permission to add lessons to this course")
+        return course
 
-        serializer.save(course=course)
+    def perform_create(self, serializer):
+        """Set course and validate instructor"""
+        course_id = self.kwargs.get('course_pk') or self.request.data.get('course')  # type: ignore
+        serializer.save(course=self.get_writable_course(course_id))
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ProfiledViewMixin, ReplicaReadMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for reviews
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    export_fields = ['id', 'course_id', 'course__title', 'user_id', 'user__email',
+                     'rating', 'comment', 'created_at', 'updated_at']
+    export_permission_classes = [IsAdminUser]
 
     def get_queryset(self):
         """
         Filter reviews based on course if provided in URL
         """
-        queryset = Review.objects.all()
-        course_id = self.request.query_params.get(  # type: ignore
+        queryset = Review.objects.select_related('user')
+        if self.action in ('list', 'retrieve'):
+            queryset = restrict_queryset(
+                Review.objects.all(), self.get_serializer(),
+                always=('user', 'course', 'created_at'))
+        course_id = self.kwargs.get('course_pk') or self.request.query_params.get(  # type: ignore
             'course_id', None)  # type: ignore
         if course_id is not None:
             queryset = queryset.filter(course_id=course_id)
+        return self.filter_by_access(queryset)
+
+    def filter_by_access(self, queryset):
+        """The reviews the requesting user may read: any"""
         return queryset
 
+    # Course rating aggregates are recounted by a task after commit, so
+    # review writes never queue on the course row lock
     def perform_create(self, serializer):
-        """Set user and course for the review"""
-        course_id = self.request.data.get('course')  # type: ignore
-        serializer.save(user=self.request.user, course_id=course_id)
+        """Set user for the review; the course comes from the validated data"""
+        review = serializer.save(user=self.request.user)
+        schedule_rating_refresh(review.course_id)
+
+    def perform_update(self, serializer):
+        """Recount the courses the review moved between or changed on"""
+        old_course_id = serializer.instance.course_id
+        old_rating = serializer.instance.rating
+        review = serializer.save()
+        if review.course_id != old_course_id:
+            schedule_rating_refresh(old_course_id)
+        if review.course_id != old_course_id or review.rating != old_rating:
+            schedule_rating_refresh(review.course_id)
+
+    def perform_destroy(self, instance):
+        """Recount the review's course without it"""
+        course_id = instance.course_id
+        instance.delete()
+        schedule_rating_refresh(course_id)
+
+
+class CourseContentListMixin:
+    """
+    The nested listings continue the lesson and review previews of the
+    course detail page (its `lessons_next` and `reviews_next` links), which
+    is shared by every reader, so whoever can read that page can list them
+    """
+
+    def get_permissions(self):
+        if self.action == 'list':
+            return [permissions.AllowAny()]
+        return super().get_permissions()
+
+    def filter_by_access(self, queryset):
+        if self.action == 'list':
+            visible = visible_courses(self.request.user).filter(pk=OuterRef('course_id'))
+            return queryset.filter(Exists(visible))
+        return super().filter_by_access(queryset)
+
+
+class CourseLessonViewSet(CourseContentListMixin, LessonViewSet):
+    """
+    Lessons of one course, at /api/courses/{course_pk}/lessons/
+    """
+    pagination_class = LessonCursorPagination
+    # The paginator's own ordering, which the course detail's
+    # `lessons_next` cursor is built on
+    cursor_ordering = None
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, course_pk=None):
+        """
+        Create and update many lessons in one transaction. Items with an
+        `id` update that lesson, the others are created. Invalid items are
+        reported by index while the rest are saved, unless `atomic` is true,
+        in which case any error rejects the whole batch.
+        """
+        serializer = LessonBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomic = serializer.validated_data['atomic']
+
+        with transaction.atomic():
+            course = self.get_writable_course(course_pk, lock=True)
+            batch = LessonBatch(
+                course, serializer.validated_data['lessons'],
+                context=self.get_serializer_context())
+            if not batch.is_valid() and atomic:
+                return Response({'errors': batch.errors},
+                                status=status.HTTP_400_BAD_REQUEST)
+            updated, created = batch.save()
+
+        context = self.get_serializer_context()
+        return Response({
+            'created': LessonSerializer(created, many=True, context=context).data,
+            'updated': LessonSerializer(updated, many=True, context=context).data,
+            'errors': batch.errors,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def reorder(self, request, course_pk=None):
+        """
+        Renumber the course's lessons from 1 in the order of the given ids;
+        lessons not listed follow in their current order
+        """
+        serializer = LessonReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            course = self.get_writable_course(course_pk, lock=True)
+            unknown = reorder_lessons(course, serializer.validated_data['order'])
+        if unknown:
+            return Response(
+                {'order': [f'Lessons not found in this course: {unknown}']},
+                status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'Lessons reordered'}, status=status.HTTP_200_OK)
+
+
+class CourseReviewViewSet(CourseContentListMixin, ReviewViewSet):
+    """
+    Reviews of one course, at /api/courses/{course_pk}/reviews/
+    """
+    pagination_class = ReviewCursorPagination
+
+    def get_serializer(self, *args, **kwargs):
+        """Take the review's course from the URL"""
+        if 'data' in kwargs:
+            kwargs['data'] = kwargs['data'].copy()
+            kwargs['data']['course'] = self.kwargs['course_pk']
+        return super().get_serializer(*args, **kwargs)
+
+
+class CatalogCacheStatsViewSet(ProfiledViewMixin, viewsets.ViewSet):
+    """
+    Hit/miss counters of the catalog response cache, for admins
+    """
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        endpoints = [
+            *CategoryViewSet.cache_endpoints.values(),
+            *CourseViewSet.cache_endpoints.values(),
+        ]
+        return Response(cache.get_stats(endpoints))
+
+
+class SearchViewSet(ProfiledViewMixin, viewsets.ViewSet):
+    """
+    Ranked full-text search over published courses and their lessons,
+    at /api/search/?q=...
+    """
+    permission_classes = [permissions.AllowAny]
+    default_limit = 10
+    max_limit = 50
+    lessons_per_course = 3
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def list(self, request):
+        text = request.query_params.get('q', '')
+        if not parse_terms(text):
+            return Response({'query': text, 'results': []})
+
+        context = {'request': request}
+        serializer = CourseSearchResultSerializer(context=context)
+        lessons = restrict_queryset(
+            Lesson.objects.filter(course__is_published=True),
+            LessonSummarySerializer(context={**context, 'fieldset_path': ('matching_lessons',)}),
+            always=('course',))
+        courses = restrict_queryset(search_courses(
+            Course.objects.filter(is_published=True), text, lessons=lessons
+        ), serializer)
+        if 'lessons_count' in serializer.fields:
+            courses = courses.annotate(lessons_count=lessons_count())
+        courses = list(courses[:self.get_limit()])
+
+        # Best few matching lessons per course, ranked within each course
+        matches = defaultdict(list)
+        course_lessons = search_lessons(
+            lessons.filter(course__in=[course.pk for course in courses]), text
+        ).annotate(position=Window(
+            RowNumber(), partition_by=F('course_id'), order_by=F('rank').desc()
+        )).filter(position__lte=self.lessons_per_course)
+        for lesson in course_lessons:
+            matches[lesson.course_id].append(lesson)
+        for course in courses:
+            course.matching_lessons = matches[course.pk]
+
+        serializer = CourseSearchResultSerializer(courses, many=True, context=context)
+        with profiling.phase('serialize'):
+            results = serializer.data
+        return Response({'query': text, 'results': results})
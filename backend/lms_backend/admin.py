@@ -0,0 +1,147 @@
+"""
+Admin building blocks for tables too large to list, count or filter in
+full.
+
+- `EstimatedCountPaginator` takes large counts from the planner's row
+  estimate instead of running COUNT(*) over the whole result.
+- `LargeTableAdminMixin` uses it, and turns off the other full counts a
+  changelist runs (the unfiltered total and the filter facets).
+- `AutocompleteFilter` filters on a foreign key through an autocomplete
+  box, instead of a link per related row in the sidebar.
+- `PaginatedInlineMixin` edits one page of related rows at a time.
+"""
+import json
+
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import _get_foreign_key
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator trusting PostgreSQL's row estimate when it exceeds
+    `threshold`; smaller results, and other databases, are counted exactly.
+    Page numbers past the end of an underestimated result are empty.
+    """
+    threshold = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            estimate = self.estimate(queryset, connection)
+            if estimate > self.threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset, connection):
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin settings for changelists over large tables"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(spec, tuple) and issubclass(spec[1], AutocompleteFilter)
+               for spec in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key, e.g. `list_filter = [('course', AutocompleteFilter)]`.
+    The related model's admin needs `search_fields`.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        value = self.used_parameters.get(self.lookup_kwarg)
+        self.value = value[-1] if isinstance(value, list) else value
+        choice_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False)
+        self.widget = choice_field.widget.render(
+            self.lookup_kwarg, self.value,
+            attrs={'id': f'filter_{field_path}', 'data-width': '100%'})
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # The template only needs the query string without this filter
+        yield {
+            'selected': self.value is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg, 'p']),
+            'display': _('All'),
+        }
+
+
+class PaginatedInlineMixin:
+    """
+    Inline editing `per_page` related rows at a time, picked with
+    ?<model>_page= on the change page
+    """
+    per_page = 20
+    template = 'admin/edit_inline/paginated_tabular.html'
+
+    @property
+    def page_param(self):
+        return f'{self.model._meta.model_name}_page'
+
+    @property
+    def page(self):
+        return getattr(self, '_page', None)
+
+    def get_page(self, request):
+        """The page shown on this change page, None when adding"""
+        if hasattr(self, '_page'):
+            return self._page
+        self._page = None
+        object_id = request.resolver_match.kwargs.get('object_id') \
+            if request.resolver_match else None
+        if object_id is not None:
+            fk = _get_foreign_key(self.parent_model, self.model, self.fk_name)
+            related = super().get_queryset(request).filter(**{fk.name: object_id})
+            ordering = self.get_ordering(request) or self.model._meta.ordering or ['pk']
+            paginator = Paginator(
+                related.order_by(*ordering, 'pk').values_list('pk', flat=True),
+                self.per_page)
+            self._page = paginator.get_page(request.GET.get(self.page_param))
+            self.page_links = []
+            for number in paginator.get_elided_page_range(self._page.number):
+                if number == paginator.ELLIPSIS:
+                    self.page_links.append((number, None))
+                    continue
+                params = request.GET.copy()
+                params[self.page_param] = number
+                self.page_links.append((number, params.urlencode()))
+        return self._page
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        page = self.get_page(request)
+        if page is None:
+            return queryset
+        return queryset.filter(pk__in=list(page.object_list))
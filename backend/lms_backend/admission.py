@@ -0,0 +1,141 @@
+"""
+Load shedding: turn requests away with 503 while the database is slow,
+instead of queueing more work behind it.
+
+`LatencyMonitor` keeps a moving average of how long SQL statements take
+in this process, timing every statement on every connection. While that
+average is above `SHEDDING['LATENCY_MS']`, `LoadSheddingMiddleware`
+rejects requests to expensive routes (a cost above 1 in
+`RATE_LIMITS['COSTS']`, see lms_backend.throttling); above
+`CRITICAL_LATENCY_MS` it also rejects every request without credentials.
+Rejections carry a Retry-After of `RETRY_AFTER` seconds. Only /api/ is
+shed, never the admin site.
+
+The average only describes recent traffic: with no statement in the last
+`WINDOW` seconds it is taken to be back to normal, so shedding cannot
+keep itself going.
+"""
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from .throttling import request_cost
+
+DEFAULTS = {
+    'ENABLED': True,
+    'LATENCY_MS': 250,
+    'CRITICAL_LATENCY_MS': 1000,
+    'RETRY_AFTER': 5,
+    'WINDOW': 10,
+    # Weight of the newest statement in the moving average
+    'SMOOTHING': 0.05,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'SHEDDING', {}).get(name, DEFAULTS[name])
+
+
+class LatencyMonitor:
+    """Exponential moving average of SQL statement latency, in milliseconds"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.average = 0.0
+        self.updated = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # A database execute wrapper, see install()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record((time.perf_counter() - start) * 1000)
+
+    def record(self, milliseconds):
+        now = time.monotonic()
+        with self.lock:
+            if self.updated is None or now - self.updated > get_setting('WINDOW'):
+                self.average = milliseconds
+            else:
+                smoothing = get_setting('SMOOTHING')
+                self.average += smoothing * (milliseconds - self.average)
+            self.updated = now
+
+    def latency(self):
+        with self.lock:
+            if self.updated is None or time.monotonic() - self.updated > get_setting('WINDOW'):
+                return 0.0
+            return self.average
+
+    def reset(self):
+        with self.lock:
+            self.average, self.updated = 0.0, None
+
+    def install(self, connection):
+        # Outermost, so context-managed wrappers (query capture, profiling)
+        # still pop their own
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+
+monitor = LatencyMonitor()
+
+
+def install_monitor(sender, connection, **kwargs):
+    monitor.install(connection)
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if get_setting('ENABLED'):
+            connection_created.connect(install_monitor, dispatch_uid='admission-latency')
+            for connection in connections.all(initialized_only=True):
+                monitor.install(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.reject(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.reject(request) or await self.get_response(request)
+
+    def reject(self, request):
+        """A 503 response if the request is to be shed, else None"""
+        if not get_setting('ENABLED') or not request.path.startswith('/api/'):
+            return None
+        latency = monitor.latency()
+        if latency < get_setting('LATENCY_MS'):
+            return None
+        # Only resolved here, while the database is slow, to find the cost
+        try:
+            request.resolver_match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if request_cost(request) > 1 or (latency >= get_setting('CRITICAL_LATENCY_MS') and
+                                         not self.has_credentials(request)):
+            response = JsonResponse(
+                {'detail': 'The service is overloaded, try again later.'}, status=503)
+            response['Retry-After'] = str(get_setting('RETRY_AFTER'))
+            return response
+        return None
+
+    @staticmethod
+    def has_credentials(request):
+        # Checked for presence only; DRF authenticates them later
+        return ('HTTP_AUTHORIZATION' in request.META or
+                getattr(settings, 'REST_AUTH', {}).get('JWT_AUTH_COOKIE') in request.COOKIES)
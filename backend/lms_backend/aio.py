@@ -0,0 +1,60 @@
+"""
+Database access from async views.
+
+Django's async ORM methods (`aget`, `acount`, `async for`) still run each
+query through asgiref's thread-sensitive executor: one thread per
+process, shared by every request, so queries from concurrent requests
+queue behind each other and `asyncio.gather()` over them runs them one
+at a time. psycopg2 has no async mode to avoid the hop altogether.
+
+`offload` instead runs ORM work on a dedicated pool of
+`ASYNC_DB_THREADS` threads, each with its own connection, so concurrent
+requests and the fan-out queries of one request really run in parallel.
+Pool threads keep their connections between jobs for CONN_MAX_AGE like
+request threads do.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import profiling
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_DB_THREADS', 10),
+            thread_name_prefix='async-db')
+    return _executor
+
+
+def _run(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        with profiling.instrumented():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def offload(func, *args, **kwargs):
+    """Run `func`, which may use the ORM, on the database thread pool"""
+    run = sync_to_async(_run, thread_sensitive=False, executor=get_executor())
+    return await run(func, *args, **kwargs)
+
+
+async def gather(*calls):
+    """Run several ORM callables in parallel; results come back in order"""
+    return await asyncio.gather(*(offload(call) for call in calls))
+
+
+def evaluate(queryset):
+    """A callable for `gather` that evaluates `queryset` to a list"""
+    return partial(list, queryset)
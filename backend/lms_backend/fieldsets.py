@@ -0,0 +1,158 @@
+"""
+Client-selected fields for read endpoints: ?fields=, ?omit= and ?expand=.
+
+- `fields=id,title,price` keeps only the listed fields. Dotted names such
+  as `instructor.email` select inside a nested serializer, and keep the
+  parent.
+- `omit=description,instructor.bio` drops the named fields.
+- `expand=content` adds fields a serializer leaves out by default, named
+  in `Meta.expandable_fields`. Listing such a field in `fields` also
+  expands it. For expand, a bare name matches at any depth, which keeps
+  ?expand=content working on lesson previews nested in course details.
+
+Selections apply to safe-method requests only, so writes always see
+every field.
+
+`SparseFieldsMixin` applies a selection to a serializer and to the
+serializers nested in it. `restrict_queryset` then loads only what the
+remaining fields read: it defers unused columns with `only()` and joins
+only the nested relations still present. Fields that are not plain model
+fields declare their columns in `Meta.field_sources`, mapping a field
+name to the model fields it reads (empty for annotations, prefetches or
+the primary key). Fields can also expose a `model_fields` attribute.
+Without that information the columns are not restricted.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+PARAMS = ('fields', 'omit', 'expand')
+
+
+def parse(params, name):
+    return [
+        item.strip()
+        for value in params.getlist(name)
+        for item in value.split(',')
+        if item.strip()
+    ]
+
+
+class FieldSelection:
+    """The fields a request asked for; `fields=None` means all of them"""
+
+    def __init__(self, fields=None, omit=(), expand=()):
+        self.fields = set(fields) if fields else None
+        self.omit = set(omit)
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        return cls(*(parse(params, name) for name in PARAMS))
+
+    def is_expanded(self, path, name):
+        full_name = '.'.join((*path, name))
+        return name in self.expand or full_name in self.expand or (
+            self.fields is not None and full_name in self.fields)
+
+    def keeps(self, path, name):
+        """Whether the field `name` of the serializer at `path` is output"""
+        prefix = ''.join(f'{part}.' for part in path)
+        if f'{prefix}{name}' in self.omit:
+            return False
+        if self.fields is None:
+            return True
+        level = {
+            selected[len(prefix):].split('.')[0]
+            for selected in self.fields if selected.startswith(prefix)
+        }
+        return not level or name in level
+
+
+class SparseFieldsMixin:
+    """
+    Serializer whose fields follow the request's ?fields=, ?omit= and
+    ?expand=. Serializers built inside another one (in a method field, say)
+    pass their position as `fieldset_path` in the context.
+    """
+
+    def get_fieldset_path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return (*self.context.get('fieldset_path', ()), *reversed(path))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = FieldSelection.from_request(self.context.get('request'))
+        path = self.get_fieldset_path()
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable_fields', ())
+        for name in list(fields):
+            if name in expandable and not selection.is_expanded(path, name):
+                fields.pop(name)
+            elif not selection.keeps(path, name):
+                fields.pop(name)
+        return fields
+
+
+def forward_relation(model, source):
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+    return field if field.many_to_one or field.one_to_one else None
+
+
+def model_columns(serializer, model):
+    """
+    The columns `serializer` reads from `model`, as lookups, and the nested
+    forward relations to join. Columns are None if some field's are unknown.
+    """
+    sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    columns, related, known = {model._meta.pk.name}, [], True
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in sources:
+            columns.update(sources[name])
+        elif getattr(field, 'model_fields', None) is not None:
+            columns.update(field.model_fields)
+        elif (relation := forward_relation(model, field.source)) is not None \
+                and isinstance(field, serializers.BaseSerializer):
+            nested_columns, nested_related = model_columns(field, relation.related_model)
+            related.append(field.source)
+            related.extend(f'{field.source}__{lookup}' for lookup in nested_related)
+            columns.add(field.source)
+            if nested_columns is None:
+                known = False
+            else:
+                columns.update(f'{field.source}__{lookup}' for lookup in nested_columns)
+        else:
+            try:
+                concrete = model._meta.get_field(field.source).concrete
+            except FieldDoesNotExist:
+                concrete = False
+            if concrete:
+                columns.add(field.source)
+            else:
+                known = False
+    return (columns if known else None), related
+
+
+def restrict_queryset(queryset, serializer, always=()):
+    """
+    `queryset` loading only what `serializer` outputs: its columns (plus
+    `always`, e.g. ordering keys) and its nested forward relations
+    """
+    columns, related = model_columns(serializer, queryset.model)
+    if related:
+        queryset = queryset.select_related(*related)
+    if columns is not None:
+        queryset = queryset.only(*columns, *always)
+    return queryset
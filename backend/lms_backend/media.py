@@ -0,0 +1,298 @@
+"""
+Resized, recompressed renditions of uploaded images.
+
+Apps register an image field together with a JSONField that stores its
+rendition map (see `register`). Saving a new upload queues the
+`generate_renditions` task once the transaction commits, so requests
+never wait on Pillow. The worker writes every
+rendition in every format under a content-hashed name next to the
+original:
+
+    course_images/renditions/<stem>-<rendition>-<hash>.<ext>
+
+and records them in the map:
+
+    {"source": "course_images/python.png",
+     "renditions": {"thumbnail": {"width": 320, "height": 180,
+                                  "webp": "<name>", "jpeg": "<name>"}, ...}}
+
+`source` ties the map to the upload it was made from, so a map for a
+replaced image is never served. Because names change with the content,
+renditions can be cached by clients and CDNs indefinitely.
+
+Jobs go through the configured task broker (tasks.core). With
+`MEDIA_PIPELINE['EAGER']` they run inline on commit, which is what tests
+want.
+"""
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from rest_framework import serializers
+
+from tasks.core import task
+
+DEFAULTS = {
+    'ENABLED': True,
+    'EAGER': False,
+    'JPEG_QUALITY': 82,
+    'WEBP_QUALITY': 80,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+# Sent by the worker once a rendition map has been written, with
+# `instance_pk` and `field_name`. Writes go through QuerySet.update(), so
+# post_save does not fire for them.
+renditions_ready = Signal()
+
+
+def get_setting(name):
+    return getattr(settings, 'MEDIA_PIPELINE', {}).get(name, DEFAULTS[name])
+
+
+@dataclass(frozen=True)
+class RenditionSpec:
+    """Rendition sizes (name -> (width, height)) for one image field"""
+    field_name: str
+    renditions_field: str
+    sizes: dict
+
+
+_registry = {}
+
+
+def register(model, field_name, renditions_field, sizes):
+    """
+    Generate renditions of `model.field_name` in `sizes` whenever a new
+    image is saved, storing the map in `model.renditions_field`
+    """
+    label = model._meta.label
+    spec = RenditionSpec(field_name, renditions_field, sizes)
+    _registry[(label, field_name)] = spec
+
+    def schedule(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+        schedule_renditions(instance, spec)
+
+    post_save.connect(schedule, sender=model, weak=False,
+                      dispatch_uid=f'media-renditions-{label}-{field_name}')
+
+
+def get_spec(model, field_name):
+    return _registry[(model._meta.label, field_name)]
+
+
+def registered_fields():
+    return [(apps.get_model(label), field_name) for label, field_name in _registry]
+
+
+def schedule_renditions(instance, spec):
+    if not get_setting('ENABLED'):
+        return
+    image = getattr(instance, spec.field_name)
+    current = getattr(instance, spec.renditions_field) or {}
+    if not image:
+        if current:
+            type(instance)._default_manager.filter(pk=instance.pk).update(
+                **{spec.renditions_field: {}})
+            delete_renditions(image.storage, current)
+        return
+    if current.get('source') == image.name:
+        return
+    args = (instance._meta.label, instance.pk, spec.field_name)
+    if get_setting('EAGER'):
+        transaction.on_commit(lambda: generate_renditions(*args))
+    else:
+        generate_renditions.enqueue(args=args, key='renditions:{}:{}:{}'.format(*args))
+
+
+def resize(image, width, height):
+    """Crop `image` to the aspect ratio of width x height, never upscaling"""
+    scale = min(1, image.width / width, image.height / height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+
+
+def encode(image, fmt):
+    pil_format, _ = FORMATS[fmt]
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    if fmt == 'jpeg':
+        if has_alpha:
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA').split()[-1])
+            image = background
+        else:
+            image = image.convert('RGB')
+        options = {'quality': get_setting('JPEG_QUALITY'), 'optimize': True,
+                   'progressive': True}
+    else:
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        options = {'quality': get_setting('WEBP_QUALITY'), 'method': 4}
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != 'webp' or features.check('webp')]
+
+
+def render(image_file, spec):
+    """Write every rendition of `image_file` and return the rendition map"""
+    storage = image_file.storage
+    directory, filename = os.path.split(image_file.name)
+    stem = os.path.splitext(filename)[0]
+
+    image_file.open('rb')
+    try:
+        with Image.open(image_file) as original:
+            original = ImageOps.exif_transpose(original)
+            original.load()
+    finally:
+        image_file.close()
+
+    renditions = {}
+    for name, (width, height) in spec.sizes.items():
+        resized = resize(original, width, height)
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt in available_formats():
+            data = encode(resized, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = os.path.join(
+                directory, 'renditions', f'{stem}-{name}-{digest}.{FORMATS[fmt][1]}')
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(data))
+            entry[fmt] = path
+        renditions[name] = entry
+    return {'source': image_file.name, 'renditions': renditions}
+
+
+def rendition_files(rendition_map):
+    return {
+        path
+        for entry in (rendition_map or {}).get('renditions', {}).values()
+        for fmt, path in entry.items() if fmt in FORMATS
+    }
+
+
+def delete_renditions(storage, rendition_map, keep=()):
+    for path in rendition_files(rendition_map) - set(keep):
+        storage.delete(path)
+
+
+@task
+def generate_renditions(label, pk, field_name):
+    """Task: build the renditions of one object's image field"""
+    model = apps.get_model(label)
+    spec = _registry[(label, field_name)]
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return
+    image = getattr(instance, spec.field_name)
+    if not image:
+        return
+    previous = getattr(instance, spec.renditions_field) or {}
+    rendition_map = render(image, spec)
+
+    # Only store the map if the image was not replaced in the meantime; the
+    # save that replaced it has scheduled its own job. Renditions change the
+    # object's representation, so auto_now timestamps (which feed ETags)
+    # move too.
+    changes = {spec.renditions_field: rendition_map}
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            changes[field.name] = timezone.now()
+    updated = model._default_manager.filter(
+        pk=pk, **{spec.field_name: image.name}).update(**changes)
+
+    if updated:
+        delete_renditions(image.storage, previous, keep=rendition_files(rendition_map))
+        renditions_ready.send(sender=model, instance_pk=pk, field_name=field_name)
+    else:
+        delete_renditions(image.storage, rendition_map, keep=rendition_files(previous))
+
+
+class RenditionsField(serializers.Field):
+    """
+    Read-only rendition map of an image field, with absolute URLs and a
+    `srcset` per format:
+
+        {"thumbnail": {"width": 320, "height": 180, "webp": "...", "jpeg": "..."},
+         ...,
+         "srcset": {"webp": "... 320w, ... 640w", "jpeg": "..."}}
+
+    Empty until the worker has processed the current image.
+    """
+
+    def __init__(self, field_name, **kwargs):
+        self.image_field_name = field_name
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @property
+    def model_fields(self):
+        """The columns read, for lms_backend.fieldsets"""
+        spec = get_spec(self.parent.Meta.model, self.image_field_name)
+        return [self.image_field_name, spec.renditions_field]
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field_name)
+        spec = get_spec(type(instance), self.image_field_name)
+        rendition_map = getattr(instance, spec.renditions_field) or {}
+        if not image or rendition_map.get('source') != image.name:
+            return {}
+
+        result, srcset = {}, {}
+        for name, entry in rendition_map['renditions'].items():
+            result[name] = {'width': entry['width'], 'height': entry['height']}
+            for fmt in FORMATS:
+                if fmt in entry:
+                    url = rendition_url(self.context, image.storage, entry[fmt])
+                    result[name][fmt] = url
+                    srcset.setdefault(fmt, []).append(f"{url} {entry['width']}w")
+        result['srcset'] = {fmt: ', '.join(items) for fmt, items in srcset.items()}
+        return result
+
+
+class RenditionURLField(RenditionsField):
+    """
+    URL of one rendition of an image field, falling back to the original
+    until the rendition exists
+    """
+
+    def __init__(self, field_name, rendition, fmt='jpeg', **kwargs):
+        self.rendition = rendition
+        self.format = fmt
+        super().__init__(field_name, **kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field_name)
+        if not image:
+            return None
+        spec = get_spec(type(instance), self.image_field_name)
+        rendition_map = getattr(instance, spec.renditions_field) or {}
+        entry = rendition_map.get('renditions', {}).get(self.rendition, {})
+        if rendition_map.get('source') == image.name and self.format in entry:
+            return rendition_url(self.context, image.storage, entry[self.format])
+        return rendition_url(self.context, image.storage, image.name)
+
+
+def rendition_url(context, storage, name):
+    url = storage.url(name)
+    request = context.get('request')
+    return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,175 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor, CursorPagination, PageNumberPagination, _reverse_ordering)
+from rest_framework.response import Response
+
+
+class LegacyPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination over a stable ordering, `(-created_at, -id)`
+    by default. Views can declare `cursor_ordering` to page over other keys.
+
+    Cursors carry the whole sort key of the row they start after, id
+    included, and pages are filtered on that key as a tuple, so any number
+    of rows sharing a value (e.g. one price) page through without offsets.
+    Ordering fields must not be nullable.
+
+    - Clients choose the page size with ?page_size= up to `max_page_size`
+    - The total is only counted when asked for with ?count=true
+    - Requests that still pass ?page= get page-number pagination, so older
+      clients keep working while they migrate
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    legacy_class = LegacyPageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.legacy = None
+        if self.legacy_class.page_query_param in request.query_params:
+            self.legacy = self.legacy_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(queryset.model, ordering, position))
+
+        # One extra row tells whether there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > self.page_size:
+            following = self._get_position_from_instance(results[-1], self.ordering)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_position_filter(self, model, ordering, position):
+        """
+        Rows after `position` in `ordering`: `(a, b, id) > (x, y, z)` spelled
+        out as `a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)`,
+        with `<` for descending fields. The leading `a >= x` lets the index
+        on the sort key bound the scan.
+        """
+        names = [field.lstrip('-') for field in ordering]
+        values = [self.to_python(model, name, value) for name, value in zip(names, position)]
+        clauses = []
+        for index, (field, name) in enumerate(zip(ordering, names)):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[index]})
+            for equal_name, equal_value in zip(names[:index], values[:index]):
+                clause &= Q(**{equal_name: equal_value})
+            clauses.append(clause)
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        bound = Q(**{f'{names[0]}__{lookup}': values[0]})
+        return bound & reduce(or_, clauses)
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation; the database compares it as given
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering) or \
+                not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        # Positions are unique, so cursors never need an offset
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        if isinstance(cursor.position, list):
+            cursor = cursor._replace(position=json.dumps(cursor.position))
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Every field of the sort key, as strings each field parses back
+        position = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return position
+
+    def get_ordering(self, request, queryset, view):
+        """
+        The view's or client's ordering, with the primary key appended as a
+        tie-breaker so that the sort key identifies one row
+        """
+        default = getattr(view, 'cursor_ordering', None)
+        if default is not None:
+            self.ordering = default
+        ordering = super().get_ordering(request, queryset, view)
+
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = ordering[0].startswith('-')
+            ordering += ('-id' if descending else 'id',)
+        return ordering
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'example': 123,
+        }
+        return response_schema
@@ -0,0 +1,269 @@
+"""
+Per-request profiling of SQL, serialization, authentication and
+permission checks.
+
+`ProfilingMiddleware` samples requests at `PROFILING['SAMPLE_RATE']`, by
+default none. For a sampled request it wraps every database connection to
+time queries and group them by fingerprint, and exposes a `RequestProfile`
+through a context variable so `ProfiledViewMixin` can time the DRF phases.
+When the response goes out, the profile is:
+
+- logged as one JSON line on the `lms_backend.profiling` logger
+- added as a `Server-Timing` header when `PROFILING['SERVER_TIMING']` is on
+- checked for N+1 patterns: a query fingerprint repeated at least
+  `N_PLUS_ONE_THRESHOLD` times logs a warning naming the route, e.g.
+  `course-list`
+
+Phase timings are exclusive: SQL run while serializing or checking
+permissions counts as `db`, not as `serialize` or `perm`, so the phases
+never add up to more than `total`.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.0,
+    'SERVER_TIMING': False,
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+PHASES = ('auth', 'perm', 'serialize')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# Placeholder lists of varying length, e.g. IN (%s, %s, %s)
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def get_setting(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """
+    Identify the shape of a query regardless of its parameters. Django
+    passes parameters separately, so only inline literals such as LIMIT
+    values and the length of IN lists need folding.
+    """
+    normalized = _PLACEHOLDER_LIST.sub('(...)', sql)
+    normalized = _NUMBER.sub('N', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.statements = {}
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self._depth = 0
+        # Async views run queries from several threads at once
+        self._lock = threading.Lock()
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            key, normalized = fingerprint(sql)
+            with self._lock:
+                self.sql_time += elapsed
+                self.query_count += 1
+                self.fingerprints[key] += 1
+                self.statements.setdefault(key, normalized)
+
+    @contextmanager
+    def phase(self, name):
+        # Nested phases (a permission check inside serialization) are
+        # charged to the outermost one only
+        if self._depth:
+            yield
+            return
+        self._depth += 1
+        start, sql_before = time.perf_counter(), self.sql_time
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            elapsed = time.perf_counter() - start
+            # SQL from parallel threads can overlap the phase, never go negative
+            self.phases[name] += max(0.0, elapsed - (self.sql_time - sql_before))
+
+    def duplicates(self):
+        return {key: count for key, count in self.fingerprints.items() if count > 1}
+
+    def n_plus_one(self):
+        threshold = get_setting('N_PLUS_ONE_THRESHOLD')
+        return {key: count for key, count in self.fingerprints.items()
+                if count >= threshold}
+
+    def summary(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'route': match.url_name if match else None,
+            'status': response.status_code,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'queries': self.query_count,
+            'db_ms': round(self.sql_time * 1000, 2),
+            **{f'{name}_ms': round(value * 1000, 2) for name, value in self.phases.items()},
+            'duplicate_queries': self.duplicates(),
+        }
+
+    def server_timing(self, summary):
+        metrics = [
+            f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries"',
+            *(f'{name};dur={summary[f"{name}_ms"]}' for name in PHASES),
+            f'total;dur={summary["total_ms"]}',
+        ]
+        duplicates = sum(summary['duplicate_queries'].values())
+        if duplicates:
+            metrics.append(f'dup;desc="{duplicates} duplicate queries"')
+        return ', '.join(metrics)
+
+
+def current_profile():
+    """The profile of the request being handled, if it was sampled"""
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """Time a block as one of PHASES when the current request is sampled"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.phase(name):
+        yield
+
+
+@contextmanager
+def instrumented():
+    """
+    Record the queries this thread runs in the current request's profile.
+    Connections are per thread, so code that queries from worker threads
+    (see lms_backend.aio) enters this in each of them.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile.record_query))
+        yield
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return get_setting('ENABLED') and random.random() < get_setting('SAMPLE_RATE')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with instrumented():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.report(profile, request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.report(profile, request, response)
+        return response
+
+    def report(self, profile, request, response):
+        summary = profile.summary(request, response)
+        logger.info(json.dumps(summary))
+        for key, count in profile.n_plus_one().items():
+            logger.warning(json.dumps({
+                'event': 'n_plus_one',
+                'route': summary['route'],
+                'path': summary['path'],
+                'count': count,
+                'fingerprint': key,
+                'sql': profile.statements[key],
+            }))
+        if get_setting('SERVER_TIMING'):
+            response['Server-Timing'] = profile.server_timing(summary)
+
+
+class ProfiledViewMixin:
+    """
+    Time authentication, permission checks and serialization of DRF views
+    for sampled requests. Serialization is timed on serializers returned by
+    `get_serializer`; views that build serializers themselves can wrap the
+    work in `profiling.phase('serialize')`.
+    """
+
+    def perform_authentication(self, request):
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase('perm'):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _current.get() is not None:
+            to_representation = serializer.to_representation
+
+            def timed(instance):
+                with phase('serialize'):
+                    return to_representation(instance)
+            serializer.to_representation = timed
+        return serializer
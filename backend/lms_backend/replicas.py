@@ -0,0 +1,85 @@
+"""
+Read-replica routing for the catalog viewsets.
+
+Views using `ReplicaReadMixin` mark safe-method requests, once they are
+authenticated and authorized, as allowed to read from a replica. While
+that mark is set, `ReplicaRouter` sends ORM reads to one replica picked
+for the request. Everything else, including every write, authentication
+and permission checks, stays on the primary.
+
+Read-your-writes: a successful unsafe request through one of those views
+pins its user to the primary for REPLICA_PIN_SECONDS, so a user never
+reads a replica that has not yet caught up with their own POST/PATCH.
+Pins live in the default cache, which must be shared between processes
+(CACHE_URL) for them to hold across workers.
+
+Replicas are the database aliases other than `default`, except those
+that point at the primary database itself, such as the test mirrors
+configured in settings: in tests every read stays on the primary, inside
+the test's transaction.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'db:pin:{user_id}'
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+
+
+def database_identity(alias):
+    config = connections[alias].settings_dict
+    return config['ENGINE'], config['NAME'], config['HOST'], config['PORT']
+
+
+def replica_aliases():
+    primary = database_identity('default')
+    return [alias for alias in connections
+            if alias != 'default' and database_identity(alias) != primary]
+
+
+def pin(user):
+    cache.set(PIN_KEY.format(user_id=user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(PIN_KEY.format(user_id=user.pk), False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {'default', *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Let safe-method requests to a DRF view read from a replica, and pin
+    users to the primary after they write through it
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replicas = replica_aliases()
+        if replicas and request.method in SAFE_METHODS and not is_pinned(request.user):
+            _read_alias.set(random.choice(replicas))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _read_alias.set(None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and request.user.is_authenticated):
+            pin(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
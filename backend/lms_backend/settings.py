@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party apps
     'corsheaders',
@@ -53,13 +54,18 @@ INSTALLED_APPS = [
 
     # Local apps
     'users',
-    'courses'
+    'courses',
+    'analytics',
+    'tasks',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'lms_backend.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'lms_backend.admission.LoadSheddingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -73,7 +79,8 @@ ROOT_URLCONF = 'lms_backend.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        # Admin templates of lms_backend.admin
+        'DIRS': [os.path.join(BASE_DIR, 'lms_backend', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -99,9 +106,178 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': "localhost",
         'PORT': "5432",
+        # Keep connections open between requests instead of paying for a
+        # new one every time; health checks replace ones the server dropped
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# With psycopg 3 installed, DB_POOL=1 switches to Django's connection pool
+# (persistent connections must then be off)
+if os.environ.get('DB_POOL') == '1':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        },
+    }
+
+# Read replicas: DB_REPLICA_HOSTS is a comma-separated list of host[:port].
+# Safe-method requests to the catalog viewsets read from a replica (see
+# lms_backend.replicas). In tests they mirror the primary.
+for index, address in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{index + 1}' if index else 'replica'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['lms_backend.replicas.ReplicaRouter']
+
+# How long a user's reads stay on the primary after they write, to cover
+# replication lag
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# Local memory by default; point CACHE_URL at Redis in production, e.g.
+# redis://localhost:6379/0
+
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Response cache for the public catalog endpoints (courses.cache)
+CATALOG_CACHE = {
+    'ENABLED': os.environ.get('CATALOG_CACHE_ENABLED', '1') == '1',
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Users resolved from JWTs (users.authentication), cached by id so
+# authenticated requests skip the users_user lookup. Saves drop the entry;
+# TIMEOUT bounds staleness for writes that bypass save().
+AUTH_USER_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+# Threads that run database work for async views (lms_backend.aio); each
+# holds its own connection
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 10))
+
+# Background tasks (tasks.core). 'local' runs them on a thread in each
+# process; 'database' and 'redis' queue them for `manage.py run_tasks`
+# workers, so they survive restarts; 'immediate' runs them inline on commit.
+TASKS = {
+    'BACKEND': os.environ.get('TASKS_BACKEND', 'local'),
+    'REDIS_URL': os.environ.get('TASKS_REDIS_URL', os.environ.get('CACHE_URL', '')),
+    'MAX_ATTEMPTS': 3,
+    # Seconds before the first retry, doubling for each one after
+    'RETRY_DELAY': 5,
+    # Seconds after which a running database job is presumed lost
+    'VISIBILITY_TIMEOUT': 300,
+}
+
+# Image renditions (lms_backend.media), generated by a background task.
+# EAGER runs the jobs inline on commit instead.
+MEDIA_PIPELINE = {
+    'ENABLED': True,
+    'EAGER': False,
+    'JPEG_QUALITY': 82,
+    'WEBP_QUALITY': 80,
+}
+
+# Request profiling (lms_backend.profiling): sampled requests log their
+# query count, SQL time and DRF phase timings, and flag repeated queries.
+# Server-Timing headers expose the same numbers to browser dev tools.
+# Nothing is sampled unless PROFILING_SAMPLE_RATE opts in, e.g. 1 while
+# investigating locally or 0.01 in production.
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'SERVER_TIMING': DEBUG,
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+# Token-bucket rate limits (lms_backend.throttling). STORE is 'local' (per
+# process) or 'redis' to share buckets between processes and nodes. A rate
+# of N/min allows bursts of N; requests cost 1 token unless COSTS says
+# otherwise, and routes in ROUTES also share one bucket between all clients.
+RATE_LIMITS = {
+    'ENABLED': os.environ.get('RATE_LIMITS_ENABLED', '1') == '1',
+    'STORE': os.environ.get('RATE_LIMIT_STORE', 'local'),
+    'REDIS_URL': os.environ.get('RATE_LIMIT_REDIS_URL', os.environ.get('CACHE_URL', '')),
+    'RATES': {
+        'user': '600/min',
+        'anon': '300/min',
+        'login': '10/min',
+    },
+    'ROUTES': {
+        'search-list': '3000/min',
+        'course-list?search': '3000/min',
+        'async-course-list?search': '3000/min',
+        'user-export': '200/min',
+        'review-export': '200/min',
+    },
+    'COSTS': {
+        'search-list': 5,
+        'course-list?search': 5,
+        'async-course-list?search': 5,
+        'user-export': 20,
+        'review-export': 20,
+        'user-import': 20,
+    },
+    'LOGIN_ROUTES': [
+        'token_obtain_pair', 'rest_login', 'rest_register', 'rest_password_reset',
+        'rest_password_reset_confirm',
+    ],
+}
+
+# Tests run with RATE_LIMITS['ENABLED'] off (lms_backend.testing)
+TEST_RUNNER = 'lms_backend.testing.TestRunner'
+
+# Load shedding (lms_backend.admission): while the average SQL statement
+# takes over LATENCY_MS, expensive routes answer 503 with Retry-After; over
+# CRITICAL_LATENCY_MS so do requests without credentials.
+SHEDDING = {
+    'ENABLED': os.environ.get('SHEDDING_ENABLED', '1') == '1',
+    'LATENCY_MS': 250,
+    'CRITICAL_LATENCY_MS': 1000,
+    'RETRY_AFTER': 5,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'lms_backend.profiling': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROFILING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,16 +329,24 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        'users.authentication.CachedJWTAuthentication',
+        'users.authentication.CachedJWTCookieAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'lms_backend.throttling.UserBucketThrottle',
+        'lms_backend.throttling.AnonBucketThrottle',
+        'lms_backend.throttling.LoginBucketThrottle',
+        'lms_backend.throttling.RouteBucketThrottle',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Cursor pages over (created_at, id) unless a view declares cursor_ordering;
+    # ?page= still gets page numbers
+    'DEFAULT_PAGINATION_CLASS': 'lms_backend.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
 }
 
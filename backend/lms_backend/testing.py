@@ -0,0 +1,36 @@
+"""
+Shared test helpers.
+
+`TestRunner` (settings.TEST_RUNNER) runs the suite with rate limiting
+off, so tests never trip over the buckets of earlier ones; throttling
+tests opt back in with `override_settings(RATE_LIMITS=...)` and clear the
+bucket store between tests themselves.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.rate_limits = override_settings(
+            RATE_LIMITS={**settings.RATE_LIMITS, 'ENABLED': False})
+        self.rate_limits.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.rate_limits.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+def create_user(username, role=None, **fields):
+    """
+    A user named `username`, with `username@example.com` as email and
+    'password' as password; a student unless `role` says otherwise
+    """
+    if role is not None:
+        fields['role'] = role
+    return get_user_model().objects.create_user(
+        username=username, email=f'{username}@example.com', password='password', **fields)
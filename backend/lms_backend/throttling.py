@@ -0,0 +1,255 @@
+"""
+Token-bucket rate limits for the API, as DRF throttles.
+
+A rate of `N/period` is a bucket holding at most N tokens that refills at
+N per period, so a client can burst N requests and then sustain the rate.
+Each request takes tokens from every bucket that applies to it:
+
+    user    authenticated requests, per user
+    anon    anonymous requests, per client IP (see DRF's NUM_PROXIES)
+    login   LOGIN_ROUTES, per client IP, against password guessing
+    route   routes listed in ROUTES, one bucket per route for all clients
+
+Requests cost one token, or what COSTS gives their route. Routes are URL
+names, optionally qualified by a query parameter that makes them costly,
+e.g. `course-list?search` for catalog searches. A request that finds a
+bucket short is rejected with 429 and a Retry-After of the time until
+enough tokens are back.
+
+Buckets live in a store updated atomically: `local` keeps them in this
+process, `redis` shares them between processes and nodes through any
+Redis-compatible server (needs the `redis` package).
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': 'local',
+    'REDIS_URL': '',
+    'REDIS_PREFIX': 'throttle',
+    'RATES': {
+        'user': '600/min',
+        'anon': '300/min',
+        'login': '10/min',
+    },
+    'ROUTES': {},
+    'COSTS': {},
+    'LOGIN_ROUTES': [],
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_setting(name):
+    return getattr(settings, 'RATE_LIMITS', {}).get(name, DEFAULTS[name])
+
+
+def parse_rate(rate):
+    """'600/min' -> (capacity 600, refill 10.0 tokens per second)"""
+    count, _, period = rate.partition('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()[0]]
+
+
+class LocalBucketStore:
+    """Buckets of this process, behind a lock"""
+    # Full buckets are dropped every this many updates
+    prune_every = 10_000
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.updates = 0
+
+    def consume(self, key, capacity, refill, cost):
+        """
+        Take `cost` tokens from the bucket if it holds them. Returns 0 when
+        it did, else the seconds until it will.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill)
+            wait = 0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / refill
+            # Also keep when the bucket will be full again
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / refill)
+            self.updates += 1
+            if self.updates % self.prune_every == 0:
+                self.prune(now)
+        return wait
+
+    def prune(self, now):
+        # A bucket that has refilled is as good as a new one
+        self.buckets = {key: state for key, state in self.buckets.items()
+                        if state[2] > now}
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class RedisBucketStore:
+    """
+    Buckets in Redis hashes, updated by a Lua script so concurrent requests
+    on any node see each other's takes; the server's clock is used throughout
+    """
+    script = """
+    local capacity, refill, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+    local tokens = tonumber(state[1]) or capacity
+    local stamp = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - stamp) * refill)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / refill
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "RATE_LIMITS['STORE'] = 'redis' requires the redis package") from exc
+        url = get_setting('REDIS_URL')
+        if not url:
+            raise ImproperlyConfigured(
+                "RATE_LIMITS['STORE'] = 'redis' requires RATE_LIMITS['REDIS_URL']")
+        self.client = redis.Redis.from_url(url)
+        self.consume_script = self.client.register_script(self.script)
+        self.prefix = get_setting('REDIS_PREFIX')
+
+    def consume(self, key, capacity, refill, cost):
+        return float(self.consume_script(
+            keys=[f'{self.prefix}:{key}'], args=[capacity, refill, cost]))
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}:*'):
+            self.client.delete(key)
+
+
+STORES = {
+    'local': LocalBucketStore,
+    'redis': RedisBucketStore,
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    name = get_setting('STORE')
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = STORES[name]()
+        return _stores[name]
+
+
+def route_name(request):
+    """
+    The request's URL name, qualified by the first query parameter that
+    COSTS or ROUTES single out, e.g. `course-list?search`
+    """
+    match = request.resolver_match
+    if match is None or not match.url_name:
+        return None
+    configured = get_setting('COSTS').keys() | get_setting('ROUTES').keys()
+    for param, value in request.GET.items():
+        qualified = f'{match.url_name}?{param}'
+        if value and qualified in configured:
+            return qualified
+    return match.url_name
+
+
+def request_cost(request):
+    return get_setting('COSTS').get(route_name(request), 1)
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Takes the request's cost from the bucket `get_bucket` names, with the
+    rate RATES[scope]; requests without a bucket pass
+    """
+    scope = None
+
+    def get_bucket(self, request, view):
+        raise NotImplementedError
+
+    def get_rate(self, request):
+        return get_setting('RATES').get(self.scope)
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if not get_setting('ENABLED'):
+            return True
+        bucket = self.get_bucket(request, view)
+        rate = self.get_rate(request)
+        if bucket is None or not rate:
+            return True
+        capacity, refill = parse_rate(rate)
+        # A cost above the capacity could never be paid
+        cost = min(request_cost(request), capacity)
+        wait = get_store().consume(f'{self.scope}:{bucket}', capacity, refill, cost)
+        if wait:
+            self.retry_after = math.ceil(wait)
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserBucketThrottle(BucketThrottle):
+    scope = 'user'
+
+    def get_bucket(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class AnonBucketThrottle(BucketThrottle):
+    scope = 'anon'
+
+    def get_bucket(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class LoginBucketThrottle(BucketThrottle):
+    scope = 'login'
+
+    def get_bucket(self, request, view):
+        if request.resolver_match is None or \
+                request.resolver_match.url_name not in get_setting('LOGIN_ROUTES'):
+            return None
+        return self.get_ident(request)
+
+
+class RouteBucketThrottle(BucketThrottle):
+    scope = 'route'
+
+    def get_bucket(self, request, view):
+        name = route_name(request)
+        return name if name in get_setting('ROUTES') else None
+
+    def get_rate(self, request):
+        return get_setting('ROUTES').get(route_name(request))
@@ -26,7 +26,12 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from users.views import UserViewSet, UserAddressViewset
-from courses.views import CategoryViewSet, CourseViewSet, LessonViewSet, ReviewViewSet
+from analytics.views import CourseStatsViewSet, InstructorStatsViewSet
+from courses import async_views
+from courses.views import (
+    CategoryViewSet, CourseViewSet, LessonViewSet, ReviewViewSet,
+    CourseLessonViewSet, CourseReviewViewSet, SearchViewSet, CatalogCacheStatsViewSet
+)
 
 admin.site.site_header = 'LMS Admin'
 admin.site.index_title = 'Welcome to the LMS Admin Portal'
@@ -44,12 +49,35 @@ router.register('categories', CategoryViewSet, basename='category')
 router.register('courses', CourseViewSet, basename='course')
 router.register('lessons', LessonViewSet, basename='lesson')
 router.register('reviews', ReviewViewSet, basename='review')
+router.register('search', SearchViewSet, basename='search')
+router.register('catalog-cache', CatalogCacheStatsViewSet, basename='catalog-cache')
+
+course_nested_router = NestedDefaultRouter(router, 'courses', lookup='course')
+course_nested_router.register(
+    'lessons', CourseLessonViewSet, basename='course-lessons')
+course_nested_router.register(
+    'reviews', CourseReviewViewSet, basename='course-reviews')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     path('api/', include(router.urls)),
     path('api/', include(user_nested_router.urls)),
+    path('api/', include(course_nested_router.urls)),
+
+    # Statistics rollups (analytics)
+    path('api/courses/<int:pk>/stats/',
+         CourseStatsViewSet.as_view({'get': 'retrieve'}), name='course-stats'),
+    path('api/instructors/<int:pk>/stats/',
+         InstructorStatsViewSet.as_view({'get': 'retrieve'}), name='instructor-stats'),
+
+    # Async read path for ASGI deployments (courses.async_views)
+    path('api/async/courses/', async_views.course_list, name='async-course-list'),
+    path('api/async/courses/<int:pk>/', async_views.course_detail,
+         name='async-course-detail'),
+    path('api/async/courses/<int:course_pk>/reviews/', async_views.course_reviews,
+         name='async-course-reviews'),
+    path('api/async/categories/', async_views.category_list, name='async-category-list'),
 
     # Authentication endpoints
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import QueuedTask
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('attempts', 'locked_at', 'last_error', 'created_at')
+    actions = ['requeue']
+
+    @admin.action(description='Run selected failed tasks again')
+    def requeue(self, request, queryset):
+        updated = 0
+        for row in queryset.filter(status=QueuedTask.FAILED):
+            # Skip tasks whose key has been queued again since
+            if row.key and QueuedTask.objects.filter(
+                    key=row.key, status=QueuedTask.QUEUED).exists():
+                continue
+            row.status = QueuedTask.QUEUED
+            row.attempts = 0
+            row.run_after = timezone.now()
+            row.save(update_fields=['status', 'attempts', 'run_after'])
+            updated += 1
+        self.message_user(request, f'Queued {updated} task(s) again')
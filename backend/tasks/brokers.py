@@ -0,0 +1,244 @@
+"""
+Where jobs wait between `Task.enqueue` and a worker.
+
+Every broker takes jobs through `submit(job, countdown)`, which returns
+False when a job with the same key is already queued, and hears back
+from `tasks.core.execute` through `complete`, `retry` and `fail`. The
+database and Redis brokers also hand jobs out to `manage.py run_tasks`
+through `reserve()`; the others run jobs themselves.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .core import Job, execute, get_setting
+from .models import QueuedTask
+
+
+class Broker:
+    # Whether `manage.py run_tasks` workers consume this broker
+    needs_worker = False
+
+    def submit(self, job, countdown=0):
+        raise NotImplementedError
+
+    def reserve(self):
+        """The next due job with its `attempts` counting the coming run, or None"""
+        raise NotImplementedError
+
+    def complete(self, job):
+        pass
+
+    def retry(self, job, delay, error):
+        self.submit(job, delay)
+
+    def fail(self, job, error):
+        pass
+
+
+class ImmediateBroker(Broker):
+    """
+    Runs each job as soon as it is submitted, in the submitting thread, and
+    retries at once. Countdowns are ignored.
+    """
+
+    def submit(self, job, countdown=0):
+        job.attempts += 1
+        execute(job, self)
+        return True
+
+    def retry(self, job, delay, error):
+        self.submit(job)
+
+
+class LocalBroker(Broker):
+    """
+    In-process queue drained by one daemon thread. Jobs are lost if the
+    process exits, so only tasks that can be caught up on later (e.g. by a
+    rebuild command) belong here in production.
+    """
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.queued_keys = set()
+        self.thread = None
+
+    def submit(self, job, countdown=0):
+        with self.lock:
+            if job.key is not None:
+                if job.key in self.queued_keys:
+                    return False
+                self.queued_keys.add(job.key)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.work, name='tasks-local', daemon=True)
+                self.thread.start()
+        if countdown:
+            timer = threading.Timer(countdown, self.jobs.put, (job,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.jobs.put(job)
+        return True
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            with self.lock:
+                self.queued_keys.discard(job.key)
+            job.attempts += 1
+            try:
+                execute(job, self)
+            finally:
+                close_old_connections()
+                self.jobs.task_done()
+
+    def join(self):
+        """Block until every job in the queue has run (not those in a countdown)"""
+        self.jobs.join()
+
+
+class DatabaseBroker(Broker):
+    """
+    Jobs stored as `QueuedTask` rows. Workers claim one row at a time with
+    SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can share the
+    table; a running job whose worker went quiet for VISIBILITY_TIMEOUT
+    seconds is handed out again. Completed jobs are deleted, failed ones are
+    kept with their last error.
+    """
+    needs_worker = True
+
+    def submit(self, job, countdown=0):
+        run_after = timezone.now() + timedelta(seconds=countdown)
+        try:
+            with transaction.atomic():
+                QueuedTask.objects.create(
+                    name=job.name, args=job.args, kwargs=job.kwargs, key=job.key,
+                    attempts=job.attempts, run_after=run_after)
+        except IntegrityError:
+            # The key is already queued
+            return False
+        return True
+
+    def reserve(self):
+        now = timezone.now()
+        stale = now - timedelta(seconds=get_setting('VISIBILITY_TIMEOUT'))
+        candidates = (
+            QueuedTask.objects.filter(status=QueuedTask.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id'),
+            QueuedTask.objects.filter(status=QueuedTask.RUNNING, locked_at__lt=stale)
+            .order_by('locked_at'),
+        )
+        with transaction.atomic():
+            for candidates_queryset in candidates:
+                row = candidates_queryset.select_for_update(skip_locked=True).first()
+                if row is not None:
+                    break
+            else:
+                return None
+            row.status = QueuedTask.RUNNING
+            row.attempts += 1
+            row.locked_at = now
+            row.save(update_fields=['status', 'attempts', 'locked_at'])
+        return Job(row.name, row.args, row.kwargs, key=row.key,
+                   attempts=row.attempts, id=row.pk)
+
+    def complete(self, job):
+        QueuedTask.objects.filter(pk=job.id).delete()
+
+    def retry(self, job, delay, error):
+        run_after = timezone.now() + timedelta(seconds=delay)
+        try:
+            with transaction.atomic():
+                QueuedTask.objects.filter(pk=job.id).update(
+                    status=QueuedTask.QUEUED, run_after=run_after, locked_at=None,
+                    last_error=error)
+        except IntegrityError:
+            # A newer job with the same key is queued and will do the work
+            QueuedTask.objects.filter(pk=job.id).delete()
+
+    def fail(self, job, error):
+        QueuedTask.objects.filter(pk=job.id).update(
+            status=QueuedTask.FAILED, locked_at=None, last_error=error)
+
+
+class RedisBroker(Broker):
+    """
+    Jobs stored in Redis (REDIS_URL, needs the `redis` package):
+
+        <prefix>:ready      list of jobs due now
+        <prefix>:delayed    sorted set of jobs by the time they are due
+        <prefix>:running    list of jobs handed to a worker
+        <prefix>:failed     list of failed jobs with their last error
+        <prefix>:key:<key>  set while a job with that key is queued
+
+    A job stays in `running` if its worker dies mid-run; nothing moves it
+    back, so prefer tasks that can be caught up on later.
+    """
+    needs_worker = True
+    # Upper bound on how long a key can block new jobs if its job is lost
+    key_timeout = 24 * 60 * 60
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "TASKS['BACKEND'] = 'redis' requires the redis package") from exc
+        url = get_setting('REDIS_URL')
+        if not url:
+            raise ImproperlyConfigured("TASKS['BACKEND'] = 'redis' requires TASKS['REDIS_URL']")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = get_setting('REDIS_PREFIX')
+
+    def name(self, suffix):
+        return f'{self.prefix}:{suffix}'
+
+    def encode(self, job):
+        return json.dumps(job.as_dict(), sort_keys=True)
+
+    def submit(self, job, countdown=0):
+        if job.key is not None and not self.client.set(
+                self.name(f'key:{job.key}'), 1, nx=True, ex=self.key_timeout):
+            return False
+        self.push(job, countdown)
+        return True
+
+    def push(self, job, countdown=0):
+        if countdown:
+            self.client.zadd(self.name('delayed'), {self.encode(job): time.time() + countdown})
+        else:
+            self.client.lpush(self.name('ready'), self.encode(job))
+
+    def reserve(self):
+        # Move jobs that have come due to the ready list; ZREM succeeds for
+        # exactly one of the workers racing for each
+        for payload in self.client.zrangebyscore(self.name('delayed'), 0, time.time()):
+            if self.client.zrem(self.name('delayed'), payload):
+                self.client.lpush(self.name('ready'), payload)
+        payload = self.client.rpoplpush(self.name('ready'), self.name('running'))
+        if payload is None:
+            return None
+        job = Job(**json.loads(payload), id=payload)
+        if job.key is not None:
+            self.client.delete(self.name(f'key:{job.key}'))
+        job.attempts += 1
+        return job
+
+    def complete(self, job):
+        self.client.lrem(self.name('running'), 1, job.id)
+
+    def retry(self, job, delay, error):
+        self.complete(job)
+        self.push(job, delay)
+
+    def fail(self, job, error):
+        self.complete(job)
+        self.client.lpush(self.name('failed'), json.dumps({**job.as_dict(), 'error': error}))
@@ -0,0 +1,179 @@
+"""
+Background tasks.
+
+A task is a function registered with `@task`. Calling `.delay()` or
+`.enqueue()` hands a job to the configured broker once the current
+transaction commits, so workers never see rows that were rolled back or
+are not yet visible:
+
+    @task(max_attempts=5)
+    def refresh_course_rating(course_id):
+        ...
+
+    refresh_course_rating.enqueue(args=(course.pk,), key=f'course-rating:{course.pk}')
+
+Arguments must be JSON serializable. A job with a `key` is dropped while
+another job with the same key is still waiting to run, so bursts of writes
+collapse into one run; the key is released when the job starts, so writes
+made while it runs schedule another. Failed jobs are retried up to
+`max_attempts` times with exponential backoff, which means tasks must be
+safe to run more than once.
+
+`TASKS['BACKEND']` picks the broker (see tasks.brokers):
+
+    immediate   runs jobs inline when they are submitted, for tests
+    local       a thread in each process; jobs are lost when it exits
+    database    a table polled by `manage.py run_tasks` workers
+    redis       Redis lists consumed by `manage.py run_tasks` workers
+"""
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'local',
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,
+    'POLL_INTERVAL': 1,
+    'VISIBILITY_TIMEOUT': 300,
+    'REDIS_URL': '',
+    'REDIS_PREFIX': 'tasks',
+}
+
+BROKERS = {
+    'immediate': 'tasks.brokers.ImmediateBroker',
+    'local': 'tasks.brokers.LocalBroker',
+    'database': 'tasks.brokers.DatabaseBroker',
+    'redis': 'tasks.brokers.RedisBroker',
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TASKS', {}).get(name, DEFAULTS[name])
+
+
+@dataclass
+class Job:
+    """One run of a task, as handed between brokers and workers"""
+    name: str
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+    key: Optional[str] = None
+    attempts: int = 0
+    # The broker's handle on the job, e.g. its row id
+    id: object = None
+
+    def as_dict(self):
+        data = asdict(self)
+        del data['id']
+        return data
+
+
+registry = {}
+
+
+class Task:
+    """A function that can also be run by a worker, see `task`"""
+
+    def __init__(self, func, name=None, max_attempts=None, retry_delay=None):
+        self.func = func
+        self.name = name or f'{func.__module__}.{func.__qualname__}'
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    @property
+    def max_attempts(self):
+        return self._max_attempts or get_setting('MAX_ATTEMPTS')
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before retrying a job that failed `attempts` times"""
+        base = self._retry_delay if self._retry_delay is not None else get_setting('RETRY_DELAY')
+        return base * 2 ** (attempts - 1)
+
+    def delay(self, *args, **kwargs):
+        """Run the task with these arguments once the transaction commits"""
+        self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, key=None, countdown=0, using=None):
+        """
+        Run the task once the transaction on `using` commits (at once outside
+        one), no sooner than `countdown` seconds later. See the module
+        docstring for `key`.
+        """
+        job = Job(self.name, list(args), dict(kwargs or {}), key=key)
+        transaction.on_commit(partial(submit, job, countdown), using=using)
+
+
+def task(func=None, *, name=None, max_attempts=None, retry_delay=None):
+    """
+    Register a function as a task, as `@task` or with options:
+    `@task(max_attempts=5, retry_delay=10)`
+    """
+    def register(func):
+        registered = Task(func, name, max_attempts, retry_delay)
+        registry[registered.name] = registered
+        return registered
+
+    return register(func) if func is not None else register
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    backend = get_setting('BACKEND')
+    with _brokers_lock:
+        if backend not in _brokers:
+            _brokers[backend] = import_string(BROKERS.get(backend, backend))()
+        return _brokers[backend]
+
+
+def submit(job, countdown=0):
+    """Hand `job` to the broker now; False if its key was already queued"""
+    return get_broker().submit(job, countdown)
+
+
+def execute(job, broker):
+    """
+    Run a job the broker has handed out (with `attempts` counting this run)
+    and report back whether it completed, should be retried or failed
+    """
+    registered = registry.get(job.name)
+    if registered is None:
+        logger.error('Unknown task %s', job.name)
+        broker.fail(job, f'Unknown task {job.name}')
+        return False
+    try:
+        registered.func(*job.args, **job.kwargs)
+    except Exception as exc:
+        error = f'{type(exc).__name__}: {exc}'
+        if job.attempts < registered.max_attempts:
+            delay = registered.retry_delay(job.attempts)
+            logger.warning('Task %s%r failed (attempt %d of %d), retrying in %ss: %s',
+                           job.name, tuple(job.args), job.attempts,
+                           registered.max_attempts, delay, error)
+            broker.retry(job, delay, error)
+        else:
+            logger.exception('Task %s%r failed after %d attempts',
+                             job.name, tuple(job.args), job.attempts)
+            broker.fail(job, error)
+        return False
+    broker.complete(job)
+    return True
@@ -0,0 +1,59 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from tasks.core import execute, get_broker, get_setting
+
+
+class Command(BaseCommand):
+    help = ('Run background tasks from the database or Redis broker; '
+            'start as many workers as needed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of waiting for more')
+        parser.add_argument('--max-tasks', type=int,
+                            help='Exit after running this many jobs')
+
+    def handle(self, *args, **options):
+        broker = get_broker()
+        if not broker.needs_worker:
+            raise CommandError(
+                f"TASKS['BACKEND'] = {get_setting('BACKEND')!r} runs tasks in-process; "
+                "use 'database' or 'redis' for workers")
+
+        self.stopping = False
+        handlers = {signum: signal.signal(signum, self.stop)
+                    for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            done, failed = self.work(broker, options['burst'], options['max_tasks'])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {done + failed} task(s), {failed} failed or retried'))
+
+    def work(self, broker, burst, max_tasks):
+        done = failed = 0
+        while not self.stopping:
+            close_old_connections()
+            job = broker.reserve()
+            if job is None:
+                if burst:
+                    break
+                time.sleep(get_setting('POLL_INTERVAL'))
+                continue
+            if execute(job, broker):
+                done += 1
+            else:
+                failed += 1
+            if max_tasks and done + failed >= max_tasks:
+                break
+        return done, failed
+
+    def stop(self, signum, frame):
+        # Finish the job in hand, then exit
+        self.stopping = True
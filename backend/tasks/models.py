@@ -0,0 +1,43 @@
+from django.db import models
+from django.db.models import Q
+
+
+class QueuedTask(models.Model):
+    """A job of the database broker (tasks.brokers.DatabaseBroker)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    key = models.CharField(max_length=200, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Completed jobs are deleted, so the table holds the backlog and
+        # failures; workers claim the oldest due job, or a running one
+        # whose worker has stopped answering
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status='queued'),
+                                    name='queuedtask_queued_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['run_after', 'id'], condition=Q(status='queued'),
+                         name='queuedtask_due_idx'),
+            models.Index(fields=['locked_at'], condition=Q(status='running'),
+                         name='queuedtask_running_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
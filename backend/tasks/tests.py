@@ -0,0 +1,160 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .brokers import DatabaseBroker, LocalBroker
+from .core import Job, execute, submit, task
+from .models import QueuedTask
+
+calls = []
+
+
+@task(max_attempts=3, retry_delay=0)
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=3, retry_delay=0)
+def flaky(value, failures):
+    calls.append(value)
+    if len(calls) <= failures:
+        raise RuntimeError('flaky')
+
+
+# Holds the local broker's thread until set
+release = threading.Event()
+
+
+@task
+def block():
+    release.wait(5)
+
+
+class TaskTestMixin:
+    def setUp(self):
+        calls.clear()
+
+
+@override_settings(TASKS={'BACKEND': 'immediate'})
+class ImmediateBrokerTests(TaskTestMixin, TestCase):
+    def test_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay('a')
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['a'])
+
+    def test_not_run_on_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.delay('a')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(calls, [])
+
+    def test_retries_until_success(self):
+        with self.assertLogs('tasks.core', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                flaky.delay('a', failures=2)
+        self.assertEqual(calls, ['a', 'a', 'a'])
+
+    def test_gives_up_after_max_attempts(self):
+        with self.assertLogs('tasks.core', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                flaky.delay('a', failures=5)
+        self.assertEqual(calls, ['a', 'a', 'a'])
+
+
+class LocalBrokerTests(TaskTestMixin, TestCase):
+    def test_duplicate_keys_are_dropped_until_the_job_starts(self):
+        broker = LocalBroker()
+        release.clear()
+        broker.submit(Job(block.name))
+        self.assertTrue(broker.submit(Job(record.name, ['a'], key='k')))
+        self.assertFalse(broker.submit(Job(record.name, ['b'], key='k')))
+        release.set()
+        broker.join()
+        self.assertEqual(calls, ['a'])
+        self.assertTrue(broker.submit(Job(record.name, ['c'], key='k')))
+        broker.join()
+        self.assertEqual(calls, ['a', 'c'])
+
+
+@override_settings(TASKS={'BACKEND': 'database'})
+class DatabaseBrokerTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = DatabaseBroker()
+
+    def run_next(self):
+        job = self.broker.reserve()
+        self.assertIsNotNone(job)
+        return execute(job, self.broker)
+
+    def test_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.enqueue(args=('a',))
+        self.assertFalse(QueuedTask.objects.exists())
+        callbacks[0]()
+        row = QueuedTask.objects.get()
+        self.assertEqual((row.name, row.args, row.status), (record.name, ['a'], QueuedTask.QUEUED))
+
+    def test_idempotency_key(self):
+        self.assertTrue(submit(Job(record.name, ['a'], key='k')))
+        self.assertFalse(submit(Job(record.name, ['b'], key='k')))
+        self.assertEqual(QueuedTask.objects.count(), 1)
+        job = self.broker.reserve()
+        # Running jobs release the key, so later writes are not lost
+        self.assertTrue(submit(Job(record.name, ['c'], key='k')))
+        execute(job, self.broker)
+        self.assertTrue(self.run_next())
+        self.assertEqual(calls, ['a', 'c'])
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_countdown(self):
+        submit(Job(record.name, ['a']), countdown=60)
+        self.assertIsNone(self.broker.reserve())
+
+    def test_retry_with_backoff(self):
+        submit(Job(flaky.name, ['a'], {'failures': 1}))
+        with self.assertLogs('tasks.core', 'WARNING'):
+            self.assertFalse(self.run_next())
+        row = QueuedTask.objects.get()
+        self.assertEqual((row.status, row.attempts), (QueuedTask.QUEUED, 1))
+        self.assertEqual(row.last_error, 'RuntimeError: flaky')
+        self.assertTrue(self.run_next())
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_failure_is_kept(self):
+        submit(Job(flaky.name, ['a'], {'failures': 5}))
+        with self.assertLogs('tasks.core', 'ERROR'):
+            for _ in range(3):
+                self.assertFalse(self.run_next())
+        row = QueuedTask.objects.get()
+        self.assertEqual((row.status, row.attempts), (QueuedTask.FAILED, 3))
+        self.assertIsNone(self.broker.reserve())
+
+    def test_stale_running_job_is_handed_out_again(self):
+        submit(Job(record.name, ['a']))
+        self.broker.reserve()
+        self.assertIsNone(self.broker.reserve())
+        QueuedTask.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.broker.reserve().attempts, 2)
+
+
+@override_settings(TASKS={'BACKEND': 'database'})
+class RunTasksCommandTests(TaskTestMixin, TransactionTestCase):
+    def test_burst(self):
+        for value in 'abc':
+            submit(Job(record.name, [value]))
+        out = StringIO()
+        call_command('run_tasks', burst=True, stdout=out)
+        self.assertEqual(calls, ['a', 'b', 'c'])
+        self.assertIn('Ran 3 task(s)', out.getvalue())
+        self.assertFalse(QueuedTask.objects.exists())
@@ -0,0 +1,88 @@
+"""
+Course access checks shared by the permission classes.
+
+Objects are related to courses through their foreign key ids (`course_id`,
+`instructor_id`, `user_id`), never by loading the related rows. Checks
+that need more than an id compare against the ids of the courses the user
+teaches or is enrolled in, each fetched with one query the first time a
+request needs it. Checking a whole page of lessons, reviews or courses
+therefore costs at most two queries however many objects it holds.
+"""
+from django.utils.functional import cached_property
+
+from courses.models import Course, Enrollment
+
+OWNER_FIELDS = ('instructor_id', 'user_id')
+
+
+def course_id_of(obj):
+    """The id of the course `obj` is or belongs to"""
+    if isinstance(obj, Course):
+        return obj.pk
+    if hasattr(obj, 'course_id'):
+        return obj.course_id
+    if hasattr(obj, 'lesson'):
+        return obj.lesson.course_id
+    return None
+
+
+class CourseAccess:
+    """
+    What one user may do with courses and their contents
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def taught_course_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            Course.objects.filter(instructor=self.user).values_list('pk', flat=True))
+
+    @cached_property
+    def enrolled_course_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            Enrollment.objects.filter(student=self.user).values_list('course_id', flat=True))
+
+    def owns(self, obj):
+        """Whether the user is the instructor or author of `obj` itself"""
+        for field in OWNER_FIELDS:
+            if hasattr(obj, field):
+                return getattr(obj, field) == self.user.pk
+        return False
+
+    def teaches(self, obj):
+        """Whether the user is the instructor of the course `obj` belongs to"""
+        if isinstance(obj, Course):
+            return obj.instructor_id == self.user.pk
+        return course_id_of(obj) in self.taught_course_ids
+
+    def is_enrolled(self, obj):
+        """Whether the user is enrolled in the course `obj` belongs to"""
+        return course_id_of(obj) in self.enrolled_course_ids
+
+    def can_access(self, obj):
+        """Instructors see their courses' contents, students those they enrolled in"""
+        if self.teaches(obj):
+            return True
+        return self.user.is_authenticated and self.user.role == 'student' and self.is_enrolled(obj)
+
+    def can_read_content(self, course_id):
+        """Whether the user may read lesson content of the course: admins too"""
+        if not self.user.is_authenticated:
+            return False
+        if self.user.role == 'admin' or course_id in self.taught_course_ids:
+            return True
+        return self.user.role == 'student' and course_id in self.enrolled_course_ids
+
+
+def get_access(request):
+    """The request's CourseAccess, created on first use"""
+    access = getattr(request, '_course_access', None)
+    if access is None or access.user != request.user:
+        access = request._course_access = CourseAccess(request.user)
+    return access
@@ -2,17 +2,20 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
+from lms_backend.admin import LargeTableAdminMixin
 from .models import Address
 
 User = get_user_model()
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     list_display = ('email', 'phone', 'username', 'role', 'is_active',
                     'is_staff', 'is_superuser', 'date_joined')
     list_filter = ('role', 'is_active', 'is_staff', 'is_superuser')
-    search_fields = ('email', 'username', 'first_name', 'last_name')
+    # Prefixes of the unique columns, served by their indexes; this also
+    # backs the user autocomplete on course, review and enrollment forms
+    search_fields = ('email__startswith', 'username__startswith')
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         (_('Personal Info'), {'fields': ('first_name',
@@ -6,4 +6,12 @@ class UserConfig(AppConfig):
     name = 'users'
 
     def ready(self):
-        import users
+        from lms_backend import media
+        from . import signals  # noqa: F401
+
+        media.register(self.get_model('User'), 'profile_picture',
+                       'profile_picture_renditions', {
+                           'thumbnail': (96, 96),
+                           'card': (256, 256),
+                           'hero': (512, 512),
+                       })
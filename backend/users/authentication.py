@@ -0,0 +1,78 @@
+"""
+JWT authentication that resolves users through a cache instead of a
+`SELECT` on users_user per request.
+
+Resolved users are cached by id in `AUTH_USER_CACHE['ALIAS']` for
+`TIMEOUT` seconds, as the few fields permission checks read (`FIELDS`).
+Requests get a user built from them whose other fields, the password hash
+among them, load from the database on first access. Saving or deleting a user (role changes through
+`make_instructor`/`make_student`, admin edits, deactivation, password
+changes) drops their entry, see users.signals. Writes that bypass
+`save()` are picked up when the entry expires, which also bounds how long
+another process with a local-memory cache can keep serving a stale user.
+"""
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+USER_KEY = 'auth:user:{user_id}'
+
+# Identity and authorization fields; nothing secret
+FIELDS = ('id', 'email', 'username', 'first_name', 'last_name', 'role',
+          'is_active', 'is_staff', 'is_superuser')
+
+
+def get_setting(name):
+    return getattr(settings, 'AUTH_USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('ALIAS')]
+
+
+def invalidate_user(user_id):
+    get_cache().delete(USER_KEY.format(user_id=user_id))
+
+
+class CachedUserMixin:
+    def get_user(self, validated_token):
+        # Revocation compares the token with the stored password hash, which
+        # must come from the database
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        cache = get_cache()
+        key = USER_KEY.format(user_id=user_id)
+        fields = cache.get(key)
+        if fields is None:
+            user = super().get_user(validated_token)
+            cache.set(key, {name: getattr(user, name) for name in FIELDS},
+                      get_setting('TIMEOUT'))
+            return user
+        if api_settings.CHECK_USER_IS_ACTIVE and not fields['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        # from_db() takes values in the model's field order; fields left
+        # out are deferred, as with .only()
+        model = get_user_model()
+        names = [field.attname for field in model._meta.concrete_fields
+                 if field.attname in fields]
+        return model.from_db(None, names, [fields[name] for name in names])
+
+
+class CachedJWTAuthentication(CachedUserMixin, JWTAuthentication):
+    """JWT from the Authorization header"""
+
+
+class CachedJWTCookieAuthentication(CachedUserMixin, JWTCookieAuthentication):
+    """JWT from the Authorization header or the dj-rest-auth cookie"""
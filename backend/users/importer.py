@@ -0,0 +1,257 @@
+"""
+Bulk import of users from CSV or JSON, for the `import_users` management
+command and the admin-only POST /api/users/import/ upload.
+
+Rows are read one at a time and handled in chunks:
+
+1. Each row is validated with `UserImportSerializer`. Rows repeating an
+   email, username or phone seen earlier in the file are rejected.
+2. Emails, usernames and phones already taken are looked up with one
+   query per field per chunk.
+3. Passwords are hashed in a process pool. Hashing is deliberately slow
+   and dominates the cost of an import.
+4. The chunk is written with one `bulk_create(ignore_conflicts=True)`.
+   Rows that collided with users created concurrently are found by their
+   password hash, which is salted and unique, and reported.
+
+`bulk_create` sends no signals. Roles come from the file (students by
+default) rather than from the post_save handlers, and none of the
+per-user side effects of registration run.
+"""
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework import serializers
+
+User = get_user_model()
+
+FORMATS = ('csv', 'json')
+UNIQUE_FIELDS = ('email', 'username', 'phone')
+
+
+class UserImportSerializer(serializers.Serializer):
+    # Uniqueness is checked per chunk, not with a query per row
+    email = serializers.EmailField(max_length=254)
+    username = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    phone = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, required=False)
+    bio = serializers.CharField(required=False, allow_blank=True)
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_username(self, value):
+        if value:
+            User.username_validator(value)
+        return value
+
+    def validate(self, attrs):
+        attrs['username'] = attrs.get('username') or attrs['email']
+        attrs['phone'] = attrs.get('phone') or None
+        return attrs
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_json(stream, buffer_size=64 * 1024):
+    """
+    The objects of a JSON array, or of newline-delimited JSON, decoded as
+    the stream is read rather than after loading the whole document
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        data = stream.read(buffer_size)
+        buffer += data
+        while True:
+            buffer = buffer.lstrip()
+            if not started and buffer.startswith('['):
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith((',', ']')):
+                buffer = buffer[1:]
+                continue
+            if not buffer:
+                break
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not data:
+                    raise
+                break
+            buffer = buffer[end:]
+            yield row
+        if not data:
+            return
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def read_rows(stream, format):
+    """Rows of a text or binary stream in the given format"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return READERS[format](stream)
+
+
+def hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self, max_errors=None):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': len(self.errors),
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors[:max_errors],
+        }
+
+
+class UserImporter:
+    """
+    Import users from an iterable of row dicts; rows are numbered from 1.
+    `workers` processes hash passwords (one per CPU by default), 0 hashes
+    in this process.
+    """
+
+    def __init__(self, chunk_size=1000, workers=None, default_role=User.STUDENT):
+        self.chunk_size = chunk_size
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.default_role = default_role
+        self.seen = {name: set() for name in UNIQUE_FIELDS}
+        self.report = ImportReport()
+
+    def run(self, rows):
+        started = time.perf_counter()
+        pool = ProcessPoolExecutor(self.workers, initializer=django.setup) \
+            if self.workers else None
+        try:
+            chunk = []
+            for number, row in enumerate(rows, start=1):
+                self.report.rows += 1
+                chunk.append((number, row))
+                if len(chunk) >= self.chunk_size:
+                    self.import_chunk(chunk, pool)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.report.seconds = time.perf_counter() - started
+        self.report.errors.sort(key=lambda error: error['row'])
+        return self.report
+
+    def validate_chunk(self, chunk):
+        valid = []
+        for number, row in chunk:
+            if not isinstance(row, dict):
+                self.report.add_error(number, {'non_field_errors': ['Expected an object.']})
+                continue
+            # Empty CSV cells and JSON nulls leave the field unset
+            row = {key: value for key, value in row.items() if value not in ('', None)}
+            serializer = UserImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.report.add_error(number, serializer.errors)
+                continue
+            data = serializer.validated_data
+            duplicates = {
+                name: ['Appears earlier in the file.']
+                for name in UNIQUE_FIELDS
+                if data[name] is not None and data[name] in self.seen[name]
+            }
+            if duplicates:
+                self.report.add_error(number, duplicates)
+                continue
+            for name in UNIQUE_FIELDS:
+                if data[name] is not None:
+                    self.seen[name].add(data[name])
+            valid.append((number, data))
+
+        taken = {
+            name: set(User.objects.filter(**{f'{name}__in': [
+                data[name] for _, data in valid if data[name] is not None
+            ]}).values_list(name, flat=True))
+            for name in UNIQUE_FIELDS
+        }
+        accepted = []
+        for number, data in valid:
+            conflicts = {
+                name: [f'A user with this {name} already exists.']
+                for name in UNIQUE_FIELDS if data[name] in taken[name]
+            }
+            if conflicts:
+                self.report.add_error(number, conflicts)
+            else:
+                accepted.append((number, data))
+        return accepted
+
+    def import_chunk(self, chunk, pool):
+        accepted = self.validate_chunk(chunk)
+        if not accepted:
+            return
+
+        passwords = [data.pop('password', None) or None for _, data in accepted]
+        if pool is None:
+            hashes = hash_passwords(passwords)
+        else:
+            size = max(1, len(passwords) // (self.workers * 4))
+            hashes = [
+                hashed
+                for batch in pool.map(hash_passwords, [
+                    passwords[start:start + size] for start in range(0, len(passwords), size)])
+                for hashed in batch
+            ]
+
+        users = [
+            User(password=hashed, **{'role': self.default_role, **data})
+            for (_, data), hashed in zip(accepted, hashes)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            stored = dict(User.objects.filter(
+                email__in=[user.email for user in users]).values_list('email', 'password'))
+        for (number, _), user in zip(accepted, users):
+            if stored.get(user.email) == user.password:
+                self.report.created += 1
+            else:
+                self.report.add_error(number, {'non_field_errors': [
+                    'Conflicts with a user created during the import.']})
+
+
+def import_users(stream, format, **options):
+    """Import the users of a CSV or JSON stream, returns an ImportReport"""
+    return UserImporter(**options).run(read_rows(stream, format))
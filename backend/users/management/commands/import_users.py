@@ -0,0 +1,57 @@
+import json
+import sys
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import FORMATS, import_users
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Import users from a CSV file or a JSON array / NDJSON file, reporting '
+            'rows that could not be imported and the throughput in rows per second')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, - for stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Defaults to the file extension')
+        parser.add_argument('--role', choices=[role for role, _ in User.ROLE_CHOICES],
+                            default=User.STUDENT, help='Role of rows without one')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows validated and inserted together')
+        parser.add_argument('--workers', type=int,
+                            help='Password hashing processes, 0 to hash in this process '
+                                 '(default: one per CPU)')
+        parser.add_argument('--report', help='Write the full JSON report to this file')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or Path(path).suffix.lstrip('.').lower()
+        if import_format == 'ndjson':
+            import_format = 'json'
+        if import_format not in FORMATS:
+            raise CommandError('Cannot tell the format from the file name, pass --format')
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = import_users(
+                stream, import_format, chunk_size=options['chunk_size'],
+                workers=options['workers'], default_role=options['role'])
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in report.errors[:20]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if len(report.errors) > 20:
+            self.stderr.write(f'... and {len(report.errors) - 20} more')
+        if options['report']:
+            with open(options['report'], 'w') as fh:
+                json.dump(report.as_dict(), fh, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} of {report.rows} row(s) in {report.seconds:.1f}s '
+            f'({report.rows_per_second:.0f} rows/s), {len(report.errors)} failed'))
@@ -24,6 +24,9 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(
         upload_to='profile_pictures/', blank=True, null=True)
+    # Written by the media pipeline (lms_backend.media)
+    profile_picture_renditions = models.JSONField(
+        default=dict, blank=True, editable=False)
     date_joined = models.DateTimeField(auto_now_add=True)
 
     USERNAME_FIELD = 'email'
@@ -32,6 +35,11 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        # UserViewSet pages by (date_joined, id), filtered on role or not
+        indexes = [
+            models.Index(fields=['role', 'date_joined', 'id'], name='user_role_joined_idx'),
+            models.Index(fields=['date_joined', 'id'], name='user_joined_idx'),
+        ]
 
     def __str__(self):
         return self.email
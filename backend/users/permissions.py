@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .access import get_access
+
 class IsAdminUser(permissions.BasePermission):
     """
     Permission to only allow admin users to access
@@ -14,6 +16,13 @@ class IsInstructorUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.role == 'instructor'
 
+class IsStudentUser(permissions.BasePermission):
+    """
+    Permission to only allow student users to access
+    """
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.role == 'student'
+
 class IsInstructorOrAdminUser(permissions.BasePermission):
     """
     Permission to allow instructors or admins to access
@@ -42,13 +51,8 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
-        # Try to match the object's instructor/user with the request user
-        if hasattr(obj, 'instructor'):
-            return obj.instructor == request.user
-        elif hasattr(obj, 'user'):
-            return obj.user == request.user
-        
-        return False
+        # Match the object's instructor/user with the request user
+        return get_access(request).owns(obj)
 
 class IsCourseInstructorOrReadOnly(permissions.BasePermission):
     """
@@ -59,32 +63,18 @@ class IsCourseInstructorOrReadOnly(permissions.BasePermission):
             return True
         
         # For lessons and other course-related content
-        if hasattr(obj, 'course') and hasattr(obj.course, 'instructor'):
-            return obj.course.instructor == request.user
-        
-        return False
+        return hasattr(obj, 'course_id') and get_access(request).teaches(obj)
 
 class IsEnrolledOrInstructor(permissions.BasePermission):
     """
     Permission to allow access to students enrolled in a course or the instructor
     """
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        
-        # If it's a lesson, check the course
-        if hasattr(obj, 'course'):
-            course = obj.course
-        elif hasattr(obj, 'lesson') and hasattr(obj.lesson, 'course'):
-            course = obj.lesson.course
-        else:
-            course = obj
-        
-        # Check if user is the instructor
-        if hasattr(course, 'instructor') and course.instructor == user:
-            return True
-        
-        # Check if user is enrolled
-        if user.is_authenticated and user.role == 'student':
-            return course.enrollments.filter(student=user).exists()
-        
-        return False
\ No newline at end of file
+        return get_access(request).can_access(obj)
+
+class IsOwnerOrAdmin(permissions.BasePermission):
+    """
+    Permission to allow owners of an object, or admins, to access it
+    """
+    def has_object_permission(self, request, view, obj):
+        return request.user.role == 'admin' or get_access(request).owns(obj)
@@ -1,29 +1,37 @@
+import os
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from dj_rest_auth.serializers import UserDetailsSerializer
 from dj_rest_auth.registration.serializers import RegisterSerializer
+from lms_backend.fieldsets import SparseFieldsMixin
+from lms_backend.media import RenditionsField
+from .importer import FORMATS
 from .models import Address
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for User model"""
+    profile_picture_renditions = RenditionsField('profile_picture')
 
     class Meta:
         model = User
         fields = ['id', 'email', 'phone', 'username', 'first_name',
-                  'last_name', 'role', 'bio', 'profile_picture']
+                  'last_name', 'role', 'bio', 'profile_picture',
+                  'profile_picture_renditions']
         read_only_fields = ['email']
 
 
-class CustomUserDetailsSerializer(UserDetailsSerializer):
+class CustomUserDetailsSerializer(SparseFieldsMixin, UserDetailsSerializer):
     """Custom user details serializer for dj-rest-auth"""
     role = serializers.CharField(read_only=True)
+    profile_picture_renditions = RenditionsField('profile_picture')
 
     class Meta(UserDetailsSerializer.Meta):
         fields = UserDetailsSerializer.Meta.fields + \
-            ('role',  'bio', 'profile_picture')
+            ('role',  'bio', 'profile_picture', 'profile_picture_renditions')
 
 
 class CustomRegisterSerializer(RegisterSerializer):
@@ -32,21 +40,16 @@ class CustomRegisterSerializer(RegisterSerializer):
     _has_phone_field = True
 
     def get_cleaned_data(self):
+        # allauth's adapter copies the names onto the user before its
+        # first save, along with the email and username
         data = super().get_cleaned_data()
         validated = getattr(self, 'validated_data', None) or {}
         data['first_name'] = validated.get('first_name', '')
         data['last_name'] = validated.get('last_name', '')
         return data
-    
-    def save(self, request):
-        user = super().save(request)
-        user.first_name = self.cleaned_data.get('first_name')
-        user.last_name = self.cleaned_data.get('last_name')
-        user.save()
-        return user
 
 
-class AdminUserSerializer(serializers.ModelSerializer):
+class AdminUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for admins to manage users"""
 
     class Meta:
@@ -65,3 +68,20 @@ class UserAddressSerializer(serializers.ModelSerializer):
         model = Address
         fields = ['id', 'user_id', 'street', 'city', 'state', 'postal_code',
                   'country']
+
+
+class UserImportUploadSerializer(serializers.Serializer):
+    """Payload of the user import endpoint; the format defaults to the file extension"""
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, default=User.STUDENT)
+
+    def validate(self, attrs):
+        if 'format' not in attrs:
+            extension = os.path.splitext(attrs['file'].name)[1].lstrip('.').lower()
+            import_format = 'json' if extension == 'ndjson' else extension
+            if import_format not in FORMATS:
+                raise serializers.ValidationError(
+                    {'format': ['Cannot tell the format from the file name.']})
+            attrs['format'] = import_format
+        return attrs
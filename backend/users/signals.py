@@ -1,27 +1,37 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from allauth.account.signals import user_signed_up
+
+from lms_backend.media import renditions_ready
+from .authentication import invalidate_user
 
 User = get_user_model()
 
 
-@receiver(post_save, sender=User)
-def set_default_role(sender, instance, created, **kwargs):
+@receiver(pre_save, sender=User)
+def set_default_role(sender, instance, **kwargs):
     """
-    Signal to set default role for new users
+    New users without a role are students, set before the INSERT so that
+    creating a user (by sign-up, social login or the API) is one write
     """
-    if created and not instance.role:
+    if instance._state.adding and not instance.role:
         instance.role = User.STUDENT  # type: ignore
-        instance.save()
 
 
-@receiver(user_signed_up)
-def handle_user_signed_up(request, user, **kwargs):
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, created=False, **kwargs):
     """
-    Signal to handle user creation when signing up via social auth
+    Drop the user cached by JWT authentication after role changes, admin
+    edits, deactivation or deletion. New users have nothing cached yet.
     """
-    # Default to student role for social auth users
-    if not user.role:
-        user.role = User.STUDENT  # type: ignore
-        user.save()
+    if created:
+        return
+    # After commit, so a request racing the write cannot cache the old row again
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_user(pk))
+
+
+@receiver(renditions_ready, sender=User)
+def invalidate_cached_user_picture(sender, instance_pk, **kwargs):
+    invalidate_user(instance_pk)
@@ -1,3 +1,365 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.models import Category, Course, Enrollment, Lesson, Review
+from lms_backend import throttling
+from lms_backend.testing import create_user
+from .authentication import USER_KEY, CachedJWTAuthentication, get_cache
+from .permissions import (
+    IsCourseInstructorOrReadOnly, IsEnrolledOrInstructor, IsOwnerOrReadOnly,
+)
+from .importer import import_users, read_json
+from .views import UserViewSet
+
+User = get_user_model()
+
+
+class PermissionQueryTests(TestCase):
+    """
+    Object permissions over a page of objects cost a fixed number of
+    queries, whatever the number of objects and courses
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('instructor', User.INSTRUCTOR)
+        cls.student = create_user('student', User.STUDENT)
+        category = Category.objects.create(name='Web', slug='web')
+        cls.courses = [
+            Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='...',
+                instructor=cls.instructor, category=category, price=10)
+            for i in range(4)
+        ]
+        for course in cls.courses:
+            for order in range(1, 6):
+                Lesson.objects.create(
+                    course=course, title=f'Lesson {order}', order=order, content='...')
+            Review.objects.create(course=course, user=cls.student, rating=5)
+        Enrollment.objects.create(student=cls.student, course=cls.courses[0])
+
+    def make_request(self, user, method='get'):
+        request = Request(getattr(RequestFactory(), method)('/'))
+        request.user = user
+        return request
+
+    def check(self, permission, request, objects):
+        return [permission.has_object_permission(request, None, obj) for obj in objects]
+
+    def test_enrolled_or_instructor(self):
+        lessons = list(Lesson.objects.all())
+        request = self.make_request(self.student)
+        with self.assertNumQueries(2):
+            allowed = self.check(IsEnrolledOrInstructor(), request, lessons)
+        self.assertEqual(
+            allowed, [lesson.course_id == self.courses[0].pk for lesson in lessons])
+
+        request = self.make_request(self.instructor)
+        with self.assertNumQueries(1):
+            self.assertTrue(all(self.check(IsEnrolledOrInstructor(), request, lessons)))
+
+    def test_course_instructor_or_read_only(self):
+        lessons = list(Lesson.objects.all())
+        with self.assertNumQueries(1):
+            self.assertTrue(all(self.check(
+                IsCourseInstructorOrReadOnly(),
+                self.make_request(self.instructor, 'patch'), lessons)))
+        with self.assertNumQueries(1):
+            self.assertFalse(any(self.check(
+                IsCourseInstructorOrReadOnly(),
+                self.make_request(self.student, 'patch'), lessons)))
+
+    def test_owner_or_read_only(self):
+        reviews = list(Review.objects.all())
+        with self.assertNumQueries(0):
+            self.assertTrue(all(self.check(
+                IsOwnerOrReadOnly(), self.make_request(self.student, 'delete'), reviews)))
+            self.assertFalse(any(self.check(
+                IsOwnerOrReadOnly(), self.make_request(self.instructor, 'delete'), reviews)))
+
+
+class UserExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', User.ADMIN)
+        cls.students = [create_user(f'student{i}', User.STUDENT) for i in range(5)]
+
+    def export(self, query):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/users/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_filtered_csv_export_resumes_after_id(self):
+        rows = list(csv.reader(io.StringIO(self.export('format=csv&role=student'))))
+        self.assertEqual(rows[0], UserViewSet.export_fields)
+        self.assertEqual([row[1] for row in rows[1:]],
+                         [student.email for student in self.students])
+
+        after = self.students[2].pk
+        rows = list(csv.reader(io.StringIO(
+            self.export(f'format=csv&role=student&after_id={after}'))))
+        self.assertEqual([int(row[0]) for row in rows[1:]],
+                         [student.pk for student in self.students[3:]])
+
+    def test_ndjson_export(self):
+        lines = self.export('format=ndjson').splitlines()
+        self.assertEqual([json.loads(line)['email'] for line in lines],
+                         [user.email for user in [self.admin, *self.students]])
+
+    def test_export_is_for_admins(self):
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get('/api/users/export/').status_code, 403)
+
+
+class CachedUserTests(APITestCase):
+    """JWT authentication caches a few fields per user and drops them on writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', User.ADMIN)
+        cls.student = create_user('student', User.STUDENT)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+
+    def listed(self):
+        response = self.client.get('/api/users/')
+        if response.status_code != 200:
+            return response.status_code
+        return len(response.json()['results'])
+
+    def change(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(self.student, name, value)
+            self.student.save()
+
+    def test_cache_holds_no_password(self):
+        self.assertEqual(self.listed(), 1)
+        cached = get_cache().get(USER_KEY.format(user_id=self.student.pk))
+        self.assertEqual(cached['role'], User.STUDENT)
+        self.assertNotIn('password', cached)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.listed(), 1)
+        self.assertFalse(any('"password"' in query['sql'] for query in context.captured_queries))
+
+    def authenticate(self, user):
+        """The user the authentication classes resolve for `user`'s token"""
+        token = AccessToken.for_user(user)
+        request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'),
+                          authenticators=[CachedJWTAuthentication()])
+        return request.user
+
+    def test_cached_user_keeps_its_fields(self):
+        for user in (self.admin, self.student):
+            with self.subTest(role=user.role):
+                self.authenticate(user)
+                with self.assertNumQueries(0):
+                    cached = self.authenticate(user)
+                for name in ('id', 'email', 'username', 'role', 'is_active', 'is_staff',
+                             'is_superuser'):
+                    self.assertEqual(getattr(cached, name), getattr(user, name), name)
+                self.assertFalse(cached._state.adding)
+
+    def test_permissions_hold_across_requests(self):
+        instructor = create_user('instructor', User.INSTRUCTOR)
+        course = {'title': 'Course', 'slug': 'course', 'description': '...', 'price': '10.00'}
+        cases = [
+            # IsStudentUser
+            (self.student, 'get', '/api/courses/enrolled/', None, 200),
+            # IsAdminUser
+            (self.admin, 'get', '/api/catalog-cache/', None, 200),
+            (self.student, 'get', '/api/catalog-cache/', None, 403),
+            # Instructors and admins create courses
+            (instructor, 'post', '/api/courses/', course, 201),
+            (self.student, 'post', '/api/courses/', course, 403),
+        ]
+        for user, method, url, data, expected in cases:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            for attempt in range(2):
+                if data is not None:
+                    data = {**data, 'slug': f"{data['slug']}-{attempt}"}
+                with self.subTest(user=user.username, url=url, attempt=attempt):
+                    response = getattr(self.client, method)(url, data, format='json')
+                    self.assertEqual(response.status_code, expected, response.content)
+
+    def test_role_change(self):
+        self.assertEqual(self.listed(), 1)
+        self.change(role=User.ADMIN)
+        self.assertEqual(self.listed(), 2)
+
+    def test_deactivation(self):
+        self.assertEqual(self.listed(), 1)
+        self.change(is_active=False)
+        self.assertEqual(self.listed(), 401)
+
+    def test_deletion(self):
+        self.assertEqual(self.listed(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertEqual(self.listed(), 401)
+
+
+class UserImportTests(APITestCase):
+    def test_import_reports_row_errors(self):
+        create_user('taken')
+        rows = io.StringIO(
+            'email,username,phone,role,password\n'
+            'new1@example.com,new1,+15550001,,secret-pass\n'
+            'new2@example.com,,+15550002,instructor,\n'
+            'taken@example.com,other,,,\n'
+            'new1@example.com,again,,,\n'
+            'not-an-email,bad,,,\n'
+            'new3@example.com,new3,,wizard,\n'
+        )
+        report = import_users(rows, 'csv', chunk_size=2, workers=0)
+
+        self.assertEqual((report.rows, report.created), (6, 2))
+        self.assertEqual([error['row'] for error in report.errors], [3, 4, 5, 6])
+        self.assertIn('email', report.errors[0]['errors'])
+        first, second = User.objects.get(email='new1@example.com'), \
+            User.objects.get(email='new2@example.com')
+        self.assertEqual((first.role, second.role), (User.STUDENT, User.INSTRUCTOR))
+        self.assertTrue(first.check_password('secret-pass'))
+        self.assertEqual(second.username, 'new2@example.com')
+        self.assertFalse(second.has_usable_password())
+
+    def test_json_rows_are_read_incrementally(self):
+        rows = [{'email': f'user{i}@example.com'} for i in range(50)]
+        stream = io.StringIO(json.dumps(rows, indent=1))
+        self.assertEqual(list(read_json(stream, buffer_size=16)), rows)
+        ndjson = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        self.assertEqual(list(read_json(ndjson, buffer_size=16)), rows)
+
+
+    @mock.patch.object(UserViewSet, 'import_workers', 0)
+    def test_import_endpoint(self):
+        admin = create_user('admin', User.ADMIN)
+        rows = [{'email': 'new1@example.com'}, {'email': 'bad'},
+                {'email': 'new2@example.com', 'role': 'student'}]
+        upload = SimpleUploadedFile(
+            'users.ndjson', ''.join(json.dumps(row) + '\n' for row in rows).encode())
+
+        self.client.force_authenticate(admin)
+        response = self.client.post('/api/users/import/', {'file': upload, 'role': 'instructor'})
+        self.assertEqual(response.status_code, 200, response.content)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['failed']), (3, 2, 1))
+        self.assertEqual(report['errors'][0]['row'], 2)
+        self.assertEqual(User.objects.get(email='new1@example.com').role, User.INSTRUCTOR)
+        self.assertEqual(User.objects.get(email='new2@example.com').role, User.STUDENT)
+
+        upload = SimpleUploadedFile('users.txt', b'email\nnew3@example.com\n')
+        response = self.client.post('/api/users/import/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json())
+
+        student = User.objects.get(email='new2@example.com')
+        self.client.force_authenticate(student)
+        upload = SimpleUploadedFile('users.csv', b'email\nnew3@example.com\n')
+        self.assertEqual(
+            self.client.post('/api/users/import/', {'file': upload}).status_code, 403)
+        self.assertFalse(User.objects.filter(email='new3@example.com').exists())
+
+class UserCreationTests(APITestCase):
+    def test_registration_writes_the_user_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/auth/registration/', {
+                'username': 'ada', 'email': 'ada@example.com',
+                'password1': 'Analytical-engine-1843', 'password2': 'Analytical-engine-1843',
+                'first_name': 'Ada', 'last_name': 'Lovelace',
+            })
+        self.assertEqual(response.status_code, 201)
+        writes = [query['sql'] for query in context.captured_queries
+                  if query['sql'].startswith(('INSERT INTO "users_user"', 'UPDATE "users_user"'))]
+        # The remaining UPDATE is the last_login of the session login
+        self.assertEqual(len(writes), 2)
+        self.assertIn('"last_login" =', writes[1])
+        user = User.objects.get(email='ada@example.com')
+        self.assertEqual((user.first_name, user.last_name, user.role),
+                         ('Ada', 'Lovelace', User.STUDENT))
+
+    def test_role_defaults_before_insert(self):
+        with self.assertNumQueries(1):
+            user = User.objects.create(username='bare', email='bare@example.com', role='')
+        self.assertEqual(User.objects.get(pk=user.pk).role, User.STUDENT)
+
+
+@override_settings(RATE_LIMITS={
+    'RATES': {'anon': '100/min', 'login': '3/min'},
+    'LOGIN_ROUTES': ['token_obtain_pair'],
+})
+class LoginRateLimitTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+
+    def attempt(self, ip):
+        return self.client.post('/api/token/', {
+            'email': 'someone@example.com', 'password': 'guess'}, REMOTE_ADDR=ip)
+
+    def test_password_guessing_is_limited_per_ip(self):
+        self.assertEqual([self.attempt('10.0.0.1').status_code for _ in range(4)],
+                         [401, 401, 401, 429])
+        self.assertEqual(self.attempt('10.0.0.2').status_code, 401)
+        # Other routes do not count against the login bucket
+        self.assertEqual(self.client.get(
+            '/api/courses/', REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific')
+class UserIndexTests(APITestCase):
+    """User listings read users_user through an index for each filter"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', User.ADMIN)
+        roles = [User.STUDENT] * 18 + [User.INSTRUCTOR]
+        User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.com',
+                 role=roles[i % len(roles)], is_active=i % 50 != 0)
+            for i in range(5000))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE users_user')
+
+    def plan(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        [sql] = [query['sql'] for query in context.captured_queries
+                 if 'FROM "users_user"' in query['sql']]
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_listings(self):
+        self.client.force_authenticate(self.admin)
+        cases = {
+            '/api/users/': 'user_joined_idx',
+            '/api/users/?role=instructor': 'user_role_joined_idx',
+            # Most users are active students: walking the date index is cheaper
+            '/api/users/?role=student&is_active=true': None,
+            '/api/users/?is_active=false': None,
+            '/api/users/instructors/': 'user_role_joined_idx',
+        }
+        for url, index in cases.items():
+            with self.subTest(url=url):
+                plan = self.plan(url)
+                self.assertNotIn('Seq Scan on users_user', plan, plan)
+                if index is not None:
+                    self.assertIn(index, plan, plan)
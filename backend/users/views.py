@@ -1,22 +1,38 @@
 from django.contrib.auth import get_user_model
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
+from lms_backend.export import ExportMixin
+from lms_backend.fieldsets import restrict_queryset
+from lms_backend.pagination import KeysetPagination
+from lms_backend.profiling import ProfiledViewMixin
+from .importer import import_users
 from .permissions import IsAdminUser
-from .serializers import AdminUserSerializer, UserSerializer, UserAddressSerializer
+from .serializers import (
+    AdminUserSerializer, UserAddressSerializer, UserImportUploadSerializer, UserSerializer,
+)
 from .models import Address
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ProfiledViewMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for user management
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-date_joined', '-id')
+    filterset_fields = ['role', 'is_active']
+    export_fields = ['id', 'email', 'phone', 'username', 'first_name',
+                     'last_name', 'role', 'is_active', 'date_joined']
+    export_permission_classes = [IsAdminUser]
+    # Password hashing processes per import, None for one per CPU
+    import_workers = None
 
     def get_queryset(self):
         """
@@ -27,8 +43,13 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         if user.is_admin:  # type: ignore
-            return User.objects.all()
-        return User.objects.filter(pk=user.pk)
+            queryset = User.objects.all()
+        else:
+            queryset = User.objects.filter(pk=user.pk)
+        if self.action in ('list', 'retrieve'):
+            queryset = restrict_queryset(
+                queryset, self.get_serializer(), always=('date_joined',))
+        return queryset
 
     def get_serializer_class(self):
         """
@@ -41,9 +62,9 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         """
         - List/retrieve: authenticated
-        - Create/update/partial_update/destroy: admin only
+        - Create/update/partial_update/destroy/import: admin only
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_users']:
             return [IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
@@ -63,6 +84,20 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser],
+            parser_classes=[MultiPartParser], url_path='import', url_name='import')
+    def import_users(self, request):
+        """
+        Import users from an uploaded CSV or JSON file, as the `import_users`
+        management command does, and return the report with every row error
+        """
+        serializer = UserImportUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        report = import_users(data['file'], data['format'], workers=self.import_workers,
+                              default_role=data['role'])
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def make_instructor(self, request, pk=None):
         """Convert a user to instructor role"""
@@ -80,7 +115,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({'status': 'User role set to student'}, status=status.HTTP_200_OK)
 
 
-class UserAddressViewset(viewsets.ModelViewSet):
+class UserAddressViewset(ProfiledViewMixin, viewsets.ModelViewSet):
     serializer_class = UserAddressSerializer
     permission_classes = [permissions.IsAuthenticated]
 